@@ -1,6 +1,6 @@
 from django import forms
 from django.contrib import admin
-from .models import Country, Location, LocationFunction, UsageType, ServiceProvider, ServiceProviderRep, SwitchType, ConnectionType, CircuitDetail, PhoneNumber, PhoneNumberRange, UsageType
+from .models import Country, Location, LocationFunction, UsageType, ServiceProvider, ServiceProviderRep, SwitchType, ConnectionType, CircuitDetail, PhoneNumber, PhoneNumberRange, UsageType, GeocodeCacheEntry
 # from .forms import UsageTypeAdminForm
 
 def populate_phone_numbers(modeladmin, request, queryset):
@@ -69,6 +69,7 @@ admin.site.register(ConnectionType)
 admin.site.register(CircuitDetail)
 admin.site.register(PhoneNumber)
 admin.site.register(LocationFunction)
+admin.site.register(GeocodeCacheEntry)
 #admin.site.register(PhoneNumberAdmin)
 # admin.site.register(PhoneNumberRange, PhoneNumberRangeAdmin)
 # admin.site.register(UsageType, UsageTypeAdmin)
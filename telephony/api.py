@@ -0,0 +1,156 @@
+# telephony/api.py
+"""
+Read-only JSON API over the inventory models listed in API_MODELS; account,
+billing and cache tables are left out.
+
+``GET api/<model>/`` (e.g. ``api/phone_number/``) streams the rows as NDJSON,
+one JSON object per line. Rows are built with values(), never model
+instances: every concrete column is included, foreign keys as ``<name>_id``
+plus a ``<name>_label`` resolved by a join, so a row needs no further query.
+
+Rows are read in keyset chunks of CHUNK_SIZE ordered by primary key, so the
+memory used is bounded by the chunk, not the table, and a full DID dump
+streams like any other page. ``?after=<id>`` starts after that primary key
+and ``?limit=<n>`` stops after n rows; a client pages by passing the id of
+the last row it received. The model's FilterSet from telephony.filters, if
+there is one, applies to the query string as it does in the list views.
+"""
+import inflection
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models.functions import Coalesce, Concat
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+from django_filters.filterset import filterset_factory
+from . import filters
+from .models import (
+    CircuitDetail, ConnectionType, Country, HardwareAnalogGateway, HardwareGateway, HardwarePhone, Location,
+    LocationFunction, PhoneNumber, PhoneNumberRange, ServiceProvider, ServiceProviderRep, StreetSuffix, SwitchType,
+    UsageType,
+)
+
+CHUNK_SIZE = 2000
+
+# The models served: the inventory and its reference tables. A new model is
+# only exposed once it is added here.
+API_MODELS = (
+    PhoneNumber, PhoneNumberRange, Location, CircuitDetail, ServiceProvider, ServiceProviderRep,
+    HardwarePhone, HardwareGateway, HardwareAnalogGateway,
+    Country, LocationFunction, UsageType, SwitchType, ConnectionType, StreetSuffix,
+)
+
+# Field used as the label of a related row, where it isn't the first of
+# name/..._name the model has
+LABEL_FIELDS = {
+    User: 'username',
+    UsageType: 'usage_type',
+    CircuitDetail: 'circuit_number',
+}
+
+
+def api_models():
+    """``{url name: model}`` for every model in API_MODELS."""
+    return {inflection.underscore(model._meta.object_name): model for model in API_MODELS}
+
+
+def label_expression(model, path):
+    """Expression for ``str()`` of the ``model`` row at the relation ``path``, or None."""
+    if model is Location:
+        return null_if_unrelated(path, Coalesce(f'{path}__display_name', f'{path}__name', models.Value('Unnamed Location')))
+    if model is PhoneNumberRange:
+        return null_if_unrelated(path, Concat(
+            f'{path}__start_number', models.Value(' - '), Coalesce(f'{path}__end_number', f'{path}__start_number'),
+        ))
+    field_name = LABEL_FIELDS.get(model)
+    if field_name is None:
+        field_name = next(
+            (field.name for field in model._meta.concrete_fields if field.name == 'name' or field.name.endswith('_name')),
+            None,
+        )
+    return models.F(f'{path}__{field_name}') if field_name else None
+
+
+def null_if_unrelated(path, expression):
+    """``expression``, or NULL where there is no related row: Concat and Coalesce would otherwise make up a label."""
+    return models.Case(
+        models.When(**{f'{path}__isnull': True}, then=models.Value(None)),
+        default=expression,
+        output_field=models.CharField(),
+    )
+
+
+def row_values(model):
+    """``(columns, labels)`` to pass to values(): concrete column attnames and FK label expressions."""
+    columns, labels = [], {}
+    for field in model._meta.concrete_fields:
+        columns.append(field.attname)
+        if field.is_relation:
+            expression = label_expression(field.related_model, field.name)
+            if expression is not None:
+                labels[f'{field.name}_label'] = expression
+    return columns, labels
+
+
+def iter_chunks(queryset, after=None, limit=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield the values() rows of ``queryset`` in primary key order as lists,
+    one keyset chunk (``pk > last seen``) per query.
+    """
+    pk_name = queryset.model._meta.pk.attname
+    queryset = queryset.order_by('pk')
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        chunk = queryset.filter(pk__gt=after) if after is not None else queryset
+        rows = list(chunk[:size])
+        if rows:
+            yield rows
+        if len(rows) < size:
+            return
+        after = rows[-1][pk_name]
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def ndjson_chunks(chunks):
+    encoder = DjangoJSONEncoder()
+    for rows in chunks:
+        yield ''.join(f'{encoder.encode(row)}\n' for row in rows)
+
+
+@require_GET
+def api_index(request):
+    return JsonResponse({
+        name: request.build_absolute_uri(reverse('telephony:api_list', args=[name]))
+        for name in sorted(api_models())
+    })
+
+
+@require_GET
+def api_list(request, model_name):
+    model = api_models().get(model_name)
+    if model is None:
+        raise Http404(f"No API for {model_name!r}.")
+
+    params = request.GET.copy()
+    try:
+        after = params.pop('after', [None])[-1]
+        after = model._meta.pk.to_python(after) if after not in (None, '') else None
+        limit = params.pop('limit', [None])[-1]
+        limit = int(limit) if limit not in (None, '') else None
+    except (ValueError, ValidationError) as e:
+        return JsonResponse({'error': f"Invalid after/limit: {e}"}, status=400)
+    if limit is not None and limit < 1:
+        return JsonResponse({'error': 'limit must be positive'}, status=400)
+
+    filterset_class = getattr(filters, f'{model._meta.object_name}Filter', None) or filterset_factory(model, fields=[])
+    filterset = filterset_class(params, queryset=model._default_manager.all())
+    if not filterset.is_valid():
+        return JsonResponse({'errors': filterset.errors}, status=400)
+
+    columns, labels = row_values(model)
+    chunks = iter_chunks(filterset.qs.values(*columns, **labels), after=after, limit=limit)
+    return StreamingHttpResponse(ndjson_chunks(chunks), content_type='application/x-ndjson')
@@ -0,0 +1,155 @@
+# telephony/bulk_delete.py
+"""
+Bulk deletes that are estimated first and then run in bounded chunks.
+
+``estimate()`` is a dry run: it follows the same on_delete rules as Django's
+Collector, but with COUNT queries instead of loading rows, and returns per
+model how many rows would be deleted, updated (SET_DEFAULT/SET_NULL) or would
+block the delete (PROTECT/RESTRICT).
+
+``delete_in_chunks()`` removes the selection CHUNK_SIZE rows at a time,
+dependents first: rows that cascade are deleted and rows that fall back to a
+default or NULL are updated, each in chunks of their own, before the chunk
+of selected rows itself is deleted. Every chunk is its own short transaction,
+so deleting a location or range that owns a million numbers never holds the
+DID table locked for long. A delete interrupted part way leaves only whole
+chunks done and can simply be run again.
+
+Selections over INLINE_LIMIT affected rows are run by the
+``bulk_delete_rows`` Celery task instead of in the request, pinned to the
+rows that were estimated: the task skips rows created since, and gives up if
+the selection no longer has the estimated size.
+"""
+from collections import defaultdict
+from django.db import models, transaction
+from .bulk_edit import BulkEditError
+
+CHUNK_SIZE = 1000
+INLINE_LIMIT = 1000
+
+UPDATE = 'updated'
+DELETE = 'deleted'
+BLOCK = 'protected'
+
+
+def _action(on_delete):
+    if on_delete is models.CASCADE:
+        return DELETE
+    if on_delete in (models.PROTECT, models.RESTRICT):
+        return BLOCK
+    if on_delete is models.DO_NOTHING:
+        return None
+    return UPDATE  # SET_NULL, SET_DEFAULT, SET(...)
+
+
+def _dependents(model):
+    """``(relation, action)`` for each foreign key pointing at ``model``."""
+    return [
+        (relation, _action(relation.on_delete))
+        for relation in model._meta.related_objects
+        if relation.one_to_many or relation.one_to_one
+    ]
+
+
+def _related_rows(relation, selection):
+    return relation.related_model._base_manager.filter(**{f'{relation.field.name}__in': selection})
+
+
+def _new_value(relation):
+    """What SET_NULL/SET_DEFAULT writes; other handlers, e.g. SET(...), are left to the Collector."""
+    if relation.on_delete is models.SET_NULL:
+        return None
+    return relation.field.get_default()
+
+
+def estimate(queryset):
+    """``{model label: {'deleted'|'updated'|'protected': rows}}`` for deleting ``queryset``."""
+    counts = defaultdict(lambda: defaultdict(int))
+
+    def visit(selection):
+        model = selection.model
+        deleted = selection.count()
+        counts[model._meta.label][DELETE] += deleted
+        if not deleted:
+            return
+        for relation, action in _dependents(model):
+            related = _related_rows(relation, selection.values('pk'))
+            if action == DELETE:
+                visit(related)
+            elif action is not None:
+                counts[relation.related_model._meta.label][action] += related.count()
+
+    visit(queryset)
+    return {label: dict(actions) for label, actions in counts.items() if any(actions.values())}
+
+
+def affected_rows(counts):
+    return sum(rows for actions in counts.values() for action, rows in actions.items() if action != BLOCK)
+
+
+def check_deletable(queryset, counts=None):
+    """Raise BulkEditError if the selection can't be deleted: protected dependents, or a sentinel row others default to."""
+    counts = counts if counts is not None else estimate(queryset)
+    blocked = {label: actions[BLOCK] for label, actions in counts.items() if actions.get(BLOCK)}
+    if blocked:
+        raise BulkEditError({'__all__': [f"{rows} {label} rows still refer to the selection." for label, rows in blocked.items()]})
+    for relation, _ in _dependents(queryset.model):
+        if relation.on_delete is models.SET_DEFAULT and queryset.filter(pk=relation.field.get_default()).exists():
+            raise BulkEditError({'__all__': [
+                f"The selection includes the default {queryset.model._meta.verbose_name}, "
+                f"which {relation.related_model._meta.verbose_name} rows fall back to."
+            ]})
+    return counts
+
+
+def _update_in_chunks(rows, attname, value, chunk_size, counts):
+    label = rows.model._meta.label
+    while True:
+        # Updated rows no longer match, so each pass takes the next chunk
+        pks = list(rows.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return
+        with transaction.atomic():
+            counts[label][UPDATE] += rows.model._base_manager.filter(pk__in=pks).update(**{attname: value})
+
+
+def _delete_in_chunks(selection, chunk_size, counts, progress):
+    model = selection.model
+    while True:
+        pks = list(selection.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return
+        for relation, action in _dependents(model):
+            related = _related_rows(relation, pks)
+            if action == DELETE:
+                _delete_in_chunks(related, chunk_size, counts, None)
+            elif relation.on_delete in (models.SET_NULL, models.SET_DEFAULT):
+                _update_in_chunks(related, relation.field.attname, _new_value(relation), chunk_size, counts)
+        with transaction.atomic():
+            _, deleted = model._base_manager.filter(pk__in=pks).delete()
+        for label, rows in deleted.items():
+            counts[label][DELETE] += rows
+        if progress:
+            progress(len(pks))
+
+
+def delete_in_chunks(queryset, chunk_size=CHUNK_SIZE, progress_callback=None):
+    """
+    Delete ``queryset`` and everything that cascades from it in chunks of
+    ``chunk_size``, see the module docstring. ``progress_callback``, if given,
+    is called with the number of selected rows deleted so far after each
+    chunk. Returns counts in the shape estimate() returns.
+    """
+    check_deletable(queryset)
+    counts = defaultdict(lambda: defaultdict(int))
+    done = 0
+
+    def progress(rows):
+        nonlocal done
+        done += rows
+        if progress_callback:
+            progress_callback(done)
+
+    _delete_in_chunks(queryset, chunk_size, counts, progress)
+    return {label: dict(actions) for label, actions in counts.items()}
+
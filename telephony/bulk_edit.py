@@ -0,0 +1,198 @@
+# telephony/bulk_edit.py
+"""
+Validated bulk edits for the batch edit endpoints.
+
+Only the fields listed in EDITABLE_FIELDS can be changed in bulk: fields that
+need per-row work on save (phone number normalization, geocoding, site ids)
+are left out. Submitted values are cleaned once per request by the model
+form's own fields, so a foreign key is checked to exist and cast to its id
+and every other value goes through the form's validation.
+
+The rows to change are given either as ``ids`` (at most MAX_IDS) or as a
+``filter``: a dict of the list view's filter parameters, which can address
+any number of rows but must set at least one of them to a value, since a
+filter whose values are all blank would select the whole table. They are
+updated in primary key order, CHUNK_SIZE at a time, by UPDATE statements that
+only touch rows where a value actually differs, all inside one transaction. ``updated_at`` is set on the rows
+changed. The result counts, per field, the rows whose value changed.
+"""
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+from django_filters.constants import EMPTY_VALUES
+from django_filters.filterset import filterset_factory
+from . import filters, forms
+from .models import Location, CircuitDetail, PhoneNumber, PhoneNumberRange
+
+CHUNK_SIZE = 5000
+MAX_IDS = 10_000
+
+EDITABLE_FIELDS = {
+    PhoneNumber: (
+        forms.PhoneNumberForm,
+        ['location', 'usage_type', 'service_provider', 'circuit', 'is_active', 'assigned_to', 'status',
+         'number_format', 'last_used_at', 'activation_date', 'deactivation_date', 'notes', 'comments'],
+    ),
+    PhoneNumberRange: (
+        forms.PhoneNumberRangeForm,
+        ['location', 'usage_type', 'service_provider', 'circuit', 'notes'],
+    ),
+    CircuitDetail: (
+        forms.CircuitDetailForm,
+        ['provider', 'location', 'connection_type', 'switch_type', 'voice_channel_count', 'supported_codecs',
+         'bandwidth', 'contract_details', 'notes'],
+    ),
+    Location: (
+        forms.LocationForm,
+        ['display_name', 'location_function', 'contact_person', 'contact_email', 'timezone', 'site_dial_code',
+         'trunk_access_code', 'notes'],
+    ),
+}
+
+
+class BulkEditError(Exception):
+    """``errors`` maps a field (or ``ids``/``filter``) to its messages."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def clean_changes(model, data, allowed=None):
+    """
+    ``{attname: value}`` for the submitted ``data``, cleaned by the model
+    form's fields. An empty string leaves a field unchanged; None clears it.
+    Raises BulkEditError.
+    """
+    form_class, fields = EDITABLE_FIELDS.get(model, (None, []))
+    if allowed is not None:
+        fields = [name for name in fields if name in allowed]
+    changes, errors = {}, {}
+    for name, value in data.items():
+        if value == '':
+            continue
+        if name not in fields:
+            errors[name] = ['This field cannot be edited in bulk.']
+            continue
+        form_field = form_class.base_fields[name]
+        try:
+            value = form_field.clean('' if value is None else value)
+        except ValidationError as e:
+            errors[name] = e.messages
+            continue
+        model_field = model._meta.get_field(name)
+        if model_field.is_relation:
+            value = value.pk if value is not None else None
+        elif value in (None, '') and not model_field.null:
+            value = ''
+        changes[model_field.attname] = value
+    if errors:
+        raise BulkEditError(errors)
+    if not changes:
+        raise BulkEditError({'data': ['No fields to update.']})
+    return changes
+
+
+def select(model, ids=None, filter_params=None):
+    """The rows to edit, by ``ids`` or by the list view's filters. Raises BulkEditError."""
+    if ids is not None:
+        if not isinstance(ids, list) or not ids:
+            raise BulkEditError({'ids': ['Provide a non-empty list of ids.']})
+        if len(ids) > MAX_IDS:
+            raise BulkEditError({'ids': [f'At most {MAX_IDS} ids can be sent; select larger sets with a filter.']})
+        try:
+            ids = [model._meta.pk.to_python(pk) for pk in ids]
+        except ValidationError as e:
+            raise BulkEditError({'ids': e.messages})
+        return model.objects.filter(pk__in=ids)
+
+    if not filter_params or not isinstance(filter_params, dict):
+        raise BulkEditError({'filter': ['Provide ids or a non-empty filter.']})
+    filterset_class = getattr(filters, f'{model._meta.object_name}Filter', None) or filterset_factory(model, fields=[])
+    filterset = filterset_class(filter_params, queryset=model.objects.all())
+    unknown = set(filter_params) - set(filterset.filters)
+    if unknown:
+        raise BulkEditError({'filter': [f"Unknown filter {name!r}." for name in sorted(unknown)]})
+    if not filterset.is_valid():
+        raise BulkEditError({f'filter.{name}': messages for name, messages in filterset.errors.items()})
+    # django-filter skips a filter whose value is blank, so these would match every row
+    if all(value in EMPTY_VALUES for value in filterset.form.cleaned_data.values()):
+        raise BulkEditError({'filter': ['Give at least one filter a value; an empty filter would select every row.']})
+    return filterset.qs
+
+
+def _differs(attname, value):
+    return ~models.Q(**{attname: value})
+
+
+def apply_changes(queryset, changes, chunk_size=CHUNK_SIZE):
+    """
+    Write ``changes`` to the rows of ``queryset`` in chunked UPDATEs inside one
+    transaction. Returns ``{'matched': rows selected, 'updated': rows changed,
+    'fields': {field: rows whose value changed}}``.
+    """
+    model = queryset.model
+    has_updated_at = any(field.name == 'updated_at' for field in model._meta.concrete_fields)
+    member_changes = {}
+    if model is PhoneNumberRange:
+        # Members carry copies of their range's foreign keys
+        member_changes = {
+            attname: value for attname, value in changes.items()
+            if attname in {f'{name}_id' for name in PhoneNumberRange.MEMBER_FIELDS}
+        }
+    names = {field.attname: field.name for field in model._meta.concrete_fields if field.attname in changes}
+    any_differs, member_differs = models.Q(), models.Q()
+    for attname, value in changes.items():
+        any_differs |= _differs(attname, value)
+    for attname, value in member_changes.items():
+        member_differs |= _differs(attname, value)
+
+    result = {'matched': 0, 'updated': 0, 'fields': dict.fromkeys(names.values(), 0)}
+    if member_changes:
+        result['phone_numbers'] = 0
+    now = timezone.now()
+    values = {**changes, 'updated_at': now} if has_updated_at else changes
+    lower = None
+    with transaction.atomic():
+        while True:
+            # A chunk is the next chunk_size selected rows, pinned by pk: once
+            # the first UPDATE has run, the selection's own conditions may no
+            # longer match them (a filter on the field being edited)
+            chunk = queryset if lower is None else queryset.filter(pk__gt=lower)
+            pks = list(chunk.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+            rows = model._default_manager.filter(pk__in=pks)
+            counts = rows.aggregate(matched=models.Count('pk'), **{
+                f'changed_{names[attname]}': models.Count('pk', filter=_differs(attname, value))
+                for attname, value in changes.items()
+            })
+            result['matched'] += counts['matched']
+            for name in result['fields']:
+                result['fields'][name] += counts[f'changed_{name}']
+            result['updated'] += rows.filter(any_differs).update(**values)
+            if member_changes:
+                result['phone_numbers'] += (
+                    PhoneNumber.objects.filter(phone_number_range_id__in=pks).filter(member_differs)
+                    .update(**member_changes, updated_at=now)
+                )
+            if len(pks) < chunk_size:
+                break
+            lower = pks[-1]
+    return result
+
+
+def bulk_edit(model, payload, allowed=None):
+    """
+    Run a bulk edit request: ``payload`` holds ``ids`` or ``filter`` and the
+    new values under ``data`` (or ``update_data``, or at the top level as the
+    batch edit form posts them). Raises BulkEditError.
+    """
+    data = payload.get('data', payload.get('update_data'))
+    if data is None:
+        data = {name: value for name, value in payload.items() if name not in ('ids', 'filter', 'csrfmiddlewaretoken')}
+    if not isinstance(data, dict):
+        raise BulkEditError({'data': ['Provide the new values as a "data" object.']})
+    changes = clean_changes(model, data, allowed)
+    queryset = select(model, payload.get('ids'), payload.get('filter'))
+    return apply_changes(queryset, changes)
@@ -0,0 +1,249 @@
+# telephony/exports.py
+"""
+CSV and XLSX export of the phone number, range, circuit and location tables.
+
+An export has the columns of the model's list view (``table_headers`` and
+``table_fields``), foreign keys rendered by their label as in the table, and
+honours the same filter query string. Rows are read with
+``values_list().iterator(chunk_size=EXPORT_CHUNK_SIZE)``, a server-side cursor
+on PostgreSQL, and written out a chunk at a time, so an export of any size
+holds only one chunk of rows and its encoded output in memory.
+
+XLSX is written directly as a streamed zip of worksheet XML with inline
+strings, so it needs no spreadsheet library. A sheet holds at most
+XLSX_MAX_ROWS rows (Excel's limit); longer exports continue on further sheets.
+"""
+import csv
+import io
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django_filters.filterset import filterset_factory
+from .api import label_expression
+from .views import PhoneNumberListView, PhoneNumberRangeListView, CircuitListView, LocationListView
+
+EXPORT_CHUNK_SIZE = 2000
+XLSX_MAX_ROWS = 1_048_576
+
+EXPORTS = {
+    'phone_number': PhoneNumberListView,
+    'phone_number_range': PhoneNumberRangeListView,
+    'circuit_detail': CircuitListView,
+    'location': LocationListView,
+}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Characters XML 1.0 does not allow, even escaped
+ILLEGAL_XML_CHARS_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def export_queryset(list_view, params=None):
+    """The list view's rows, filtered by ``params`` as the list view would be."""
+    model = list_view.model
+    filterset_class = list_view.filterset_class or filterset_factory(model, fields=[])
+    filterset = filterset_class(params or None, queryset=model._default_manager.all())
+    if filterset.is_bound and not filterset.is_valid():
+        raise ValueError(dict(filterset.errors))
+    return filterset.qs
+
+
+def export_rows(list_view, queryset):
+    """Yield lists of up to EXPORT_CHUNK_SIZE row tuples in the list view's columns."""
+    model = list_view.model
+    columns = []
+    for name in list_view.table_fields:
+        field = model._meta.get_field(name)
+        columns.append(label_expression(field.related_model, name) if field.is_relation else name)
+    rows = queryset.order_by('pk').values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def csv_chunks(headers, chunks):
+    """Yield the CSV text for the header row, then for each chunk of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    yield buffer.getvalue()
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+class _ZipBuffer:
+    """Write-only file for zipfile; the zip data is collected here and drained as it is produced."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def _column_name(index):
+    name = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(65 + remainder) + name
+    return name
+
+
+def _xlsx_cell(reference, value):
+    if value is None or value == '':
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{reference}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c r="{reference}"><v>{value}</v></c>'
+    text = escape(ILLEGAL_XML_CHARS_RE.sub('', str(value)))
+    return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(number, columns, values):
+    cells = ''.join(_xlsx_cell(f'{column}{number}', value) for column, value in zip(columns, values))
+    return f'<row r="{number}">{cells}</row>'
+
+
+XLSX_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+XLSX_SHEET_END = '</sheetData></worksheet>'
+
+
+def _xlsx_package_parts(sheet_count):
+    sheets = range(1, sheet_count + 1)
+    return {
+        '[Content_Types].xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + ''.join(
+                f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for n in sheets
+            )
+            + '</Types>'
+        ),
+        '_rels/.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ),
+        'xl/workbook.xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + ''.join(f'<sheet name="Sheet{n}" sheetId="{n}" r:id="rId{n}"/>' for n in sheets)
+            + '</sheets></workbook>'
+        ),
+        'xl/_rels/workbook.xml.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + ''.join(
+                f'<Relationship Id="rId{n}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{n}.xml"/>'
+                for n in sheets
+            )
+            + '</Relationships>'
+        ),
+    }
+
+
+def xlsx_chunks(headers, chunks):
+    """
+    Yield an XLSX workbook as bytes, a compressed chunk of rows at a time.
+    Every sheet starts with the header row.
+    """
+    buffer = _ZipBuffer()
+    columns = [_column_name(index) for index in range(len(headers))]
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        sheet_count = 0
+        sheet = None
+        row_number = XLSX_MAX_ROWS
+        for rows in chunks:
+            parts = []
+            for row in rows:
+                if row_number == XLSX_MAX_ROWS:
+                    if sheet is not None:
+                        sheet.write(''.join(parts + [XLSX_SHEET_END]).encode())
+                        sheet.close()
+                        parts = []
+                    sheet_count += 1
+                    sheet = archive.open(f'xl/worksheets/sheet{sheet_count}.xml', 'w', force_zip64=True)
+                    parts.append(XLSX_SHEET_START + _xlsx_row(1, columns, headers))
+                    row_number = 1
+                row_number += 1
+                parts.append(_xlsx_row(row_number, columns, row))
+            sheet.write(''.join(parts).encode())
+            yield buffer.drain()
+        if sheet is None:
+            sheet_count = 1
+            sheet = archive.open('xl/worksheets/sheet1.xml', 'w')
+            sheet.write((XLSX_SHEET_START + _xlsx_row(1, columns, headers)).encode())
+        sheet.write(XLSX_SHEET_END.encode())
+        sheet.close()
+        for name, content in _xlsx_package_parts(sheet_count).items():
+            archive.writestr(name, content)
+    yield buffer.drain()
+
+
+WRITERS = {
+    'csv': csv_chunks,
+    'xlsx': xlsx_chunks,
+}
+
+
+def export_chunks(model_name, file_format, params=None):
+    """
+    Yield the encoded export of ``model_name`` in ``file_format``. Raises
+    KeyError for an unknown model or format and ValueError for invalid filters.
+    """
+    list_view = EXPORTS[model_name]
+    writer = WRITERS[file_format]
+    queryset = export_queryset(list_view, params)
+    return writer(list_view.table_headers, export_rows(list_view, queryset))
+
+
+@require_GET
+def export_table(request, model_name, file_format):
+    if model_name not in EXPORTS:
+        raise Http404(f"No export for {model_name!r}.")
+    if file_format not in WRITERS:
+        raise Http404(f"Unknown export format {file_format!r}.")
+    params = request.GET.copy()
+    try:
+        chunks = export_chunks(model_name, file_format, params)
+    except ValueError as e:
+        return HttpResponseBadRequest(f"Invalid filter: {e}")
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{model_name}.{file_format}"'
+    return response
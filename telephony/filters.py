@@ -0,0 +1,106 @@
+# telephony/filters.py
+import django_filters
+from .models import Location, CircuitDetail, PhoneNumberRange, PhoneNumber, ServiceProvider, LocationFunction, ServiceProviderRep, UsageType, SwitchType, ConnectionType
+
+
+class ServiceProviderFilter(django_filters.FilterSet):
+    class Meta:
+        model = ServiceProvider
+        fields = {
+            'provider_name': ['icontains'],
+            'contract_number': ['icontains'],
+        }
+
+
+class ServiceProviderRepFilter(django_filters.FilterSet):
+    class Meta:
+        model = ServiceProviderRep
+        fields = {
+            'account_rep_name': ['icontains'],
+            'provider': ['exact'],
+        }
+
+
+class LocationFilter(django_filters.FilterSet):
+    class Meta:
+        model = Location
+        fields = {
+            'name': ['icontains'],
+            'site_id': ['istartswith'],
+            'city': ['icontains'],
+            'state': ['iexact'],
+            'country': ['exact'],
+            'verified_location': ['exact'],
+        }
+
+
+class LocationFunctionFilter(django_filters.FilterSet):
+    class Meta:
+        model = LocationFunction
+        fields = {
+            'function_name': ['icontains'],
+        }
+
+
+class PhoneNumberFilter(django_filters.FilterSet):
+    class Meta:
+        model = PhoneNumber
+        fields = {
+            'directory_number': ['startswith'],
+            'country': ['exact'],
+            'location': ['exact'],
+            'usage_type': ['exact'],
+            'service_provider': ['exact'],
+            'status': ['exact'],
+            'assigned_to': ['icontains'],
+            'is_active': ['exact'],
+        }
+
+
+class PhoneNumberRangeFilter(django_filters.FilterSet):
+    class Meta:
+        model = PhoneNumberRange
+        fields = {
+            'start_number': ['startswith'],
+            'country': ['exact'],
+            'location': ['exact'],
+            'usage_type': ['exact'],
+            'service_provider': ['exact'],
+        }
+
+
+class UsageTypeFilter(django_filters.FilterSet):
+    class Meta:
+        model = UsageType
+        fields = {
+            'usage_type': ['icontains'],
+            'usage_for': ['exact'],
+        }
+
+
+class CircuitDetailFilter(django_filters.FilterSet):
+    class Meta:
+        model = CircuitDetail
+        fields = {
+            'circuit_number': ['icontains'],
+            'provider': ['exact'],
+            'location': ['exact'],
+            'connection_type': ['exact'],
+            'switch_type': ['exact'],
+        }
+
+
+class SwitchTypeFilter(django_filters.FilterSet):
+    class Meta:
+        model = SwitchType
+        fields = {
+            'switch_type_name': ['icontains'],
+        }
+
+
+class ConnectionTypeFilter(django_filters.FilterSet):
+    class Meta:
+        model = ConnectionType
+        fields = {
+            'connection_type_name': ['icontains'],
+        }
@@ -1,5 +1,4 @@
 import requests
-import googlemaps
 import django_filters
 from django import forms
 from django.conf import settings
@@ -7,6 +6,8 @@ from django.core.validators import RegexValidator
 from django.core.exceptions import ValidationError
 import ipaddress
 from .templatetags import custom_filters
+from . import reference_data
+from .geocoding import GeocodingError, geocode, lookup_timezone
 from .models import Location, CircuitDetail, PhoneNumberRange, PhoneNumber, Country, ServiceProvider, LocationFunction, ServiceProviderRep, UsageType, SwitchType, ConnectionType
 
 
@@ -21,6 +22,54 @@ ipv6_validator = RegexValidator(
     message="Enter a valid IPv6 address"
 )
 
+class ReferenceChoiceIterator(forms.models.ModelChoiceIterator):
+    def __iter__(self):
+        if not self.field.serves_whole_table():
+            yield from super().__iter__()
+            return
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in reference_data.rows(self.queryset.model):
+            yield self.choice(obj)
+
+    def __len__(self):
+        if not self.field.serves_whole_table():
+            return super().__len__()
+        return len(reference_data.rows(self.queryset.model)) + (1 if self.field.empty_label is not None else 0)
+
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """
+    A ModelChoiceField over a lookup table, rendered and validated from
+    telephony.reference_data. A field whose queryset is narrowed (by
+    ``limit_choices_to`` or by the form) falls back to the database, since the
+    cache only holds whole tables.
+    """
+    iterator = ReferenceChoiceIterator
+
+    def serves_whole_table(self):
+        return not self.queryset.query.has_filters() and not self.get_limit_choices_to()
+
+    def to_python(self, value):
+        if not self.serves_whole_table():
+            return super().to_python(value)
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        obj = reference_data.get(self.queryset.model, pk=value)
+        if obj is None:
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value})
+        return obj
+
+
+def reference_formfield(db_field, **kwargs):
+    """ModelForm ``formfield_callback`` that serves foreign keys to cached lookup tables from memory."""
+    if db_field.is_relation and db_field.many_to_one and reference_data.is_cached(db_field.related_model):
+        kwargs.setdefault('form_class', ReferenceChoiceField)
+    return db_field.formfield(**kwargs)
+
+
 class CircuitDetailForm(forms.ModelForm):
     ipv4_address = forms.CharField(
         max_length=15,
@@ -37,6 +86,7 @@ class CircuitDetailForm(forms.ModelForm):
 
     class Meta:
         model = CircuitDetail
+        formfield_callback = reference_formfield
         fields = [
             'circuit_number', 'provider', 'location', 'btn', 'voice_channel_count',
             'connection_type', 'ipv4_address', 'ipv6_address', 'supported_codecs', 'switch_type', 'bandwidth',
@@ -107,10 +157,21 @@ class LocationForm(forms.ModelForm):
 
     def clean(self):
         cleaned_data = super().clean()
-        submitted_address = f"{cleaned_data.get('house_number')} {cleaned_data.get('road')}, {cleaned_data.get('city')}, {cleaned_data.get('state_abbreviation')} {cleaned_data.get('postcode')}, {cleaned_data.get('country').name}"
-
-        gmaps = googlemaps.Client(key=settings.GOOGLE_API_KEY)
-        geocode_result = gmaps.geocode(submitted_address)
+        # The same string Location.geocode_address() builds, so the form and
+        # the model share cache entries
+        submitted_address = Location(
+            house_number=cleaned_data.get('house_number'),
+            road=cleaned_data.get('road'),
+            city=cleaned_data.get('city'),
+            state=cleaned_data.get('state') or cleaned_data.get('state_abbreviation'),
+            postcode=cleaned_data.get('postcode'),
+            country=cleaned_data.get('country'),
+        ).geocode_address()
+
+        try:
+            geocode_result = geocode(submitted_address)
+        except GeocodingError:
+            raise forms.ValidationError('Address could not be verified.')
 
         if not geocode_result:
             raise forms.ValidationError('Invalid address')
@@ -144,23 +205,30 @@ class LocationForm(forms.ModelForm):
         cleaned_data['postcode'] = extracted_address.get('postal_code', '')
         country_code = extracted_address.get('country', '') 
         if country_code:
-            try:
-                country_instance = Country.objects.get(iso2_code=country_code)
-            except Country.DoesNotExist:
-                try:
-                    country_instance = Country.objects.get(iso3_code=country_code)
-                except Country.DoesNotExist:
-                    try:
-                        country_instance = Country.objects.get(name=country_code)
-                    except Country.DoesNotExist:
-                        raise forms.ValidationError(f'Country with code "{country_code}" does not exist in the database')
+            country_instance = (
+                reference_data.get(Country, iso2=country_code)
+                or reference_data.get(Country, iso3=country_code)
+                or reference_data.get(Country, name=country_code)
+            )
+            if country_instance is None:
+                raise forms.ValidationError(f'Country with code "{country_code}" does not exist in the database')
             cleaned_data['country'] = country_instance
 
         cleaned_data['longitude'] = geo_location['lng']
         cleaned_data['latitude'] = geo_location['lat']
         
         cleaned_data['verified_location'] = True
-        
+
+        # Google's answer stands for the normalized address as well; without
+        # this, validating the instance would geocode it a second time
+        location = self.instance
+        for field in ('house_number', 'road', 'city', 'state', 'postcode', 'country'):
+            setattr(location, field, cleaned_data.get(field))
+        location.formatted_address = geocode_result[0].get('formatted_address', '')
+        location.google_maps_place_id = geocode_result[0].get('place_id', '')
+        location.mark_verified()
+        location.mark_address_verified()
+
         return cleaned_data
 
     def save(self, commit=True):
@@ -186,15 +254,18 @@ class LocationForm(forms.ModelForm):
         location.trunk_access_code = self.cleaned_data.get('trunk_access_code', '')
         location.notes = self.cleaned_data.get('notes', '')
 
-        gmaps = googlemaps.Client(key=settings.GOOGLE_API_KEY)
-        timezone_result = gmaps.timezone((location.latitude, location.longitude))
-        location.timezone = timezone_result['timeZoneId']
+        if location.latitude is not None and location.longitude is not None:
+            try:
+                location.timezone = lookup_timezone(location.latitude, location.longitude)
+            except GeocodingError:
+                pass  # Keep whatever time zone was already recorded.
         if commit:
             location.save()
         return location
 
     class Meta:
         model = Location
+        formfield_callback = reference_formfield
         fields = [
             'site_id',
             'display_name',
@@ -252,6 +323,7 @@ class LocationFunctionForm(forms.ModelForm):
 class PhoneNumberRangeForm(forms.ModelForm):
     class Meta:
         model = PhoneNumberRange
+        formfield_callback = reference_formfield
         fields = ['start_number', 'end_number', 'country', 'location', 'usage_type', 'notes']
 
 class SearchForm(forms.Form):
@@ -261,6 +333,7 @@ class SearchForm(forms.Form):
 class PhoneNumberForm(forms.ModelForm):
     class Meta:
         model = PhoneNumber
+        formfield_callback = reference_formfield
         fields = [
             'directory_number',
             'country',
@@ -297,6 +370,7 @@ class PhoneNumberForm(forms.ModelForm):
 class PhoneNumberRangeForm(forms.ModelForm):
     class Meta:
         model = PhoneNumberRange
+        formfield_callback = reference_formfield
         fields = [
             'start_number',
             'end_number',
@@ -305,6 +379,7 @@ class PhoneNumberRangeForm(forms.ModelForm):
             'location', 
             'usage_type',
             'circuit',
+            'sparse',
             'notes',
         ]
         
@@ -344,6 +419,7 @@ class ServiceProviderForm(forms.ModelForm):
 class ServiceProviderRepForm(forms.ModelForm):
     class Meta:
         model = ServiceProviderRep
+        formfield_callback = reference_formfield
         fields = [
             'provider', 'account_rep_name', 'account_rep_phone', 
             'account_rep_email', 'notes'
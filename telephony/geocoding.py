@@ -0,0 +1,140 @@
+# telephony/geocoding.py
+"""
+Single entry point for Google Maps geocoding and time zone lookups.
+
+Every response is cached in GeocodeCacheEntry keyed on the normalized query,
+so re-validating or re-saving an unchanged Location never leaves the process.
+Entries expire after GEOCODE_CACHE_TTL (ZERO_RESULTS answers after the shorter
+GEOCODE_CACHE_NEGATIVE_TTL) and the least recently used ones are evicted once
+the table grows past GEOCODE_CACHE_MAX_ENTRIES. A hit only writes its
+``last_used_at`` back when that is older than GEOCODE_CACHE_TOUCH_INTERVAL, so
+reads stay reads and eviction order is kept to that granularity.
+
+``stats`` counts, per process, how lookups were answered: ``api_calls``,
+``cache_hits`` and ``skipped_unchanged`` (Location saves that did not need to
+geocode at all because no address field changed).
+"""
+import hashlib
+import logging
+import re
+from collections import Counter
+from datetime import timedelta
+import googlemaps
+from django.conf import settings
+from django.utils import timezone as django_timezone
+from .models import GeocodeCacheEntry
+
+logger = logging.getLogger(__name__)
+
+gmaps = googlemaps.Client(key=settings.GOOGLE_API_KEY)
+
+GEOCODE_CACHE_TTL = getattr(settings, 'GEOCODE_CACHE_TTL', timedelta(days=30))
+GEOCODE_CACHE_NEGATIVE_TTL = getattr(settings, 'GEOCODE_CACHE_NEGATIVE_TTL', timedelta(days=1))
+GEOCODE_CACHE_MAX_ENTRIES = getattr(settings, 'GEOCODE_CACHE_MAX_ENTRIES', 10000)
+GEOCODE_CACHE_TOUCH_INTERVAL = getattr(settings, 'GEOCODE_CACHE_TOUCH_INTERVAL', timedelta(hours=1))
+
+_MISSING = object()
+
+stats = Counter()
+
+
+class GeocodingError(Exception):
+    """
+    Raised when Google answers with anything other than OK or ZERO_RESULTS.
+    ``retriable`` is set for quota and transport failures worth retrying later.
+    """
+
+    def __init__(self, message, retriable=False):
+        super().__init__(message)
+        self.retriable = retriable
+
+
+_RETRIABLE_ERRORS = (googlemaps.exceptions._OverQueryLimit, googlemaps.exceptions.TransportError, googlemaps.exceptions.Timeout)
+
+
+def build_address(*parts):
+    """Join the non-empty address parts the way every call site submits them."""
+    return ', '.join(str(part).strip() for part in parts if part and str(part).strip())
+
+
+def normalize_address(address):
+    """Case, punctuation and whitespace-insensitive form of an address."""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', address.lower()).split())
+
+
+def _cache_key(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def _cache_get(kind, query):
+    now = django_timezone.now()
+    entry = GeocodeCacheEntry.objects.filter(kind=kind, key=_cache_key(query), expires_at__gt=now).first()
+    if entry is None:
+        return _MISSING
+    if entry.last_used_at <= now - GEOCODE_CACHE_TOUCH_INTERVAL:
+        GeocodeCacheEntry.objects.filter(pk=entry.pk).update(last_used_at=now)
+    return entry.response
+
+
+def _cache_set(kind, query, status, response):
+    now = django_timezone.now()
+    ttl = GEOCODE_CACHE_TTL if status == 'OK' else GEOCODE_CACHE_NEGATIVE_TTL
+    GeocodeCacheEntry.objects.update_or_create(
+        kind=kind,
+        key=_cache_key(query),
+        defaults={
+            'query': query,
+            'status': status,
+            'response': response,
+            'last_used_at': now,
+            'expires_at': now + ttl,
+        },
+    )
+    _evict(now)
+
+
+def _evict(now):
+    GeocodeCacheEntry.objects.filter(expires_at__lte=now).delete()
+    overflow = GeocodeCacheEntry.objects.count() - GEOCODE_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        stale = GeocodeCacheEntry.objects.order_by('last_used_at').values_list('pk', flat=True)[:overflow]
+        GeocodeCacheEntry.objects.filter(pk__in=list(stale)).delete()
+
+
+def geocode(address):
+    """
+    Return the Google geocode results for ``address``; an empty list means
+    ZERO_RESULTS. Raises GeocodingError for every other API status.
+    """
+    query = normalize_address(address)
+    results = _cache_get('geocode', query)
+    if results is not _MISSING:
+        stats['cache_hits'] += 1
+        return results
+
+    stats['api_calls'] += 1
+    try:
+        results = gmaps.geocode(address)
+    except (googlemaps.exceptions.ApiError, googlemaps.exceptions.TransportError, googlemaps.exceptions.Timeout) as e:
+        logger.warning("Geocoding %r failed: %s", address, e)
+        raise GeocodingError(str(e), retriable=isinstance(e, _RETRIABLE_ERRORS)) from e
+
+    _cache_set('geocode', query, 'OK' if results else 'ZERO_RESULTS', results)
+    return results
+
+
+def lookup_timezone(latitude, longitude):
+    """Return the IANA time zone id for a coordinate, or None if Google has none."""
+    query = f"{float(latitude):.6f},{float(longitude):.6f}"
+    result = _cache_get('timezone', query)
+    if result is _MISSING:
+        stats['api_calls'] += 1
+        try:
+            result = gmaps.timezone((latitude, longitude))
+        except (googlemaps.exceptions.ApiError, googlemaps.exceptions.TransportError, googlemaps.exceptions.Timeout) as e:
+            logger.warning("Time zone lookup for %s failed: %s", query, e)
+            raise GeocodingError(str(e), retriable=isinstance(e, _RETRIABLE_ERRORS)) from e
+        _cache_set('timezone', query, result.get('status', 'OK'), result)
+    else:
+        stats['cache_hits'] += 1
+    return result.get('timeZoneId')
@@ -0,0 +1,475 @@
+# telephony/imports.py
+"""
+Bulk CSV import of phone numbers, ranges, circuits and locations.
+
+The CSV is read as a stream and handled BATCH_SIZE rows at a time. Columns are
+matched to model fields by field name or by the list view's header, so an
+export from telephony.exports imports back as is; a column left empty takes
+the field's default. Each batch:
+
+* resolves foreign keys from the label or id in the column, the reference
+  tables through telephony.reference_data and locations, circuits and ranges
+  from an in-memory map filled by one query per batch,
+* coerces every other column with the model field's own cleaning,
+* validates its phone numbers with ``normalization.normalize_many``,
+  rejecting a number whose calling code isn't that of the row's country, and
+  checks natural keys against the file so far and the table with one query,
+* and writes the rows that passed with a single bulk_create.
+
+Rows that fail are never written and are reported with their line number,
+column and message; the rest of the file is imported regardless. The import
+is not atomic: if the file can't be read to the end (bad encoding, malformed
+CSV), the rows read so far are still imported, and the result reports where it
+stopped in ``error`` alongside what was written. save() and
+full_clean() don't run, so locations are imported unverified (run
+``manage.py validate_locations`` to geocode them) and ranges are created
+without their numbers, which the caller provisions from ``created_ids``.
+"""
+import bisect
+import csv
+import io
+from collections import defaultdict
+from typing import NamedTuple
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
+from django.views.decorators.http import require_POST
+from . import normalization, reference_data
+from .exports import EXPORTS
+from .models import Country, Location, CircuitDetail, PhoneNumber, PhoneNumberRange
+from .tasks import provision_phone_number_range
+
+BATCH_SIZE = 2000
+
+BOOLEAN_VALUES = {
+    'true': True, 't': True, 'yes': True, 'y': True, '1': True,
+    'false': False, 'f': False, 'no': False, 'n': False, '0': False,
+}
+
+# Fields a row of a non-cached related table can be referred to by, besides its id
+RELATED_KEYS = {
+    Location: ('site_id', 'name', 'display_name'),
+    CircuitDetail: ('circuit_number',),
+    PhoneNumberRange: ('start_number',),
+}
+
+
+class RowError(NamedTuple):
+    line: int
+    column: str
+    message: str
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.created_ids = []
+        self.errors = []
+        # Why the file could not be read to the end, if it couldn't
+        self.error = None
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'errors': [error._asdict() for error in self.errors],
+            'error': self.error,
+        }
+
+
+class RowInvalid(Exception):
+    def __init__(self, column, message):
+        super().__init__(message)
+        self.column = column
+        self.message = message
+
+
+def _error_message(error):
+    if isinstance(error, ValidationError):
+        return ' '.join(error.messages)
+    return str(error)
+
+
+class CSVImporter:
+    """
+    Imports one model. Subclasses set ``model``, ``natural_key`` (a unique
+    field checked for duplicates) and ``number_fields`` (phone number columns
+    normalized for the row's country), and may extend ``validate_batch()``.
+    """
+    model = None
+    natural_key = None
+    number_fields = ()
+    # Whether a number must carry the calling code of the row's country
+    match_country = True
+    # Required fields validate_batch() fills in when the file leaves them empty
+    implied_fields = ()
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.fields = {
+            field.name: field for field in self.model._meta.concrete_fields
+            if field.editable and not field.primary_key
+        }
+        self.related = {}
+        self.seen_keys = set()
+
+    # Columns
+
+    def column_fields(self, header):
+        """
+        ``{column: field name}`` for a CSV header; raises ValueError on an
+        unknown column or a missing required one.
+        """
+        aliases = {name.casefold(): name for name in self.fields}
+        for list_view in EXPORTS.values():
+            if list_view.model is self.model:
+                for label, name in zip(list_view.table_headers, list_view.table_fields):
+                    aliases.setdefault(label.casefold(), name)
+        columns, unknown = {}, []
+        for column in header:
+            name = aliases.get(column.strip().casefold())
+            if name is None:
+                unknown.append(column)
+            else:
+                columns[column] = name
+        if unknown:
+            raise ValueError(f"Unknown columns for {self.model._meta.verbose_name}: {', '.join(unknown)}")
+        missing = [
+            name for name, field in self.fields.items()
+            if name not in columns.values() and name not in self.implied_fields
+            and not field.has_default() and not field.blank
+        ]
+        if missing:
+            raise ValueError(f"Missing required columns for {self.model._meta.verbose_name}: {', '.join(missing)}")
+        return columns
+
+    # Related rows
+
+    def _related_key(self, model, raw):
+        return model, raw.strip().casefold()
+
+    def load_related(self, rows, columns):
+        """Fill the map of non-cached related rows named in a batch with one query per table."""
+        wanted = defaultdict(set)
+        for _, row in rows:
+            for column, name in columns.items():
+                field = self.fields[name]
+                raw = (row.get(column) or '').strip()
+                if field.is_relation and raw and not reference_data.is_cached(field.related_model):
+                    if self._related_key(field.related_model, raw) not in self.related:
+                        wanted[field.related_model].add(raw)
+        for model, values in wanted.items():
+            keys = RELATED_KEYS.get(model, ())
+            query = models.Q(pk__in=[int(value) for value in values if value.isdigit()])
+            for key in keys:
+                query |= models.Q(**{f'{key}__in': values})
+            for row in model._default_manager.filter(query).values('pk', *keys):
+                for key in ('pk', *keys):
+                    if row[key] not in (None, ''):
+                        self.related.setdefault(self._related_key(model, str(row[key])), row['pk'])
+            for value in values:
+                # Remember misses too, so a bad name costs one query per import
+                self.related.setdefault(self._related_key(model, value), None)
+
+    def related_pk(self, field, raw):
+        model = field.related_model
+        key = self._related_key(model, raw)
+        if key in self.related:
+            pk = self.related[key]
+        else:
+            # A reference table; remembered like the others so the cache's
+            # version check isn't paid per row
+            pk = None
+            indexes = ('name', 'iso2', 'iso3', 'pk') if model is Country else ('name', 'pk')
+            for index in indexes:
+                if index == 'pk' and not raw.isdigit():
+                    continue
+                row = reference_data.get(model, **{index: raw})
+                if row is not None:
+                    pk = row.pk
+                    break
+            self.related[key] = pk
+        if pk is None:
+            raise RowInvalid(field.name, f"{model._meta.verbose_name.capitalize()} {raw!r} does not exist.")
+        return pk
+
+    # Rows
+
+    def clean_value(self, field, raw):
+        if isinstance(field, models.BooleanField):
+            value = BOOLEAN_VALUES.get(raw.casefold())
+            if value is None:
+                raise RowInvalid(field.name, f"{raw!r} is not a yes/no value.")
+            return value
+        try:
+            return field.clean(raw, None)
+        except ValidationError as e:
+            raise RowInvalid(field.name, _error_message(e))
+
+    def build(self, row, columns):
+        """An unsaved instance from a CSV row; raises RowInvalid."""
+        values = {}
+        for column, name in columns.items():
+            field = self.fields[name]
+            raw = (row.get(column) or '').strip()
+            if not raw:
+                if field.has_default() or name in self.implied_fields:
+                    continue
+                if field.null:
+                    values[field.attname] = None
+                elif field.blank:
+                    values[field.attname] = ''
+                else:
+                    raise RowInvalid(name, 'This field is required.')
+            elif field.is_relation:
+                values[field.attname] = self.related_pk(field, raw)
+            else:
+                values[field.attname] = self.clean_value(field, raw)
+        return self.model(**values)
+
+    def normalize_numbers(self, entries, errors):
+        """Normalize ``number_fields`` in place, per country; returns the entries that passed."""
+        e164_codes = {country.pk: country.e164_code for country in reference_data.rows(Country)}
+        failed = set()
+        for name in self.number_fields:
+            by_country = defaultdict(list)
+            for entry in entries:
+                if getattr(entry[1], name):
+                    by_country[e164_codes.get(entry[1].country_id, '')].append(entry)
+            for e164_code, group in by_country.items():
+                results = normalization.normalize_many(
+                    [getattr(instance, name) for _, instance in group], e164_code, match_country=self.match_country,
+                )
+                for (line, instance), result in zip(group, results):
+                    if isinstance(result, normalization.PhoneNumberError):
+                        errors.append(RowError(line, name, str(result)))
+                        failed.add(line)
+                    else:
+                        self.number_normalized(instance, name, result)
+        return [entry for entry in entries if entry[0] not in failed]
+
+    def number_normalized(self, instance, name, normalized):
+        setattr(instance, name, normalized.e164)
+
+    def check_natural_keys(self, entries, errors):
+        """Drop rows whose natural key repeats an earlier row of the file or an existing row."""
+        if not self.natural_key:
+            return entries
+        keys = {getattr(instance, self.natural_key) for _, instance in entries} - {None, ''}
+        existing = set(
+            self.model._default_manager.filter(**{f'{self.natural_key}__in': keys})
+            .values_list(self.natural_key, flat=True)
+        )
+        passed = []
+        for line, instance in entries:
+            key = getattr(instance, self.natural_key)
+            if key in (None, ''):
+                passed.append((line, instance))
+            elif key in existing:
+                errors.append(RowError(line, self.natural_key, f"{key} already exists."))
+            elif key in self.seen_keys:
+                errors.append(RowError(line, self.natural_key, f"{key} appears earlier in the file."))
+            else:
+                self.seen_keys.add(key)
+                passed.append((line, instance))
+        return passed
+
+    def validate_batch(self, entries, errors):
+        """Batch-level checks on ``[(line, instance)]``; returns the entries that passed."""
+        entries = self.normalize_numbers(entries, errors)
+        return self.check_natural_keys(entries, errors)
+
+    def write(self, entries, result):
+        """bulk_create the batch; if the database rejects it, insert row by row to find the culprits."""
+        instances = [instance for _, instance in entries]
+        try:
+            with transaction.atomic():
+                created = self.model._default_manager.bulk_create(instances)
+        except IntegrityError:
+            created = []
+            with transaction.atomic():
+                for line, instance in entries:
+                    try:
+                        with transaction.atomic():
+                            created += self.model._default_manager.bulk_create([instance])
+                    except IntegrityError as e:
+                        result.errors.append(RowError(line, '', _error_message(e).strip()))
+        result.created += len(created)
+        result.created_ids.extend(instance.pk for instance in created if instance.pk is not None)
+
+    def process(self, rows, columns, result):
+        self.load_related(rows, columns)
+        entries = []
+        for line, row in rows:
+            try:
+                entries.append((line, self.build(row, columns)))
+            except RowInvalid as e:
+                result.errors.append(RowError(line, e.column, e.message))
+        errors = []
+        entries = self.validate_batch(entries, errors)
+        result.errors.extend(errors)
+        if entries:
+            self.write(entries, result)
+
+    def run(self, text):
+        """
+        Import CSV text from a file-like object; returns an ImportResult.
+        Raises ValueError (or UnicodeDecodeError) only for the header, before
+        anything is written; a file unreadable past that is imported up to the
+        point it fails, see ImportResult.error.
+        """
+        result = ImportResult()
+        reader = csv.DictReader(text)
+        columns = self.column_fields(reader.fieldnames or [])
+        rows = []
+        try:
+            for row in reader:
+                result.rows += 1
+                rows.append((reader.line_num, row))
+                if len(rows) == self.batch_size:
+                    self.process(rows, columns, result)
+                    rows = []
+        except (UnicodeDecodeError, csv.Error) as e:
+            # Earlier batches are committed; import what was read and say where it stopped
+            result.error = f"The file could not be read past line {reader.line_num}: {e}"
+        if rows:
+            self.process(rows, columns, result)
+        result.errors.sort(key=lambda error: error.line)
+        return result
+
+
+class PhoneNumberImporter(CSVImporter):
+    model = PhoneNumber
+    natural_key = 'directory_number'
+    number_fields = ('directory_number',)
+    implied_fields = ('subscriber_number',)
+
+    def number_normalized(self, instance, name, normalized):
+        instance.directory_number = normalized.e164
+        if instance.subscriber_number is None:
+            instance.subscriber_number = normalized.national_number
+
+    def validate_batch(self, entries, errors):
+        entries = super().validate_batch(entries, errors)
+        # Link each number to the range that owns it, as PhoneNumber.clean() does,
+        # from the ranges spanning the batch
+        values = [int(instance.directory_number.lstrip('+')) for _, instance in entries if instance.phone_number_range_id is None]
+        if values:
+            spans = list(
+                PhoneNumberRange.objects.filter(start_value__lte=max(values), end_value__gte=min(values))
+                .order_by('start_value').values_list('start_value', 'end_value', 'pk')
+            )
+            starts = [start for start, _, _ in spans]
+            for _, instance in entries:
+                if instance.phone_number_range_id is None:
+                    value = int(instance.directory_number.lstrip('+'))
+                    index = bisect.bisect_right(starts, value) - 1
+                    if index >= 0 and spans[index][1] >= value:
+                        instance.phone_number_range_id = spans[index][2]
+        return entries
+
+
+class PhoneNumberRangeImporter(CSVImporter):
+    model = PhoneNumberRange
+    number_fields = ('start_number', 'end_number')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (start_value, end_value) of the ranges accepted so far, sorted
+        self.spans = []
+
+    def validate_batch(self, entries, errors):
+        entries = super().validate_batch(entries, errors)
+        passed = []
+        for line, instance in entries:
+            instance.end_number = instance.end_number or instance.start_number
+            instance.start_value = int(instance.start_number.lstrip('+'))
+            instance.end_value = int(instance.end_number.lstrip('+'))
+            if instance.start_value > instance.end_value:
+                errors.append(RowError(line, 'end_number', 'The start number must be less than the end number.'))
+            else:
+                passed.append((line, instance))
+        if not passed:
+            return passed
+
+        stored = list(
+            PhoneNumberRange.objects
+            .filter(start_value__lte=max(i.end_value for _, i in passed), end_value__gte=min(i.start_value for _, i in passed))
+            .order_by('start_value')
+        )
+        stored_starts = [r.start_value for r in stored]
+        entries, passed = passed, []
+        for line, instance in entries:
+            index = bisect.bisect_right(stored_starts, instance.end_value) - 1
+            if index >= 0 and stored[index].end_value >= instance.start_value:
+                errors.append(RowError(line, 'start_number', f'The range overlaps the existing range {stored[index]}.'))
+                continue
+            index = bisect.bisect_right(self.spans, (instance.end_value, float('inf'))) - 1
+            if index >= 0 and self.spans[index][1] >= instance.start_value:
+                errors.append(RowError(line, 'start_number', 'The range overlaps a range earlier in the file.'))
+                continue
+            bisect.insort(self.spans, (instance.start_value, instance.end_value))
+            passed.append((line, instance))
+        return passed
+
+
+class CircuitDetailImporter(CSVImporter):
+    model = CircuitDetail
+    natural_key = 'circuit_number'
+
+
+class LocationImporter(CSVImporter):
+    model = Location
+    natural_key = 'site_id'
+    number_fields = ('contact_phone',)
+    # A site's contact may well be reached on a number abroad
+    match_country = False
+
+    def validate_batch(self, entries, errors):
+        for _, instance in entries:
+            instance.verified_location = False
+        return super().validate_batch(entries, errors)
+
+
+IMPORTERS = {
+    'phone_number': PhoneNumberImporter,
+    'phone_number_range': PhoneNumberRangeImporter,
+    'circuit_detail': CircuitDetailImporter,
+    'location': LocationImporter,
+}
+
+
+def import_csv(model_name, text, batch_size=BATCH_SIZE):
+    """
+    Import CSV text (a file-like object) into ``model_name``; returns an
+    ImportResult. Raises KeyError for an unknown model and ValueError for an
+    unusable header.
+    """
+    return IMPORTERS[model_name](batch_size=batch_size).run(text)
+
+
+def write_error_report(errors, out):
+    writer = csv.writer(out)
+    writer.writerow(['line', 'column', 'message'])
+    writer.writerows(errors)
+
+
+@require_POST
+def import_table(request, model_name):
+    if model_name not in IMPORTERS:
+        raise Http404(f"No import for {model_name!r}.")
+    upload = request.FILES.get('file')
+    if upload is None:
+        return HttpResponseBadRequest("Upload the CSV as 'file'.")
+    try:
+        result = import_csv(model_name, io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    data = result.as_dict()
+    if model_name == 'phone_number_range':
+        dense = PhoneNumberRange.objects.filter(pk__in=result.created_ids, sparse=False).values_list('pk', flat=True)
+        data['provisioning_jobs'] = [provision_phone_number_range.delay(pk).id for pk in dense]
+    # A file that stopped part way is still a failed upload, but what it wrote is reported
+    return JsonResponse(data, status=400 if result.error else 200)
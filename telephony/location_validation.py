@@ -0,0 +1,146 @@
+# telephony/location_validation.py
+"""
+Batch re-verification of Location addresses.
+
+Locations are streamed from the database in batches. Each batch is geocoded
+by a bounded thread pool that shares one rate limiter and retries quota or
+transport failures with exponential backoff. The verification fields are
+written back with a single bulk_update per batch.
+
+The geocoder is any callable taking an address string and returning a list of
+Google-style geocode results, so the job can run against a local stub.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from .geocoding import GeocodingError, geocode
+from .models import Location
+
+logger = logging.getLogger(__name__)
+
+VERIFICATION_FIELDS = [
+    'verified_location', 'verified_at', 'latitude', 'longitude', 'formatted_address', 'google_maps_place_id', 'updated_at',
+]
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls at most ``rate`` per second apart."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def locations_to_validate(stale_days=None):
+    """Unverified locations, plus verified ones not geocoded within ``stale_days``."""
+    query = Q(verified_location=False)
+    if stale_days is not None:
+        query |= Q(verified_at__isnull=True) | Q(verified_at__lt=timezone.now() - timedelta(days=stale_days))
+    return Location.objects.filter(query).select_related('country').order_by('pk')
+
+
+def _geocode_with_retry(geocoder, address, rate_limiter, max_retries, backoff):
+    attempt = 0
+    while True:
+        rate_limiter.wait()
+        try:
+            return geocoder(address)
+        except GeocodingError as e:
+            if not e.retriable or attempt >= max_retries:
+                raise
+            time.sleep(backoff * (2 ** attempt))
+            attempt += 1
+
+
+def _close_worker_connections(executor, workers):
+    """
+    Close the DB connections of every worker thread of ``executor``, once.
+    Worker threads open their own connection when the geocoder touches the
+    cache table and keep it for every address they handle; each of these
+    jobs holds its thread at the barrier, so every worker runs exactly one.
+    """
+    barrier = threading.Barrier(workers)
+
+    def close():
+        barrier.wait()
+        connections.close_all()
+
+    for future in [executor.submit(close) for _ in range(workers)]:
+        future.result()
+
+
+def validate_locations(queryset=None, geocoder=geocode, workers=4, rate_limit=10, max_retries=3, backoff=1.0, batch_size=100):
+    """
+    Geocode every location in ``queryset`` (default: locations_to_validate())
+    and record the outcome. Returns a Counter of ``checked``, ``verified``,
+    ``unverified`` (ZERO_RESULTS) and ``failed`` locations.
+    """
+    if queryset is None:
+        queryset = locations_to_validate()
+
+    summary = Counter()
+    rate_limiter = RateLimiter(rate_limit)
+
+    def lookup(location):
+        try:
+            return location, _geocode_with_retry(geocoder, location.geocode_address(), rate_limiter, max_retries, backoff), None
+        except GeocodingError as e:
+            return location, None, e
+
+    batch = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for location in queryset.iterator(chunk_size=batch_size):
+                batch.append(location)
+                if len(batch) >= batch_size:
+                    _write_batch(executor.map(lookup, batch), summary)
+                    batch = []
+            if batch:
+                _write_batch(executor.map(lookup, batch), summary)
+        finally:
+            _close_worker_connections(executor, workers)
+    return summary
+
+
+def _write_batch(lookups, summary):
+    now = timezone.now()
+    changed = []
+    for location, results, error in lookups:
+        summary['checked'] += 1
+        if error is not None:
+            logger.warning("Could not validate location %s: %s", location.pk, error)
+            summary['failed'] += 1
+            continue
+
+        if results:
+            result = results[0]
+            location.verified_location = True
+            location.verified_at = now
+            location.formatted_address = result.get('formatted_address', '')
+            location.google_maps_place_id = result.get('place_id', '')
+            location.latitude = result['geometry']['location']['lat']
+            location.longitude = result['geometry']['location']['lng']
+            summary['verified'] += 1
+        else:
+            location.mark_unverified()
+            summary['unverified'] += 1
+        location.updated_at = now
+        changed.append(location)
+
+    if changed:
+        Location.objects.bulk_update(changed, VERIFICATION_FIELDS)
@@ -0,0 +1,53 @@
+import random
+import time
+import phonenumbers
+from django.core.management.base import BaseCommand
+from telephony import normalization
+
+
+def parse_each(number, e164_code):
+    # The per-call path the models used before telephony.normalization
+    cleaned_number = ''.join(filter(str.isdigit, number))
+    parsed_number = phonenumbers.parse(f"+{e164_code}{cleaned_number}", None)
+    if not phonenumbers.is_valid_number(parsed_number):
+        raise ValueError(number)
+    return phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.E164)
+
+
+class Command(BaseCommand):
+    help = 'Compares per-call libphonenumber parsing with the cached normalization service'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1_000_000, help='Numbers to normalize')
+        parser.add_argument('--distinct', type=int, default=50_000, help='Distinct numbers among them; re-validation repeats numbers')
+        parser.add_argument('--e164-code', type=str, default='1', help='Country calling code the numbers belong to')
+        parser.add_argument('--prefix', type=str, default='51255', help='National prefix the generated numbers start with')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+        width = max(0, 10 - len(prefix))
+        distinct = min(options['distinct'], 10 ** width)
+        pool = [f"({prefix[:3]}) {prefix[3:]}-{n:0{width}d}" for n in rng.sample(range(10 ** width), distinct)]
+        numbers = [rng.choice(pool) for _ in range(options['count'])]
+        e164_code = options['e164_code']
+
+        started = time.perf_counter()
+        for number in numbers:
+            try:
+                parse_each(number, e164_code)
+            except (ValueError, phonenumbers.NumberParseException):
+                pass
+        per_call = time.perf_counter() - started
+
+        normalization.clear_cache()
+        started = time.perf_counter()
+        normalization.normalize_many(numbers, e164_code)
+        cached = time.perf_counter() - started
+
+        info = normalization.cache_info()
+        self.stdout.write(f"{len(numbers)} numbers, {distinct} distinct")
+        self.stdout.write(f"per-call parse:  {per_call:8.2f}s  {len(numbers) / per_call:12.0f} numbers/s")
+        self.stdout.write(f"normalize_many:  {cached:8.2f}s  {len(numbers) / cached:12.0f} numbers/s  ({info.hits} hits, {info.misses} misses)")
+        self.stdout.write(self.style.SUCCESS(f"{per_call / cached:.1f}x faster"))
@@ -0,0 +1,43 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from telephony import exports
+
+
+class Command(BaseCommand):
+    help = 'Streams a phone number, range, circuit or location export to a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--format', choices=sorted(exports.WRITERS), default='csv')
+        parser.add_argument('--output', '-o', help='File to write; defaults to stdout for CSV')
+        parser.add_argument(
+            '--filter', action='append', default=[], metavar='FIELD=VALUE',
+            help="A list view filter, e.g. --filter directory_number__startswith=+1512; repeatable",
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['format']
+        if options['output'] is None and file_format != 'csv':
+            raise CommandError('--output is required for XLSX')
+
+        params = QueryDict(mutable=True)
+        for expression in options['filter']:
+            field, sep, value = expression.partition('=')
+            if not sep:
+                raise CommandError(f"Filter {expression!r} must look like FIELD=VALUE")
+            params.appendlist(field, value)
+
+        try:
+            chunks = exports.export_chunks(options['model'], file_format, params)
+            if options['output'] is None:
+                for chunk in chunks:
+                    sys.stdout.write(chunk)
+                return
+            mode, encoding = ('w', 'utf-8') if file_format == 'csv' else ('wb', None)
+            with open(options['output'], mode, encoding=encoding, newline='' if encoding else None) as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        except ValueError as e:
+            raise CommandError(f"Invalid filter: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Exported {options['model']} to {options['output']}"))
@@ -0,0 +1,45 @@
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from telephony import imports
+from telephony.models import PhoneNumberRange
+
+
+class Command(BaseCommand):
+    help = 'Bulk imports phone numbers, ranges, circuits or locations from a CSV file and reports the rows that failed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(imports.IMPORTERS))
+        parser.add_argument('csv_file', help='CSV with a header row of field names or list view column titles')
+        parser.add_argument('--errors', help='Write the per-row error report to this CSV file instead of stdout')
+        parser.add_argument('--batch-size', type=int, default=imports.BATCH_SIZE, help='Rows validated and written per batch')
+        parser.add_argument('--no-provision', action='store_true', help="Don't create the numbers of imported ranges")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with open(options['csv_file'], encoding='utf-8-sig', newline='') as f:
+                result = imports.import_csv(options['model'], f, batch_size=options['batch_size'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        if result.errors:
+            if options['errors']:
+                with open(options['errors'], 'w', encoding='utf-8', newline='') as f:
+                    imports.write_error_report(result.errors, f)
+            else:
+                imports.write_error_report(result.errors, sys.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} of {result.rows} rows in {elapsed:.1f}s, {len(result.errors)} errors"
+        ))
+
+        if options['model'] == 'phone_number_range' and not options['no_provision']:
+            for phone_number_range in PhoneNumberRange.objects.filter(pk__in=result.created_ids, sparse=False):
+                created, updated = phone_number_range.create_phone_numbers()
+                self.stdout.write(f"{phone_number_range}: {created} numbers created, {updated} updated")
+
+        if result.error:
+            # What was imported above stays imported
+            raise CommandError(result.error)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+from telephony.geocoding import geocode
+from telephony.location_validation import locations_to_validate, validate_locations
+
+
+class Command(BaseCommand):
+    help = 'Geocodes unverified (and optionally stale) locations in bulk and records the results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-days', type=int, default=None, help='Also re-verify locations not updated in this many days')
+        parser.add_argument('--workers', type=int, default=4, help='Number of concurrent geocoding requests')
+        parser.add_argument('--rate-limit', type=float, default=10, help='Maximum geocoding requests per second (0 disables the limit)')
+        parser.add_argument('--max-retries', type=int, default=3, help='Retries for quota and transport errors, with exponential backoff')
+        parser.add_argument('--batch-size', type=int, default=100, help='Locations fetched and written back per batch')
+        parser.add_argument('--geocoder', type=str, default=None, help='Dotted path to an alternative geocode(address) callable, e.g. a local stub')
+
+    def handle(self, *args, **options):
+        geocoder = import_string(options['geocoder']) if options['geocoder'] else geocode
+        summary = validate_locations(
+            locations_to_validate(options['stale_days']),
+            geocoder=geocoder,
+            workers=options['workers'],
+            rate_limit=options['rate_limit'],
+            max_retries=options['max_retries'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {summary['checked']} locations: {summary['verified']} verified, "
+            f"{summary['unverified']} not found, {summary['failed']} failed"
+        ))
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telephony', '0012_remove_circuitdetail_ip_address_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('geocode', 'Geocode'), ('timezone', 'Time Zone')], max_length=20)),
+                ('key', models.CharField(max_length=64)),
+                ('query', models.TextField()),
+                ('status', models.CharField(max_length=20)),
+                ('response', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key'), name='unique_geocode_cache_key')],
+            },
+        ),
+    ]
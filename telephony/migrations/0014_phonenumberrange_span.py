@@ -0,0 +1,59 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:19
+
+from django.db import migrations, models
+
+EXCLUSION_CONSTRAINT = 'phonenumberrange_no_overlap'
+
+
+def fill_span(apps, schema_editor):
+    PhoneNumberRange = apps.get_model('telephony', 'PhoneNumberRange')
+    ranges = list(PhoneNumberRange.objects.only('start_number', 'end_number'))
+    for phone_number_range in ranges:
+        phone_number_range.start_value = int(phone_number_range.start_number.lstrip('+'))
+        phone_number_range.end_value = int((phone_number_range.end_number or phone_number_range.start_number).lstrip('+'))
+    PhoneNumberRange.objects.bulk_update(ranges, ['start_value', 'end_value'], batch_size=1000)
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    # int8range and GiST exclusion are PostgreSQL-only; elsewhere the overlap
+    # check in PhoneNumberRange.clean() is all there is.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f"ALTER TABLE telephony_phonenumberrange ADD CONSTRAINT {EXCLUSION_CONSTRAINT} "
+        "EXCLUDE USING gist (int8range(start_value, end_value, '[]') WITH &&) "
+        "WHERE (start_value IS NOT NULL AND end_value IS NOT NULL)"
+    )
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"ALTER TABLE telephony_phonenumberrange DROP CONSTRAINT IF EXISTS {EXCLUSION_CONSTRAINT}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telephony', '0013_geocodecacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phonenumberrange',
+            name='end_value',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='phonenumberrange',
+            name='start_value',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='phonenumberrange',
+            index=models.Index(fields=['start_value', 'end_value'], name='phonenumberrange_span_idx'),
+        ),
+        migrations.RunPython(fill_span, migrations.RunPython.noop),
+        # Fails if existing ranges overlap; they have to be fixed by hand first
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telephony', '0014_phonenumberrange_span'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phonenumberrange',
+            name='sparse',
+            field=models.BooleanField(default=False, help_text='Only store the numbers that are assigned, annotated or have a status'),
+        ),
+    ]
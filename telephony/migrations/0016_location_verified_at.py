@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-17 22:31
+
+from django.db import migrations, models
+
+
+def fill_verified_at(apps, schema_editor):
+    # The best record of when a verified location was last geocoded so far
+    Location = apps.get_model('telephony', 'Location')
+    Location.objects.filter(verified_location=True).update(verified_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telephony', '0015_phonenumberrange_sparse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='verified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_verified_at, migrations.RunPython.noop),
+    ]
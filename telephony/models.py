@@ -1,50 +1,76 @@
-import phonenumbers, googlemaps, requests
-from django.db import models
+from django.db import models, transaction, connection
 from django import forms
 from django.utils import timezone
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.core.validators import RegexValidator
 from django.conf import settings
 from django.contrib.auth.models import User
-from .utils import validate_address
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 import ipaddress
+from . import normalization
 
 
-gmaps = googlemaps.Client(key=settings.GOOGLE_API_KEY)
+# Primary keys of the "Undesignated" sentinel rows, resolved once per process.
+# The post_delete receiver in telephony.signals forgets a row when it is deleted.
+_default_pks = {}
+
+
+def _default_pk(model, **lookup):
+    pk = _default_pks.get(model)
+    if pk is not None:
+        return pk
+    from . import reference_data  # telephony.reference_data imports this module
+    (value,) = lookup.values()
+    row = reference_data.get(model, name=value) if reference_data.is_cached(model) else model.objects.filter(**lookup).first()
+    if row is not None:
+        _default_pks[model] = row.pk
+        return row.pk
+    row = model.objects.get_or_create(**lookup)[0]
+    # Don't remember a row that a rollback could still take away
+    transaction.on_commit(lambda: _default_pks.setdefault(model, row.pk))
+    return row.pk
+
+
+def forget_default_pk(model=None, pk=None):
+    """Drop the memoized sentinel of ``model`` (only if it is ``pk``, when given), or all of them."""
+    if model is None:
+        _default_pks.clear()
+    elif pk is None or _default_pks.get(model) == pk:
+        _default_pks.pop(model, None)
+
 
 def get_default_country():
     # This will return the "Undesignated" country, creating it if necessary
-    return Country.objects.get_or_create(name="Undesignated")[0]
+    return _default_pk(Country, name="Undesignated")
 
 def get_default_usage_type():
     # This will return the "Undesignated" country, creating it if necessary
-    return UsageType.objects.get_or_create(usage_type="Undesignated")[0]
+    return _default_pk(UsageType, usage_type="Undesignated")
 
 def get_default_location_function():
     # This will return the "Undesignated" country, creating it if necessary
-    return LocationFunction.objects.get_or_create(function_name="Undesignated")[0]
+    return _default_pk(LocationFunction, function_name="Undesignated")
 
 def get_default_location():
     # This will return the "Undesignated" country, creating it if necessary
-    return Location.objects.get_or_create(name="Undesignated")[0]
+    return _default_pk(Location, name="Undesignated")
 
 def get_default_connection_type():
     # This will return the "Undesignated" country, creating it if necessary
-    return ConnectionType.objects.get_or_create(connection_type_name="Undesignated")[0]
+    return _default_pk(ConnectionType, connection_type_name="Undesignated")
 
 def get_default_switch_type():
     # This will return the "Undesignated" country, creating it if necessary
-    return SwitchType.objects.get_or_create(switch_type_name="Undesignated")[0]
+    return _default_pk(SwitchType, switch_type_name="Undesignated")
 
 def get_default_service_provider():
     # This will return the "Undesignated" country, creating it if necessary
-    return ServiceProvider.objects.get_or_create(provider_name="Undesignated")[0]
+    return _default_pk(ServiceProvider, provider_name="Undesignated")
 
 def get_default_circuit_type():
     # This will return the "Undesignated" country, creating it if necessary
-    return CircuitDetail.objects.get_or_create(circuit_number="Undesignated")[0]
+    return _default_pk(CircuitDetail, circuit_number="Undesignated")
 
 
 
@@ -126,6 +152,9 @@ class Location(models.Model):
     site_dial_code = models.IntegerField(blank=True, null=True)
     trunk_access_code = models.IntegerField(blank=True, null=True)
     verified_location = models.BooleanField(default=False)
+    # When the address was last geocoded successfully; edits that leave the
+    # address alone don't touch it, unlike updated_at
+    verified_at = models.DateTimeField(blank=True, null=True)
     formatted_address = models.CharField(max_length=255, blank=True)
     google_maps_place_id = models.CharField(max_length=255, blank=True)
     notes = models.TextField(blank=True)
@@ -133,23 +162,95 @@ class Location(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Geocoding only needs to run again when one of these changes.
+    ADDRESS_FIELDS = ('house_number', 'road', 'city', 'state', 'postcode', 'country_id')
+    TRACKED_FIELDS = ADDRESS_FIELDS + ('contact_phone',)
+
     class Meta:
         unique_together = ('house_number', 'road', 'city', 'state_abbreviation', 'country',)
 
     def __str__(self):
         return self.display_name or self.name or "Unnamed Location"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_saved_values()
+        return instance
+
+    def _remember_saved_values(self):
+        # Only fields actually loaded are remembered; reading a deferred one
+        # here would cost a query per row.
+        self._saved_values = {
+            field: self.__dict__[field]
+            for field in self.TRACKED_FIELDS
+            if field in self.__dict__
+        }
+
+    def changed_fields(self, fields=None):
+        """
+        Return the subset of ``fields`` (default: TRACKED_FIELDS) that differ
+        from the values last loaded from or saved to the database. Unsaved
+        instances and fields that were never loaded count as changed.
+        """
+        fields = fields or self.TRACKED_FIELDS
+        saved_values = getattr(self, '_saved_values', {})
+        return {
+            field for field in fields
+            if field not in saved_values or getattr(self, field) != saved_values[field]
+        }
+
+    def address_changed(self):
+        return bool(self.changed_fields(self.ADDRESS_FIELDS))
+
+    def geocode_address(self):
+        """The address string submitted to Google for this location."""
+        from .geocoding import build_address  # telephony.geocoding imports this module
+        country_name = self.country.name if self.country_id else None
+        return build_address(f"{self.house_number} {self.road}", self.city, self.state, self.postcode, country_name)
+
+    def mark_address_verified(self):
+        """Record that the current address has been geocoded, so clean() doesn't look it up again."""
+        self._verified_address = self.geocode_address()
+
+    def address_verified(self):
+        return getattr(self, '_verified_address', None) == self.geocode_address()
+
+    def mark_verified(self):
+        self.verified_location = True
+        self.verified_at = timezone.now()
+
+    def mark_unverified(self):
+        """Mark the address unverified, dropping what an earlier geocode left: it no longer describes the address."""
+        self.verified_location = False
+        self.verified_at = None
+        self.latitude = self.longitude = None
+        self.formatted_address = self.google_maps_place_id = ''
+
     def clean(self):
-        # Construct the address for submission
-        address = f"{self.house_number} {self.road}, {self.city}, {self.state}, {self.postcode}, {self.country.name}"
-        api_key = settings.GOOGLE_API_KEY
-        url = f"https://maps.googleapis.com/maps/api/geocode/json?address={address}&key={api_key}"
+        from .geocoding import stats
+
+        address_changed = self.address_changed()
+        if address_changed and not self.address_verified():
+            self.verify_address()
+        else:
+            stats['skipped_unchanged'] += 1
+        if address_changed or self.changed_fields(['contact_phone']):
+            self.clean_contact_phone()
+        super().clean()
+
+    def verify_address(self):
+        """Geocode the address and overwrite the fields with Google's normalized values."""
+        from .geocoding import GeocodingError, geocode
+        from . import reference_data
 
-        response = requests.get(url)
-        result = response.json()
-        print(result)
-        if result['status'] == 'OK' and result['results']:
-            validated_address = result['results'][0]
+        try:
+            results = geocode(self.geocode_address())
+        except GeocodingError:
+            raise ValidationError('Address could not be verified.')
+
+        if results:
+            validated_address = results[0]
 
             # Update the model fields with the validated data
             self.formatted_address = validated_address.get('formatted_address', '')
@@ -165,16 +266,12 @@ class Location(models.Model):
             country_code_iso3 = next((component['long_name'] for component in validated_address['address_components'] if 'country' in component['types']), None)
             
             if country_code_iso2:
-                try:
-                    self.country = Country.objects.get(iso2_code=country_code_iso2)
-                except Country.DoesNotExist:
+                country = reference_data.get(Country, iso2=country_code_iso2) or reference_data.get(Country, iso3=country_code_iso3)
+                if country is None:
                     if country_code_iso3:
-                        try:
-                            self.country = Country.objects.get(iso3_code=country_code_iso3)
-                        except Country.DoesNotExist:
-                            raise ValidationError(f"Country with ISO2 code {country_code_iso2} or ISO3 code {country_code_iso3} does not exist in the database.")
-                    else:
-                        raise ValidationError(f"Country with ISO2 code {country_code_iso2} does not exist in the database.")
+                        raise ValidationError(f"Country with ISO2 code {country_code_iso2} or ISO3 code {country_code_iso3} does not exist in the database.")
+                    raise ValidationError(f"Country with ISO2 code {country_code_iso2} does not exist in the database.")
+                self.country = country
             else:
                 raise ValidationError("No country code found in the Google Maps API response.")
 
@@ -182,36 +279,26 @@ class Location(models.Model):
             self.longitude = validated_address['geometry']['location']['lng']
 
             # Set verified_location to True if the address validation was successful
-            self.verified_location = True
+            self.mark_verified()
 
         else:
-            # Handle the case where the address could not be validated.
-            if result['status'] == 'ZERO_RESULTS':
-                # If no results found, handle it gracefully.
-                self.verified_location = False
-            else:
-                raise ValidationError('Address could not be verified.')
-        self.clean_contact_phone()
-        super().clean()
+            # ZERO_RESULTS: keep the address as entered but mark it unverified.
+            self.mark_unverified()
+
+        self.mark_address_verified()
 
     def clean_contact_phone(self):
         if self.contact_phone:
-            # Remove non-numeric characters
-            cleaned_number = ''.join(filter(str.isdigit, self.contact_phone))
-
-            # Validate the phone number
-            e164_code = self.country.e164_code
-            full_number = f"+{e164_code}{cleaned_number}"
-
             try:
-                parsed_number = phonenumbers.parse(full_number, None)
-                if not phonenumbers.is_valid_number(parsed_number):
+                # A site's contact may well be reached on a number abroad
+                normalized = normalization.normalize(self.contact_phone, self.country.e164_code, match_country=False)
+            except normalization.PhoneNumberError as e:
+                if e.reason == normalization.INVALID:
                     raise ValidationError('The phone number is not valid.')
-            except phonenumbers.NumberParseException:
                 raise ValidationError('The phone number could not be parsed.')
 
             # Store the cleaned number in E.164 format
-            self.contact_phone = phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.E164)
+            self.contact_phone = normalized.e164
 
 
     def save(self, *args, **kwargs):
@@ -219,6 +306,7 @@ class Location(models.Model):
             self.site_id = self.generate_site_id()
         self.clean()
         super().save(*args, **kwargs)
+        self._remember_saved_values()
 
     def generate_site_id(self):
         country_code = self.country.iso2_code
@@ -237,6 +325,30 @@ class Location(models.Model):
 
 
 
+class GeocodeCacheEntry(models.Model):
+    """A cached Google Maps response, see telephony.geocoding."""
+    KIND_CHOICES = (
+        ('geocode', 'Geocode'),
+        ('timezone', 'Time Zone'),
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    key = models.CharField(max_length=64)  # sha256 of the normalized query
+    query = models.TextField()
+    status = models.CharField(max_length=20)
+    response = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(db_index=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='unique_geocode_cache_key')
+        ]
+
+    def __str__(self):
+        return f"{self.kind}: {self.query} ({self.status})"
+
+
 class StreetSuffix(models.Model):
     abbreviation = models.CharField(max_length=10, unique=True)
     full_name = models.CharField(max_length=50)
@@ -316,15 +428,62 @@ class CircuitDetail(models.Model):
     def __str__(self):
         return self.circuit_number
 
+class PhoneNumberRangeQuerySet(models.QuerySet):
+    """
+    Interval lookups on the integer span columns. Stored ranges never overlap,
+    so the range with the greatest start at or below a number is the only one
+    that can contain it; both lookups are one backward step down the
+    (start_value, end_value) index.
+    """
+
+    def _last_starting_at_or_before(self, value):
+        return self.filter(start_value__lte=value).order_by('-start_value').first()
+
+    def owning(self, number):
+        """The range containing the DID ``number`` (E.164 string or integer), or None."""
+        value = int(str(number).lstrip('+'))
+        phone_number_range = self._last_starting_at_or_before(value)
+        if phone_number_range is not None and phone_number_range.end_value >= value:
+            return phone_number_range
+        return None
+
+    def overlapping(self, start_value, end_value):
+        """A stored range sharing any number with ``[start_value, end_value]``, or None."""
+        phone_number_range = self._last_starting_at_or_before(end_value)
+        if phone_number_range is not None and phone_number_range.end_value >= start_value:
+            return phone_number_range
+        return None
+
+
 class PhoneNumberRange(models.Model):
     start_number = models.CharField(max_length=20)
     end_number = models.CharField(max_length=20, blank=True, null=True)
+    # The span as integers (E.164 without the +), set by clean(). On PostgreSQL
+    # an exclusion constraint over int8range(start_value, end_value, '[]')
+    # rejects overlapping ranges; see migration 0014.
+    start_value = models.BigIntegerField(blank=True, null=True, editable=False)
+    end_value = models.BigIntegerField(blank=True, null=True, editable=False)
     country = models.ForeignKey(Country, on_delete=models.SET_DEFAULT, default=get_default_country)
     service_provider = models.ForeignKey(ServiceProvider, on_delete=models.SET_DEFAULT, default=get_default_service_provider)
     location = models.ForeignKey(Location, on_delete=models.SET_DEFAULT, default=get_default_location)
     usage_type = models.ForeignKey(UsageType, on_delete=models.SET_DEFAULT, default=get_default_usage_type)
     circuit = models.ForeignKey(CircuitDetail, on_delete=models.SET_DEFAULT, default=get_default_circuit_type, blank=True, null=True)
     notes = models.TextField(blank=True)
+    # A sparse range stores a member as a PhoneNumber row only once something
+    # is recorded against it; member()/members() stand in for the rest.
+    sparse = models.BooleanField(default=False, help_text="Only store the numbers that are assigned, annotated or have a status")
+
+    objects = PhoneNumberRangeQuerySet.as_manager()
+
+    # Foreign keys every member inherits from its range
+    MEMBER_FIELDS = ('country', 'location', 'usage_type', 'service_provider', 'circuit')
+    # What create_phone_numbers() overwrites on a member that is already stored
+    UPSERT_FIELDS = (*MEMBER_FIELDS, 'subscriber_number', 'phone_number_range', 'updated_at')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_value', 'end_value'], name='phonenumberrange_span_idx'),
+        ]
 
     def __str__(self):
         return f"{self.start_number} - {self.end_number if self.end_number else self.start_number}"
@@ -345,44 +504,222 @@ class PhoneNumberRange(models.Model):
         else:
             self.end_number = self.start_number  # Treat as a single number range
 
+        self.start_value = int(self.start_number.lstrip('+'))
+        self.end_value = int(self.end_number.lstrip('+'))
+        others = PhoneNumberRange.objects.exclude(pk=self.pk) if self.pk else PhoneNumberRange.objects.all()
+        overlapping = others.overlapping(self.start_value, self.end_value)
+        if overlapping is not None:
+            raise ValidationError(f'The range overlaps the existing range {overlapping}.')
+
     def _validate_and_format_number(self, number):
         """Validate and format a phone number."""
-        cleaned_number = ''.join(filter(str.isdigit, number))
-        full_number = f"+{self.country.e164_code}{cleaned_number}"
         try:
-            parsed_number = phonenumbers.parse(full_number, None)
-            if not phonenumbers.is_valid_number(parsed_number):
-                raise ValidationError(f'The phone number {number} is not valid.')
-            return phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.E164)
-        except phonenumbers.NumberParseException:
-            raise ValidationError(f'The phone number {number} could not be parsed.')
+            return normalization.normalize(number, self.country.e164_code).e164
+        except normalization.PhoneNumberError as e:
+            raise ValidationError(str(e))
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, provision_numbers=True, **kwargs):
+        # Pass provision_numbers=False when the numbers are materialized elsewhere,
+        # e.g. by the provision_phone_number_range Celery task.
         self.full_clean()  # This will call clean() method
         super().save(*args, **kwargs)
-        self.create_phone_numbers()
-
-    def create_phone_numbers(self):
-            start_number_int = int(self.start_number.lstrip('+'))
-            end_number_int = int(self.end_number.lstrip('+')) if self.end_number else start_number_int
-
-            for number in range(start_number_int, end_number_int + 1):
-                directory_number = f"+{self.country.e164_code}{number}"
-                parsed_number = phonenumbers.parse(directory_number, None)
-
-                phone_number, created = PhoneNumber.objects.update_or_create(
-                directory_number=phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.E164),
-                defaults={
-                    'country': self.country,
-                    'subscriber_number': parsed_number.national_number,
-                    'location': self.location,
-                    'usage_type': self.usage_type,
-                    'service_provider': self.service_provider,
-                    'phone_number_range': self,
-                    'circuit': self.circuit,
-                }
+        if provision_numbers:
+            self.create_phone_numbers()
+
+    def create_phone_numbers(self, batch_size=1000, progress_callback=None):
+        """
+        Materialize every number in the range as a PhoneNumber row.
+
+        The whole range is generated and normalized in memory, existing rows are
+        found with a single keyed query and the writes go out in chunks of
+        ``batch_size`` as upserts on ``directory_number``. ``progress_callback``,
+        if given, is called as ``progress_callback(done, total)`` after each chunk.
+        Returns a ``(created, updated)`` tuple of row counts.
+
+        A sparse range creates nothing; its stored members are brought in line
+        with the range instead, see sync_sparse_members().
+        """
+        if self.sparse:
+            updated, _ = self.sync_sparse_members()
+            if progress_callback:
+                progress_callback(updated, updated)
+            return 0, updated
+
+        directory_numbers = self._generate_directory_numbers()
+        if not directory_numbers:
+            return 0, 0
+
+        existing = self._existing_directory_numbers(directory_numbers)
+
+        upsert = self._upsert_members_sql if connection.vendor == 'postgresql' else self._upsert_members
+        items = list(directory_numbers.items())
+        for start in range(0, len(items), batch_size):
+            upsert(items[start:start + batch_size])
+            if progress_callback:
+                progress_callback(min(start + batch_size, len(items)), len(items))
+
+        updated = len(existing)
+        return len(directory_numbers) - updated, updated
+
+    def _upsert_members(self, items):
+        """Upsert ``(directory_number, subscriber_number)`` pairs with bulk_create."""
+        # Assign the *_id attributes directly so building 100k instances
+        # doesn't pay for the related-object descriptors.
+        phone_numbers = [
+            PhoneNumber(
+                directory_number=directory_number,
+                country_id=self.country_id,
+                subscriber_number=subscriber_number,
+                location_id=self.location_id,
+                usage_type_id=self.usage_type_id,
+                service_provider_id=self.service_provider_id,
+                phone_number_range_id=self.pk,
+                circuit_id=self.circuit_id,
+            )
+            for directory_number, subscriber_number in items
+        ]
+        PhoneNumber.objects.bulk_create(
+            phone_numbers,
+            update_conflicts=True,
+            unique_fields=['directory_number'],
+            update_fields=list(self.UPSERT_FIELDS),
+        )
+
+    def _upsert_members_sql(self, items):
+        """
+        PostgreSQL form of _upsert_members(): one INSERT ... ON CONFLICT over
+        unnest()ed arrays, so a chunk costs no model instances and no
+        per-value SQL compilation.
+        """
+        now = timezone.now()
+        # NULLs are left to the column default; an untyped NULL in the SELECT
+        # list would be read as text.
+        constants = {
+            name: value
+            for name, value in {
+                **self._member_field_values(),
+                'phone_number_range_id': self.pk,
+                'created_at': now,
+                'updated_at': now,
+                **PhoneNumber.UNASSIGNED_STATE,
+            }.items()
+            if value is not None
+        }
+        quote = connection.ops.quote_name
+
+        def column(name):
+            return quote(PhoneNumber._meta.get_field(name).column)
+
+        columns = [column('directory_number'), column('subscriber_number'), *map(column, constants)]
+        updates = [column(name) for name in self.UPSERT_FIELDS]
+        directory_numbers, subscriber_numbers = zip(*items)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {quote(PhoneNumber._meta.db_table)} ({', '.join(columns)}) "
+                f"SELECT member.directory_number, member.subscriber_number{', %s' * len(constants)} "
+                "FROM unnest(%s::varchar[], %s::bigint[]) AS member(directory_number, subscriber_number) "
+                f"ON CONFLICT ({column('directory_number')}) DO UPDATE SET "
+                + ', '.join(f"{name} = EXCLUDED.{name}" for name in updates),
+                [*constants.values(), list(directory_numbers), list(subscriber_numbers)],
             )
 
+    def _member_field_values(self):
+        return {f'{field}_id': getattr(self, f'{field}_id') for field in self.MEMBER_FIELDS}
+
+    def implicit_members(self):
+        """Stored members with nothing recorded against them beyond what the range hands down."""
+        return self.phonenumber_set.filter(**PhoneNumber.UNASSIGNED_STATE, **self._member_field_values())
+
+    def sync_sparse_members(self):
+        """
+        Update the stored members of a sparse range with the range's foreign
+        keys, then delete those left with nothing of their own, e.g. after a
+        dense range was made sparse. Returns ``(updated, removed)``.
+        """
+        updated = self.phonenumber_set.update(**self._member_field_values(), updated_at=timezone.now())
+        removed, _ = self.implicit_members().delete()
+        return updated - removed, removed
+
+    def _implicit_member(self, directory_number, subscriber_number):
+        return PhoneNumber(
+            directory_number=directory_number,
+            subscriber_number=subscriber_number,
+            phone_number_range=self,
+            **self._member_field_values(),
+        )
+
+    def member(self, number):
+        """
+        The PhoneNumber for a DID in the range: the stored row, or for a
+        sparse range an unsaved stand-in that saving materializes. None for
+        a number outside the range.
+        """
+        value = int(str(number).lstrip('+'))
+        if not self.start_value <= value <= self.end_value:
+            return None
+        # Take the key expand_range() produced rather than our own spelling,
+        # so the stand-in matches what members() and provisioning store.
+        (directory_number, subscriber_number), = normalization.expand_range(f"+{value}", f"+{value}").items()
+        stored = PhoneNumber.objects.filter(directory_number=directory_number).first()
+        if stored is not None or not self.sparse:
+            return stored
+        return self._implicit_member(directory_number, subscriber_number)
+
+    def members(self, after=None, limit=50):
+        """
+        Up to ``limit`` consecutive members following the integer ``after``
+        (from the start when None), stored rows and stand-ins merged in
+        number order. Costs one indexed query whatever the range size.
+        """
+        first = self.start_value if after is None else max(self.start_value, after + 1)
+        last = min(self.end_value, first + limit - 1)
+        if first > last:
+            return []
+        directory_numbers = normalization.expand_range(f"+{first}", f"+{last}")
+        stored = {
+            phone_number.directory_number: phone_number
+            for phone_number in PhoneNumber.objects.filter(directory_number__in=list(directory_numbers))
+        }
+        return [
+            stored.get(directory_number) or self._implicit_member(directory_number, subscriber_number)
+            for directory_number, subscriber_number in directory_numbers.items()
+        ]
+
+    def _generate_directory_numbers(self):
+        """Return an ordered {E.164 directory number: subscriber number} map for the range."""
+        # start_number/end_number are already E.164 after clean()
+        return normalization.expand_range(self.start_number, self.end_number or self.start_number)
+
+    @staticmethod
+    def _existing_directory_numbers(directory_numbers):
+        """Return the subset of ``directory_numbers`` already stored, using one indexed query."""
+        # E.164 strings of equal length sort like their integer values, so each
+        # length group can be fetched as a contiguous slice of the unique index.
+        bounds = {}
+        for directory_number in directory_numbers:
+            low, high = bounds.get(len(directory_number), (directory_number, directory_number))
+            bounds[len(directory_number)] = (min(low, directory_number), max(high, directory_number))
+
+        query = models.Q()
+        for low, high in bounds.values():
+            query |= models.Q(directory_number__range=(low, high))
+
+        stored = PhoneNumber.objects.filter(query).values_list('directory_number', flat=True)
+        return {directory_number for directory_number in stored.iterator() if directory_number in directory_numbers}
+
+
+class PhoneNumberQuerySet(models.QuerySet):
+    def lookup(self, number):
+        """The PhoneNumber for a DID, stored or implied by a sparse range, or None."""
+        directory_number = f"+{str(number).lstrip('+')}"
+        stored = self.filter(directory_number=directory_number).first()
+        if stored is not None:
+            return stored
+        phone_number_range = PhoneNumberRange.objects.owning(directory_number)
+        if phone_number_range is not None and phone_number_range.sparse:
+            return phone_number_range.member(directory_number)
+        return None
+
 
 class PhoneNumber(models.Model):
     id = models.AutoField(primary_key=True)  # Automatically added by Django if not specified
@@ -406,6 +743,22 @@ class PhoneNumber(models.Model):
     phone_number_range = models.ForeignKey(PhoneNumberRange, on_delete=models.CASCADE, blank=True, null=True)
     circuit = models.ForeignKey(CircuitDetail, on_delete=models.SET_DEFAULT, default=get_default_circuit_type, blank=True, null=True)
 
+    objects = PhoneNumberQuerySet.as_manager()
+
+    # A number in this state has nothing recorded against it; sparse ranges
+    # don't store such numbers.
+    UNASSIGNED_STATE = {
+        'is_active': True,
+        'assigned_to': '',
+        'last_used_at': None,
+        'notes': '',
+        'number_format': '',
+        'status': '',
+        'activation_date': None,
+        'deactivation_date': None,
+        'comments': '',
+    }
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['directory_number'], name='unique_directory_number')
@@ -415,21 +768,19 @@ class PhoneNumber(models.Model):
         return str(self.directory_number)
 
     def clean(self):
-        # Remove non-numeric characters
-        cleaned_number = ''.join(filter(str.isdigit, self.directory_number))
-
-        # Validate the phone number
-        e164_code = self.country.e164_code
-        full_number = f"+{e164_code}{cleaned_number}"
         try:
-            parsed_number = phonenumbers.parse(full_number, None)
-            if not phonenumbers.is_valid_number(parsed_number):
+            normalized = normalization.normalize(self.directory_number, self.country.e164_code)
+        except normalization.PhoneNumberError as e:
+            if e.reason == normalization.WRONG_COUNTRY:
+                raise ValidationError(str(e))
+            if e.reason == normalization.INVALID:
                 raise ValidationError('The phone number is not valid.')
-        except phonenumbers.NumberParseException:
             raise ValidationError('The phone number could not be parsed.')
 
         # Store the cleaned number
-        self.directory_number = phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.E164)
+        self.directory_number = normalized.e164
+        if self.phone_number_range_id is None:
+            self.phone_number_range = PhoneNumberRange.objects.owning(self.directory_number)
 
     def save(self, *args, **kwargs):
         self.full_clean()  # This will call clean() method
@@ -0,0 +1,251 @@
+# telephony/normalization.py
+"""
+Phone number normalization shared by Location, PhoneNumberRange and PhoneNumber.
+
+A number is reduced to its digits and parsed with the record's country code
+in front, unless it was entered with a leading ``+`` and so already carries
+one. That makes normalizing an already normalized E.164 number a no-op. Such a
+number must still belong to the record's country: one whose E.164 form doesn't
+start with the country code fails as WRONG_COUNTRY (``match_country=False``
+turns the check off, for a contact number that may be abroad).
+
+Results, failures included, are kept in an LRU cache keyed on
+``(country code, digits)``, so re-validating a number that was seen before
+doesn't go through libphonenumber again. ``normalize_many`` is the batch
+form for imports and other bulk paths.
+
+``expand_range`` lists the members of a contiguous range of numbers. A valid
+number's trailing digits that fall in the free tail of its numbering plan
+(the ``\d{n}`` every pattern for its type ends with) can take any value, so
+the aligned block of numbers differing only there is valid too and is
+generated with integer arithmetic. Only the parts of a range outside such
+blocks are parsed number by number.
+"""
+from functools import lru_cache
+from typing import NamedTuple
+import phonenumbers
+from phonenumbers import PhoneMetadata, PhoneNumberType
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse, sre_constants
+from django.conf import settings
+
+NORMALIZATION_CACHE_SIZE = getattr(settings, 'PHONE_NORMALIZATION_CACHE_SIZE', 2 ** 16)
+
+INVALID = 'invalid'
+UNPARSEABLE = 'unparseable'
+WRONG_COUNTRY = 'wrong_country'
+
+# Metadata attribute holding the pattern for each number type
+NUMBER_TYPE_DESCS = {
+    PhoneNumberType.FIXED_LINE: 'fixed_line',
+    PhoneNumberType.FIXED_LINE_OR_MOBILE: 'fixed_line',
+    PhoneNumberType.MOBILE: 'mobile',
+    PhoneNumberType.TOLL_FREE: 'toll_free',
+    PhoneNumberType.PREMIUM_RATE: 'premium_rate',
+    PhoneNumberType.SHARED_COST: 'shared_cost',
+    PhoneNumberType.VOIP: 'voip',
+    PhoneNumberType.PERSONAL_NUMBER: 'personal_number',
+    PhoneNumberType.PAGER: 'pager',
+    PhoneNumberType.UAN: 'uan',
+    PhoneNumberType.VOICEMAIL: 'voicemail',
+}
+
+
+class NormalizedNumber(NamedTuple):
+    e164: str
+    country_code: int
+    national_number: int
+
+
+class PhoneNumberError(ValueError):
+    """
+    ``reason`` is INVALID (parsed, but not a valid number), UNPARSEABLE or
+    WRONG_COUNTRY (valid, but under another calling code than ``e164_code``).
+    """
+
+    def __init__(self, number, reason, e164_code=None):
+        if reason == WRONG_COUNTRY:
+            message = f"The phone number {number} is not a number of the country with calling code +{e164_code}."
+        else:
+            message = f"The phone number {number} {'is not valid' if reason == INVALID else 'could not be parsed'}."
+        super().__init__(message)
+        self.number = number
+        self.reason = reason
+
+
+def strip_number(number):
+    """``(international, digits)``: whether ``number`` starts with + and its digits."""
+    number = str(number).strip()
+    return number.startswith('+'), ''.join(filter(str.isdigit, number))
+
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def _normalize_digits(e164_code, digits):
+    """A NormalizedNumber, or INVALID/UNPARSEABLE; failures are cached too."""
+    try:
+        parsed_number = phonenumbers.parse(f"+{e164_code}{digits}", None)
+    except phonenumbers.NumberParseException:
+        return UNPARSEABLE
+    if not phonenumbers.is_valid_number(parsed_number):
+        return INVALID
+    return NormalizedNumber(
+        phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.E164),
+        parsed_number.country_code,
+        parsed_number.national_number,
+    )
+
+
+def _calling_code(e164_code):
+    return ''.join(filter(str.isdigit, str(e164_code or '')))
+
+
+def _normalize(number, e164_code, match_country=True):
+    international, digits = strip_number(number)
+    calling_code = _calling_code(e164_code)
+    result = _normalize_digits('' if international else calling_code, digits)
+    if international and match_country and calling_code and not isinstance(result, str):
+        if not result.e164[1:].startswith(calling_code):
+            return WRONG_COUNTRY
+    return result
+
+
+def normalize(number, e164_code, match_country=True):
+    """
+    Validate ``number`` for the country with calling code ``e164_code`` and
+    return it as a NormalizedNumber. Raises PhoneNumberError.
+    """
+    result = _normalize(number, e164_code, match_country)
+    if isinstance(result, str):
+        raise PhoneNumberError(number, result, _calling_code(e164_code))
+    return result
+
+
+def normalize_many(numbers, e164_code, match_country=True):
+    """
+    Normalize an iterable of numbers for one country. Returns a list in input
+    order holding a NormalizedNumber or, for a bad number, its PhoneNumberError
+    (not raised), so a bulk caller can report every failure at once.
+    """
+    calling_code = _calling_code(e164_code)
+    results = []
+    for number in numbers:
+        result = _normalize(number, calling_code, match_country)
+        results.append(PhoneNumberError(number, result, calling_code) if isinstance(result, str) else result)
+    return results
+
+
+def cache_info():
+    return _normalize_digits.cache_info()
+
+
+def clear_cache():
+    _normalize_digits.cache_clear()
+
+
+def _matches_any_digit(item):
+    op, av = item
+    return op is sre_constants.IN and av in (
+        [(sre_constants.CATEGORY, sre_constants.CATEGORY_DIGIT)],
+        [(sre_constants.RANGE, (ord('0'), ord('9')))],
+    )
+
+
+def _free_tail(items):
+    """Lower bound on the trailing unconstrained digits of every match of a parsed pattern."""
+    free = 0
+    for op, av in reversed(list(items)):
+        if _matches_any_digit((op, av)):
+            free += 1
+            continue
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            low, high, repeated = av
+            if len(repeated) == 1 and _matches_any_digit(repeated[0]):
+                free += low
+                if low == high:
+                    continue
+            return free
+        if op is sre_constants.BRANCH:
+            return free + min(_free_tail(branch) for branch in av[1])
+        if op is sre_constants.SUBPATTERN:
+            return free + _free_tail(av[-1])
+        return free
+    return free
+
+
+@lru_cache(maxsize=None)
+def pattern_free_tail(pattern):
+    return _free_tail(sre_parse.parse(pattern))
+
+
+def plan_free_tail(number):
+    """
+    How many trailing digits of a valid NormalizedNumber can change without
+    affecting its validity, per the metadata for its region and type; 0 if
+    it isn't valid.
+    """
+    parsed_number = phonenumbers.parse(number.e164, None)
+    region = phonenumbers.region_code_for_number(parsed_number)
+    metadata = PhoneMetadata.metadata_for_region_or_calling_code(number.country_code, region)
+    desc = getattr(metadata, NUMBER_TYPE_DESCS.get(phonenumbers.number_type(parsed_number), ''), None) if metadata else None
+    if desc is None or not desc.national_number_pattern:
+        return 0
+    return min(
+        pattern_free_tail(metadata.general_desc.national_number_pattern),
+        pattern_free_tail(desc.national_number_pattern),
+    )
+
+
+def plan_block_size(number):
+    """
+    ``10 ** n`` for the aligned block of numbers sharing all but the free tail
+    of the E.164 string ``number``, all of which are valid if it is; 1 if it
+    isn't valid.
+    """
+    try:
+        normalized = normalize(number, None)
+    except PhoneNumberError:
+        return 1
+    return 10 ** plan_free_tail(normalized)
+
+
+def _parse_each(directory_numbers, first, last):
+    for number in range(first, last + 1):
+        parsed_number = phonenumbers.parse(f"+{number}", None)
+        directory_number = phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.E164)
+        directory_numbers[directory_number] = parsed_number.national_number
+
+
+def expand_range(start_number, end_number):
+    """
+    Ordered ``{E.164 number: national (subscriber) number}`` for every number
+    from ``start_number`` to ``end_number``, both E.164 strings.
+
+    The range is walked in aligned plan blocks. A block whose first number is
+    valid is generated arithmetically; one that isn't, or a range whose start
+    has no free tail at all, is parsed number by number as before.
+    """
+    start_int = int(start_number.lstrip('+'))
+    end_int = int(end_number.lstrip('+'))
+    directory_numbers = {}
+    if plan_block_size(start_number) == 1:
+        _parse_each(directory_numbers, start_int, end_int)
+        return directory_numbers
+
+    number = start_int
+    while number <= end_int:
+        block_size = plan_block_size(f"+{number}")
+        last = min(end_int, (number // block_size + 1) * block_size - 1)
+        if block_size == 1:
+            # Not valid: parse up to the next multiple of ten and look again
+            last = min(end_int, number + 9 - number % 10)
+            _parse_each(directory_numbers, number, last)
+        else:
+            # Same country code and length throughout, so the national
+            # number is the low digits of the E.164 integer
+            national_modulus = 10 ** (len(str(number)) - len(str(normalize(f"+{number}", None).country_code)))
+            for member in range(number, last + 1):
+                directory_numbers[f"+{member}"] = member % national_modulus
+        number = last + 1
+    return directory_numbers
@@ -0,0 +1,98 @@
+# telephony/pagination.py
+import base64
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+def encode_cursor(value, pk, direction='next'):
+    """Pack a row's sort value and primary key into an opaque, URL-safe cursor."""
+    payload = json.dumps([value, pk, direction], cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor(). Raises ValueError for anything malformed."""
+    try:
+        value, pk, direction = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if direction not in ('next', 'previous'):
+        raise ValueError(f"Invalid cursor direction: {direction!r}")
+    return value, pk, direction
+
+
+class KeysetPage:
+    """
+    One page of a keyset (cursor) paginated queryset.
+
+    Unlike Django's Paginator this never counts or OFFSETs, so fetching page
+    1,000 costs the same index range scan as fetching page 1.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginate_keyset(queryset, sort_field, descending=False, cursor=None, per_page=50):
+    """
+    Return a KeysetPage of ``queryset`` ordered by ``(sort_field, pk)``.
+
+    ``sort_field`` must be a non-nullable concrete column (use the attname, e.g.
+    ``country_id``, for foreign keys) so the row-value comparison is total.
+    """
+    if cursor:
+        value, pk, direction = decode_cursor(cursor)
+    else:
+        value, pk, direction = None, None, 'next'
+
+    # Walking backwards means flipping both the comparison and the ordering,
+    # then restoring the display order once the slice is fetched.
+    backwards = direction == 'previous'
+    reverse = descending != backwards
+    order_prefix = '-' if reverse else ''
+    queryset = queryset.order_by(f'{order_prefix}{sort_field}', f'{order_prefix}pk')
+
+    if cursor:
+        lookup = 'lt' if reverse else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{sort_field}__{lookup}': value})
+            | Q(**{sort_field: value, f'pk__{lookup}': pk})
+        )
+
+    rows = list(queryset[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage(rows)
+
+    first, last = rows[0], rows[-1]
+    if backwards:
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, cursor is not None
+
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(getattr(last, sort_field), last.pk, 'next') if has_next else None,
+        previous_cursor=encode_cursor(getattr(first, sort_field), first.pk, 'previous') if has_previous else None,
+    )
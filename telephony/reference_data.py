@@ -0,0 +1,164 @@
+# telephony/reference_data.py
+"""
+In-process cache of the small lookup tables: Country, UsageType,
+LocationFunction, ServiceProvider, SwitchType and ConnectionType.
+
+Each table is read whole on first use into a snapshot indexed by pk and name,
+and for Country also by ISO2, ISO3 and E.164 code, so form choices, model
+defaults and geocode country matching don't query the database. Lookups are
+case-insensitive.
+
+Every table has a version token kept in Django's cache framework, which
+settings.CACHES points at the Redis every web and Celery process shares. The
+post_save/post_delete receivers in telephony.signals replace it, and a process
+whose snapshot carries an older token reloads on its next lookup, so every
+process sees a change. As a backstop for a cache that isn't shared (a
+per-process LocMemCache) or a write nothing signalled, a snapshot is also
+reloaded once it is older than REFERENCE_DATA_MAX_AGE seconds.
+QuerySet.update(), bulk_create() and raw SQL send no signals; code that writes
+these tables that way must call ``invalidate(model)`` itself.
+
+``stats`` counts, per process, ``hits`` and ``loads``.
+"""
+import copy
+import threading
+import time
+import uuid
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from .models import Country, UsageType, LocationFunction, ServiceProvider, SwitchType, ConnectionType
+
+REFERENCE_DATA_MAX_AGE = getattr(settings, 'REFERENCE_DATA_MAX_AGE', 60)
+
+stats = Counter()
+
+
+def _index_key(value):
+    return str(value).strip().lstrip('+').casefold()
+
+
+class Snapshot:
+    def __init__(self, version, rows, indexes):
+        self.version = version
+        self.rows = rows
+        self.indexes = indexes
+        self.loaded_at = time.monotonic()
+
+    def is_current(self, version):
+        return self.version == version and time.monotonic() - self.loaded_at < REFERENCE_DATA_MAX_AGE
+
+
+class ReferenceTable:
+    """One cached table; ``indexes`` maps an index name to the field it is keyed on."""
+
+    def __init__(self, model, name_field, **indexes):
+        self.model = model
+        self.name_field = name_field
+        self.indexes = {'pk': 'pk', 'name': name_field, **indexes}
+        self.version_key = f'telephony:reference_data:{model._meta.label_lower}'
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # First use, or evicted: any new token forces every process to reload
+            version = uuid.uuid4().hex
+            if not cache.add(self.version_key, version, timeout=None):
+                version = cache.get(self.version_key, version)
+        return version
+
+    def snapshot(self):
+        version = self.current_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.is_current(version):
+            stats['hits'] += 1
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or not self._snapshot.is_current(version):
+                self._snapshot = self._load(version)
+            return self._snapshot
+
+    def _load(self, version):
+        stats['loads'] += 1
+        rows = list(self.model.objects.all())
+        indexes = {index: {} for index in self.indexes}
+        for row in rows:
+            for index, field in self.indexes.items():
+                value = getattr(row, field)
+                if value not in (None, ''):
+                    # Keys such as e164 are shared (US and CA are both +1);
+                    # the first row in the model's ordering wins
+                    indexes[index].setdefault(_index_key(value), row)
+        return Snapshot(version, rows, indexes)
+
+    def invalidate(self):
+        self._snapshot = None
+        cache.set(self.version_key, uuid.uuid4().hex, timeout=None)
+
+    def rows(self, **filters):
+        """
+        Cached rows in the model's default ordering, optionally narrowed by
+        field equality. The instances are shared; treat them as read-only.
+        """
+        rows = self.snapshot().rows
+        if filters:
+            rows = [row for row in rows if all(getattr(row, field) == value for field, value in filters.items())]
+        return rows
+
+    def get(self, **lookup):
+        """
+        The row matching a single ``index=value`` lookup, e.g. ``get(iso2='US')``,
+        as a private copy, or None.
+        """
+        (index, value), = lookup.items()
+        if value in (None, ''):
+            return None
+        row = self.snapshot().indexes[index].get(_index_key(value))
+        return copy.copy(row) if row is not None else None
+
+    def get_or_create(self, name):
+        """The row named ``name``, creating it (and invalidating the table) if it is missing."""
+        row = self.get(name=name)
+        if row is None:
+            row = self.model.objects.get_or_create(**{self.name_field: name})[0]
+        return row
+
+
+TABLES = {
+    table.model: table for table in (
+        ReferenceTable(Country, 'name', iso2='iso2_code', iso3='iso3_code', e164='e164_code'),
+        ReferenceTable(UsageType, 'usage_type'),
+        ReferenceTable(LocationFunction, 'function_name'),
+        ReferenceTable(ServiceProvider, 'provider_name'),
+        ReferenceTable(SwitchType, 'switch_type_name'),
+        ReferenceTable(ConnectionType, 'connection_type_name'),
+    )
+}
+
+
+def table(model):
+    return TABLES[model]
+
+
+def is_cached(model):
+    return model in TABLES
+
+
+def get(model, **lookup):
+    return TABLES[model].get(**lookup)
+
+
+def rows(model, **filters):
+    return TABLES[model].rows(**filters)
+
+
+def get_or_create(model, name):
+    return TABLES[model].get_or_create(name)
+
+
+def invalidate(model=None):
+    """Drop the cached snapshot of ``model``, or of every table, in all processes."""
+    for reference_table in ([TABLES[model]] if model else TABLES.values()):
+        reference_table.invalidate()
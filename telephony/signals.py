@@ -1,11 +1,32 @@
 # signals.py
-from django.db.models.signals import post_save, post_migrate
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, post_migrate
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile, UsageType
+from . import reference_data
+from .models import UserProfile, UsageType, Location, CircuitDetail, forget_default_pk
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
 
+
+def invalidate_reference_data(sender, **kwargs):
+    # Once now for this process, and again at commit so no other process
+    # reloads the old rows under the new version in between
+    reference_data.invalidate(sender)
+    transaction.on_commit(lambda: reference_data.invalidate(sender))
+
+
+for model in reference_data.TABLES:
+    post_save.connect(invalidate_reference_data, sender=model, dispatch_uid=f'reference_data_save_{model._meta.label_lower}')
+    post_delete.connect(invalidate_reference_data, sender=model, dispatch_uid=f'reference_data_delete_{model._meta.label_lower}')
+
+
+def forget_deleted_default(sender, instance, **kwargs):
+    forget_default_pk(sender, instance.pk)
+
+
+for model in [*reference_data.TABLES, Location, CircuitDetail]:
+    post_delete.connect(forget_deleted_default, sender=model, dispatch_uid=f'default_pk_delete_{model._meta.label_lower}')
@@ -0,0 +1,94 @@
+# telephony/tasks.py
+import time
+from celery import shared_task
+from django.apps import apps
+from .bulk_delete import CHUNK_SIZE, delete_in_chunks
+from .bulk_edit import BulkEditError, select
+from .models import PhoneNumberRange
+from .location_validation import locations_to_validate, validate_locations
+
+
+@shared_task(bind=True)
+def provision_phone_number_range(self, phone_number_range_id, batch_size=1000):
+    """
+    Materialize the PhoneNumber rows of a range in the background.
+
+    Progress is published as a PROGRESS state with ``done``/``total`` counts so
+    the job status endpoint can report rows written and an ETA.
+    """
+    phone_number_range = PhoneNumberRange.objects.get(pk=phone_number_range_id)
+    started_at = time.time()
+
+    def report_progress(done, total):
+        self.update_state(state='PROGRESS', meta={
+            'phone_number_range_id': phone_number_range_id,
+            'done': done,
+            'total': total,
+            'started_at': started_at,
+        })
+
+    created, updated = phone_number_range.create_phone_numbers(
+        batch_size=batch_size,
+        progress_callback=report_progress,
+    )
+    return {
+        'phone_number_range_id': phone_number_range_id,
+        'done': created + updated,
+        'total': created + updated,
+        'created': created,
+        'updated': updated,
+        'started_at': started_at,
+        'finished_at': time.time(),
+    }
+
+
+@shared_task(bind=True)
+def bulk_delete_rows(self, model_label, ids=None, filter_params=None, chunk_size=CHUNK_SIZE, max_pk=None, expected=None):
+    """
+    Delete a bulk selection and its dependents in chunks, see
+    telephony.bulk_delete. Progress is published as a PROGRESS state with
+    ``done``/``total`` counts of selected rows.
+
+    The selection is pinned to what was estimated: rows above ``max_pk`` are
+    left alone, and if the selection no longer holds ``expected`` rows the
+    task fails without deleting anything.
+    """
+    queryset = select(apps.get_model(model_label), ids, filter_params)
+    if max_pk is not None:
+        queryset = queryset.filter(pk__lte=max_pk)
+    started_at = time.time()
+    total = queryset.count()
+    if expected is not None and total != expected:
+        raise BulkEditError({'__all__': [
+            f"The selection changed since it was estimated: {total} rows match, {expected} did. Estimate it again."
+        ]})
+
+    def report_progress(done):
+        self.update_state(state='PROGRESS', meta={
+            'model': model_label,
+            'done': done,
+            'total': total,
+            'started_at': started_at,
+        })
+
+    counts = delete_in_chunks(queryset, chunk_size=chunk_size, progress_callback=report_progress)
+    return {
+        'model': model_label,
+        'done': total,
+        'total': total,
+        'counts': counts,
+        'started_at': started_at,
+        'finished_at': time.time(),
+    }
+
+
+@shared_task
+def validate_location_addresses(stale_days=None, workers=4, rate_limit=10, max_retries=3):
+    """Re-verify unverified (and optionally stale) locations in bulk, see telephony.location_validation."""
+    summary = validate_locations(
+        locations_to_validate(stale_days),
+        workers=workers,
+        rate_limit=rate_limit,
+        max_retries=max_retries,
+    )
+    return dict(summary)
@@ -7,6 +7,7 @@ from django.utils.safestring import mark_safe
 
 register = template.Library()
 
+@register.simple_tag(name='toggle_order')
 @register.filter(name='toggle_order')
 def toggle_order(order, sort_by, current_sort_by):
     if sort_by == current_sort_by:
@@ -1,3 +1,865 @@
+import csv
+import io
+import json
+import tracemalloc
+import zipfile
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.forms.models import apply_limit_choices_to_to_formfield
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from telephony import bulk_edit, exports, geocoding, imports, location_validation, normalization, reference_data, tasks
+from telephony.forms import LocationForm, ReferenceChoiceField
+from telephony.models import (
+    CircuitDetail, ConnectionType, Country, GeocodeCacheEntry, Location, LocationFunction, PhoneNumber,
+    PhoneNumberRange, ServiceProvider, SwitchType, UsageType, forget_default_pk, get_default_usage_type,
+)
+
+GEOCODE_RESULT = {
+    'formatted_address': '100 Congress Ave, Austin, TX 78701, USA',
+    'place_id': 'ChIJ-congress-ave',
+    'address_components': [
+        {'long_name': '100', 'short_name': '100', 'types': ['street_number']},
+        {'long_name': 'Congress Avenue', 'short_name': 'Congress Ave', 'types': ['route']},
+        {'long_name': 'Austin', 'short_name': 'Austin', 'types': ['locality', 'political']},
+        {'long_name': 'Texas', 'short_name': 'TX', 'types': ['administrative_area_level_1', 'political']},
+        {'long_name': '78701', 'short_name': '78701', 'types': ['postal_code']},
+        {'long_name': 'United States', 'short_name': 'US', 'types': ['country', 'political']},
+    ],
+    'geometry': {'location': {'lat': 30.2649, 'lng': -97.7445}},
+}
+
+stub_geocoder_calls = Counter()
+
+
+def stub_geocoder(address):
+    """
+    Geocoder for ``validate_locations --geocoder``, answering by house number:
+    20 is not found, 30 hits the quota twice before answering, 40 always does.
+    """
+    house_number = address.split()[0]
+    stub_geocoder_calls[house_number] += 1
+    if house_number == '20':
+        return []
+    if house_number == '40' or (house_number == '30' and stub_geocoder_calls[house_number] <= 2):
+        raise geocoding.GeocodingError('OVER_QUERY_LIMIT', retriable=True)
+    return [GEOCODE_RESULT]
+
+
+class TelephonyTestCase(TestCase):
+    """Creates the "Undesignated" rows the models default to and a US country."""
+
+    @classmethod
+    def setUpTestData(cls):
+        forget_default_pk()
+        reference_data.invalidate()
+        Country.objects.create(name='Undesignated')
+        cls.us = Country.objects.create(name='United States', e164_code='1', iso2_code='US', iso3_code='USA')
+        cls.usage_type = UsageType.objects.create(usage_type='Undesignated')
+        cls.location_function = LocationFunction.objects.create(function_name='Undesignated')
+        cls.service_provider = ServiceProvider.objects.create(provider_name='Undesignated')
+        cls.location = cls.create_location(name='Undesignated', site_id='UNDESIGNATED')
+        cls.circuit = CircuitDetail.objects.create(
+            circuit_number='Undesignated',
+            provider=cls.service_provider,
+            location=cls.location,
+            connection_type=ConnectionType.objects.create(connection_type_name='Undesignated'),
+            switch_type=SwitchType.objects.create(switch_type_name='Undesignated'),
+        )
+
+    def setUp(self):
+        # Memoized sentinel pks and cached tables outlive each test's rollback
+        forget_default_pk()
+        reference_data.invalidate()
+
+    @classmethod
+    def create_location(cls, name, site_id, house_number='1'):
+        # bulk_create skips Location.save(), which would geocode the address
+        return Location.objects.bulk_create([Location(
+            name=name, site_id=site_id, house_number=house_number, road='Main St', city='Austin', postcode='78701',
+            country=cls.us, location_function=cls.location_function,
+        )])[0]
+
+    def create_range(self, start_number, end_number, **kwargs):
+        phone_number_range = PhoneNumberRange(start_number=start_number, end_number=end_number, **{'country': self.us, **kwargs})
+        phone_number_range.save(provision_numbers=False)
+        return phone_number_range
+
+
+class CreatePhoneNumbersTests(TelephonyTestCase):
+    def test_creates_every_number_of_the_range(self):
+        phone_number_range = self.create_range('+16125500100', '+16125500199')
+        progress = []
+
+        created = phone_number_range.create_phone_numbers(batch_size=30, progress_callback=lambda done, total: progress.append(done))
+
+        self.assertEqual(created, (100, 0))
+        self.assertEqual(progress, [30, 60, 90, 100])
+        members = PhoneNumber.objects.filter(phone_number_range=phone_number_range)
+        self.assertEqual(members.count(), 100)
+        member = members.get(directory_number='+16125500142')
+        self.assertEqual(member.subscriber_number, 6125500142)
+        self.assertEqual(
+            (member.country_id, member.location_id, member.usage_type_id, member.service_provider_id, member.circuit_id),
+            (self.us.pk, self.location.pk, self.usage_type.pk, self.service_provider.pk, self.circuit.pk),
+        )
+        self.assertTrue(member.is_active)
+        self.assertEqual(member.status, '')
+
+    def test_running_again_updates_instead_of_duplicating(self):
+        phone_number_range = self.create_range('+16125500100', '+16125500199')
+        phone_number_range.create_phone_numbers()
+        PhoneNumber.objects.filter(directory_number='+16125500100').update(assigned_to='ops')
+        phone_number_range.location = self.create_location(name='HQ', site_id='USXX1', house_number='2')
+        phone_number_range.save(provision_numbers=False)
+
+        self.assertEqual(phone_number_range.create_phone_numbers(), (0, 100))
+        self.assertEqual(phone_number_range.create_phone_numbers(), (0, 100))
+
+        members = PhoneNumber.objects.filter(phone_number_range=phone_number_range)
+        self.assertEqual(members.count(), 100)
+        self.assertEqual(members.filter(location=phone_number_range.location).count(), 100)
+        # What was recorded against a member survives re-provisioning
+        self.assertEqual(members.get(directory_number='+16125500100').assigned_to, 'ops')
+
+    def test_adopts_numbers_stored_before_the_range(self):
+        PhoneNumber(directory_number='+16125500150', country=self.us, subscriber_number=6125500150, notes='kept').save()
+        phone_number_range = self.create_range('+16125500100', '+16125500199')
+
+        self.assertEqual(phone_number_range.create_phone_numbers(), (99, 1))
+
+        adopted = PhoneNumber.objects.get(directory_number='+16125500150')
+        self.assertEqual(adopted.phone_number_range_id, phone_number_range.pk)
+        self.assertEqual(adopted.notes, 'kept')
+        self.assertEqual(PhoneNumber.objects.count(), 100)
+
+
+class DefaultPkTests(TelephonyTestCase):
+    def test_warm_defaults_cost_no_queries(self):
+        PhoneNumber(directory_number='+16125500100', subscriber_number=6125500100)
+
+        with self.assertNumQueries(0):
+            phone_numbers = [
+                PhoneNumber(directory_number=f'+1612550{number:04}', subscriber_number=6125500000 + number)
+                for number in range(100_000)
+            ]
+
+        self.assertEqual(
+            {(phone_number.country_id, phone_number.location_id, phone_number.usage_type_id) for phone_number in phone_numbers},
+            {(Country.objects.get(name='Undesignated').pk, self.location.pk, self.usage_type.pk)},
+        )
+
+    def test_a_deleted_default_is_forgotten(self):
+        self.assertEqual(get_default_usage_type(), self.usage_type.pk)
+        other = UsageType.objects.create(usage_type='Fax')
+        other.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_default_usage_type(), self.usage_type.pk)
+
+        self.usage_type.delete()
+        with self.captureOnCommitCallbacks() as callbacks:
+            recreated = get_default_usage_type()
+        self.assertNotEqual(recreated, self.usage_type.pk)
+        self.assertEqual(UsageType.objects.get(usage_type='Undesignated').pk, recreated)
+
+        # Only remembered once the row it was created in is committed
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_default_usage_type(), recreated)
+        self.assertTrue(queries.captured_queries)
+        for callback in callbacks:
+            callback()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_default_usage_type(), recreated)
+
+
+class NormalizationTests(TelephonyTestCase):
+    def test_an_international_number_must_carry_the_records_calling_code(self):
+        self.assertEqual(normalization.normalize('+16125550100', '+1').e164, '+16125550100')
+        with self.assertRaises(normalization.PhoneNumberError) as raised:
+            normalization.normalize('+442071234567', '1')
+        self.assertEqual(raised.exception.reason, normalization.WRONG_COUNTRY)
+        self.assertEqual(normalization.normalize('+442071234567', '1', match_country=False).country_code, 44)
+
+    def test_records_reject_a_number_of_another_country(self):
+        with self.assertRaisesMessage(ValidationError, 'calling code +1'):
+            PhoneNumber(directory_number='+442071234567', country=self.us, subscriber_number=2071234567).save()
+        with self.assertRaisesMessage(ValidationError, 'calling code +1'):
+            self.create_range('+442071234500', '+442071234599')
+        self.assertFalse(PhoneNumber.objects.exists() or PhoneNumberRange.objects.exists())
+
+    def test_a_location_contact_may_be_abroad(self):
+        location = Location(country=self.us, contact_phone='+44 20 7123 4567')
+        location.clean_contact_phone()
+        self.assertEqual(location.contact_phone, '+442071234567')
+
+    def test_repeat_numbers_are_answered_from_the_cache(self):
+        normalization.clear_cache()
+        with mock.patch.object(normalization.phonenumbers, 'parse', wraps=normalization.phonenumbers.parse) as parse:
+            for _ in range(3):
+                self.assertEqual(normalization.normalize('(612) 555-0100', '1').e164, '+16125550100')
+                # Spelled differently, same digits: same cache entry
+                self.assertEqual(normalization.normalize('612.555.0100', '1').e164, '+16125550100')
+                with self.assertRaises(normalization.PhoneNumberError):
+                    normalization.normalize('123', '1')
+
+        self.assertEqual(parse.call_count, 2)
+        self.assertEqual((normalization.cache_info().misses, normalization.cache_info().hits), (2, 7))
+
+    def test_normalize_many_returns_every_failure_in_input_order(self):
+        results = normalization.normalize_many(['612 555 0100', '+16125550101', '123', 'abc', '+442071234567'], '1')
+
+        self.assertEqual([result.e164 for result in results[:2]], ['+16125550100', '+16125550101'])
+        self.assertEqual(
+            [(type(result), result.reason) for result in results[2:]],
+            [(normalization.PhoneNumberError, reason) for reason in (normalization.INVALID, normalization.UNPARSEABLE, normalization.WRONG_COUNTRY)],
+        )
+        self.assertEqual(results[2].number, '123')
+        self.assertEqual(normalization.normalize_many(['+442071234567'], '1', match_country=False)[0].country_code, 44)
+
+
+class ExpandRangeTests(TestCase):
+    @staticmethod
+    def parse_each(start_number, end_number):
+        """The per-number reference expand_range must agree with."""
+        directory_numbers = {}
+        for number in range(int(start_number.lstrip('+')), int(end_number.lstrip('+')) + 1):
+            parsed_number = normalization.phonenumbers.parse(f"+{number}", None)
+            directory_number = normalization.phonenumbers.format_number(parsed_number, normalization.phonenumbers.PhoneNumberFormat.E164)
+            directory_numbers[directory_number] = parsed_number.national_number
+        return directory_numbers
+
+    def assertExpandsLikeParsing(self, start_number, end_number):
+        expanded = normalization.expand_range(start_number, end_number)
+        self.assertEqual(list(expanded.items()), list(self.parse_each(start_number, end_number).items()))
+
+    def test_matches_parsing_across_plan_boundaries(self):
+        # Across a 10**4 block boundary, and from invalid (NXX 199) into valid numbers
+        self.assertExpandsLikeParsing('+16125509990', '+16125510009')
+        self.assertExpandsLikeParsing('+16121999990', '+16122000009')
+
+    def test_matches_parsing_with_a_leading_zero(self):
+        self.assertExpandsLikeParsing('+390612345690', '+390612345709')
+        self.assertEqual(normalization.expand_range('+390612345600', '+390612345600'), {'+390612345600': 612345600})
+
+    def test_whole_blocks_are_not_parsed(self):
+        with mock.patch.object(normalization, '_parse_each', wraps=normalization._parse_each) as parse_each:
+            expanded = normalization.expand_range('+16125500000', '+16125519999')
+        parse_each.assert_not_called()
+        self.assertEqual(len(expanded), 20000)
+        self.assertEqual(expanded['+16125514242'], 6125514242)
+
+    def test_free_tail(self):
+        for pattern, free_tail in [
+            (r'[2-9]\d{9}', 9),
+            (r'1\d{2,4}', 2),
+            (r'(?:2\d|3)\d{4}', 4),
+            (r'(?:12|3\d)\d{3}', 3),
+            (r'\d{3}(?:4|5)', 0),
+            (r'8\d{5}(?:\d{2,4})?', 0),
+        ]:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(normalization.pattern_free_tail(pattern), free_tail)
+
+
+class SparseRangeTests(TelephonyTestCase):
+    def test_member_is_none_outside_the_range(self):
+        phone_number_range = self.create_range('+16125500100', '+16125500199', sparse=True)
+        PhoneNumber(directory_number='+16125500200', country=self.us, subscriber_number=6125500200).save()
+
+        self.assertIsNone(phone_number_range.member('+16125500200'))
+        self.assertIsNone(phone_number_range.member(16125500099))
+        self.assertEqual(phone_number_range.member('+16125500199').subscriber_number, 6125500199)
+
+    def test_member_keeps_the_italian_leading_zero(self):
+        italy = Country.objects.create(name='Italy', e164_code='39', iso2_code='IT', iso3_code='ITA')
+        phone_number_range = self.create_range('+390612345600', '+390612345699', country=italy, sparse=True)
+
+        member = phone_number_range.member(390612345642)
+
+        self.assertEqual((member.directory_number, member.subscriber_number), ('+390612345642', 612345642))
+        self.assertEqual(member.directory_number, phone_number_range.members(after=390612345641, limit=1)[0].directory_number)
+
+    def test_provisioning_stores_nothing(self):
+        phone_number_range = self.create_range('+16125500100', '+16125500199', sparse=True)
+
+        self.assertEqual(phone_number_range.create_phone_numbers(), (0, 0))
+        self.assertFalse(PhoneNumber.objects.exists())
+
+    def test_members_merge_stored_rows_with_stand_ins(self):
+        phone_number_range = self.create_range('+16125500100', '+16125500199', sparse=True)
+        assigned = phone_number_range.member('+16125500102')
+        assigned.assigned_to = 'ops'
+        assigned.save()
+
+        with self.assertNumQueries(1):
+            members = phone_number_range.members(after=16125500100, limit=3)
+
+        self.assertEqual([member.directory_number for member in members], ['+16125500101', '+16125500102', '+16125500103'])
+        self.assertEqual([member.pk is None for member in members], [True, False, True])
+        self.assertEqual(members[1].assigned_to, 'ops')
+        self.assertEqual(members[0].location_id, phone_number_range.location_id)
+        self.assertEqual(len(phone_number_range.members(after=16125500190, limit=50)), 9)
+        self.assertEqual(phone_number_range.members(after=16125500199), [])
+
+    def test_lookup_finds_stored_and_implied_numbers(self):
+        sparse = self.create_range('+16125500100', '+16125500199', sparse=True)
+        dense = self.create_range('+16125500200', '+16125500299')
+
+        implied = PhoneNumber.objects.lookup('+16125500150')
+        self.assertEqual((implied.pk, implied.phone_number_range_id, implied.subscriber_number), (None, sparse.pk, 6125500150))
+        # A dense range's numbers exist only once provisioned
+        self.assertIsNone(PhoneNumber.objects.lookup('+16125500250'))
+        dense.create_phone_numbers()
+        self.assertEqual(PhoneNumber.objects.lookup(16125500250).phone_number_range_id, dense.pk)
+        self.assertIsNone(PhoneNumber.objects.lookup('+16125500300'))
+
+    def test_making_a_range_sparse_drops_the_implicit_members(self):
+        phone_number_range = self.create_range('+16125500100', '+16125500199')
+        phone_number_range.create_phone_numbers()
+        PhoneNumber.objects.filter(directory_number='+16125500100').update(assigned_to='ops')
+        phone_number_range.sparse = True
+        phone_number_range.location = self.create_location(name='HQ', site_id='USXX1', house_number='2')
+        phone_number_range.save(provision_numbers=False)
+
+        self.assertEqual(phone_number_range.sync_sparse_members(), (1, 99))
+
+        kept = PhoneNumber.objects.get()
+        self.assertEqual((kept.directory_number, kept.location_id), ('+16125500100', phone_number_range.location_id))
+        self.assertEqual(phone_number_range.sync_sparse_members(), (1, 0))
+
+
+class RangeOverlapTests(TelephonyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.phone_number_range = self.create_range('+16125500100', '+16125500199')
+
+    def test_overlapping_ranges_are_rejected(self):
+        for start_number, end_number in [
+            ('+16125500000', '+16125500100'),
+            ('+16125500199', '+16125500299'),
+            ('+16125500150', '+16125500160'),
+            ('+16125500000', '+16125500299'),
+        ]:
+            with self.subTest(start_number=start_number, end_number=end_number):
+                with self.assertRaisesMessage(ValidationError, 'overlaps the existing range +16125500100 - +16125500199'):
+                    self.create_range(start_number, end_number)
+
+        self.create_range('+16125500000', '+16125500099')
+        self.create_range('+16125500200', '+16125500200')
+        self.assertEqual(PhoneNumberRange.objects.count(), 3)
+
+    def test_a_range_may_be_resaved_over_its_own_numbers(self):
+        self.phone_number_range.end_number = '+16125500249'
+        self.phone_number_range.save(provision_numbers=False)
+
+        self.assertEqual(PhoneNumberRange.objects.get().end_value, 16125500249)
+
+    def test_owning(self):
+        other = self.create_range('+16125500300', '+16125500399')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(PhoneNumberRange.objects.owning('+16125500100'), self.phone_number_range)
+        self.assertEqual(PhoneNumberRange.objects.owning(16125500199), self.phone_number_range)
+        self.assertEqual(PhoneNumberRange.objects.owning('+16125500342'), other)
+        for number in ('+16125500099', '+16125500250', '+16125500400'):
+            with self.subTest(number=number):
+                self.assertIsNone(PhoneNumberRange.objects.owning(number))
+
+    def test_a_new_number_joins_the_range_it_falls_in(self):
+        phone_number = PhoneNumber(directory_number='612-550-0142', country=self.us, subscriber_number=6125500142)
+        phone_number.save()
+
+        self.assertEqual(phone_number.phone_number_range, self.phone_number_range)
+
+
+class ListViewQueryCountTests(TelephonyTestCase):
+    """A list page costs the same number of queries for 1 row as for a full page."""
+
+    rows = 20
+
+    def assertConstantQueries(self, url_name, create_row, row_text):
+        url = reverse(f'telephony:{url_name}')
+        create_row(0)
+        # Each count is taken once the cached lookup tables are loaded, which
+        # the first request after a write does
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        one_row_queries = len(captured)
+        self.assertContains(response, row_text(0))
+
+        for i in range(1, self.rows):
+            create_row(i)
+        self.client.get(url)
+        with self.assertNumQueries(one_row_queries):
+            response = self.client.get(url)
+        for i in range(self.rows):
+            self.assertContains(response, row_text(i))
+
+    def create_row_location(self, i):
+        # A location of its own per row, so a lazy foreign key load would show
+        return self.create_location(name=f'Site {i:02d}', site_id=f'USXX{i + 10}', house_number=str(i + 10))
+
+    def test_phone_number_list(self):
+        def create_row(i):
+            PhoneNumber(
+                directory_number=f'+161255002{i:02d}', subscriber_number=6125500200 + i, country=self.us,
+                location=self.create_row_location(i), service_provider=self.service_provider,
+            ).save()
+
+        self.assertConstantQueries('phone_number', create_row, lambda i: f'+161255002{i:02d}')
+
+    def test_phone_number_range_list(self):
+        def create_row(i):
+            self.create_range(
+                f'+161255{i:02d}000', f'+161255{i:02d}099', location=self.create_row_location(i),
+                usage_type=UsageType.objects.create(usage_type=f'Usage {i:02d}'),
+            )
+
+        self.assertConstantQueries('phone_number_range', create_row, lambda i: f'+161255{i:02d}000')
+
+    def test_location_list(self):
+        self.assertConstantQueries('location', self.create_row_location, lambda i: f'Site {i:02d}')
+
+    def test_circuit_list(self):
+        def create_row(i):
+            CircuitDetail.objects.create(
+                circuit_number=f'CIRCUIT-{i:02d}', location=self.create_row_location(i),
+                provider=ServiceProvider.objects.create(provider_name=f'Provider {i:02d}'),
+                connection_type=ConnectionType.objects.create(connection_type_name=f'Connection {i:02d}'),
+                switch_type=SwitchType.objects.create(switch_type_name=f'Switch {i:02d}'),
+            )
+
+        self.assertConstantQueries('circuit_detail', create_row, lambda i: f'CIRCUIT-{i:02d}')
+
+
+class ApiListTests(TelephonyTestCase):
+    def get_rows(self, model_name, **params):
+        response = self.client.get(reverse('telephony:api_list', args=[model_name]), params)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_pages_phone_numbers_with_after_and_limit(self):
+        phone_number_range = self.create_range('+16125500100', '+16125500103')
+        phone_number_range.create_phone_numbers()
+        PhoneNumber(directory_number='+16125509999', country=self.us, subscriber_number=6125509999).save()
+
+        first_page = self.get_rows('phone_number', limit=3)
+        rest = self.get_rows('phone_number', after=first_page[-1]['id'], limit=3)
+
+        rows = first_page + rest
+        self.assertEqual([len(first_page), len(rest)], [3, 2])
+        self.assertEqual(
+            [row['directory_number'] for row in rows],
+            ['+16125500100', '+16125500101', '+16125500102', '+16125500103', '+16125509999'],
+        )
+        self.assertEqual(rows[0]['phone_number_range_id'], phone_number_range.pk)
+        self.assertEqual(rows[0]['phone_number_range_label'], '+16125500100 - +16125500103')
+        self.assertEqual(rows[0]['location_label'], 'Undesignated')
+        self.assertEqual(rows[0]['country_label'], 'United States')
+        # A number outside any range has no range label, not " - "
+        self.assertEqual((rows[-1]['phone_number_range_id'], rows[-1]['phone_number_range_label']), (None, None))
+        self.assertEqual(self.get_rows('phone_number', after=rows[-1]['id']), [])
+
+    def test_rejects_a_bad_limit(self):
+        response = self.client.get(reverse('telephony:api_list', args=['phone_number']), {'limit': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_inventory_models_are_served(self):
+        for model_name in ('geocode_cache_entry', 'user_profile', 'company', 'subscription'):
+            with self.subTest(model_name=model_name):
+                response = self.client.get(reverse('telephony:api_list', args=[model_name]))
+                self.assertEqual(response.status_code, 404)
+
+        index = self.client.get(reverse('telephony:api_index')).json()
+        self.assertIn('phone_number_range', index)
+        self.assertNotIn('geocode_cache_entry', index)
+
+
+class BulkEditTests(TelephonyTestCase):
+    def post_edit(self, payload):
+        return self.client.post(reverse('telephony:phone_number_batch_edit'), payload, content_type='application/json')
+
+    def test_a_filter_edits_only_the_rows_it_matches(self):
+        self.create_range('+16125500100', '+16125500199').create_phone_numbers()
+        PhoneNumber(directory_number='+16125519999', country=self.us, subscriber_number=6125519999).save()
+
+        response = self.post_edit({'filter': {'directory_number__startswith': '+1612550'}, 'data': {'assigned_to': 'ops'}})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['matched'], response.json()['updated']), (100, 100))
+        self.assertEqual(PhoneNumber.objects.filter(assigned_to='ops').count(), 100)
+
+    def test_a_filter_without_values_is_rejected(self):
+        self.create_range('+16125500100', '+16125500199').create_phone_numbers()
+
+        for filter_params in ({'directory_number__startswith': ''}, {'directory_number__startswith': '  ', 'status': ''}):
+            response = self.post_edit({'filter': filter_params, 'data': {'assigned_to': 'ops'}})
+
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('filter', response.json()['errors'])
+        self.assertFalse(PhoneNumber.objects.filter(assigned_to='ops').exists())
+
+    def test_moving_ranges_by_their_location_moves_their_numbers(self):
+        old, new = self.create_location('Old', 'USXX1', '2'), self.create_location('New', 'USXX2', '3')
+        for start, end in (('+16125500100', '+16125500109'), ('+16125500200', '+16125500209')):
+            self.create_range(start, end, location=old).create_phone_numbers()
+
+        # The filter is on the field being edited, and each range is its own chunk
+        selection = bulk_edit.select(PhoneNumberRange, filter_params={'location': old.pk})
+        result = bulk_edit.apply_changes(selection, {'location_id': new.pk}, chunk_size=1)
+
+        self.assertEqual((result['matched'], result['updated'], result['phone_numbers']), (2, 2, 20))
+        self.assertEqual(PhoneNumberRange.objects.filter(location=new).count(), 2)
+        self.assertEqual(PhoneNumber.objects.filter(location=new).count(), 20)
+
+
+class BulkDeleteTests(TelephonyTestCase):
+    filter_params = {'directory_number__startswith': '+1612550'}
+
+    def setUp(self):
+        super().setUp()
+        self.create_range('+16125500100', '+16125500199').create_phone_numbers()
+
+    def post_delete(self, payload):
+        return self.client.post(reverse('telephony:phone_number_batch_delete'), payload, content_type='application/json')
+
+    def queue_delete(self):
+        """Post a delete too large to run inline; returns the bulk_delete_rows call it queued."""
+        with mock.patch('telephony.views.INLINE_LIMIT', 10), mock.patch.object(tasks.bulk_delete_rows, 'delay', return_value=mock.Mock(id='job')) as delay:
+            response = self.post_delete({'filter': self.filter_params})
+        self.assertEqual(response.status_code, 202)
+        return delay.call_args
+
+    def test_a_filter_without_values_is_rejected(self):
+        response = self.post_delete({'filter': {'directory_number__startswith': ''}})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(PhoneNumber.objects.count(), 100)
+
+    def test_the_task_deletes_only_the_rows_estimated(self):
+        args, kwargs = self.queue_delete()
+        self.assertEqual(kwargs['expected'], 100)
+        # A matching number created after the estimate is not part of the selection
+        PhoneNumber(directory_number='+16125500099', country=self.us, subscriber_number=6125500099).save()
+
+        result = tasks.bulk_delete_rows.apply(args, kwargs)
+
+        self.assertTrue(result.successful(), result.result)
+        self.assertEqual(result.result['total'], 100)
+        self.assertEqual(list(PhoneNumber.objects.values_list('directory_number', flat=True)), ['+16125500099'])
+
+    def test_the_task_aborts_when_the_selection_changed(self):
+        args, kwargs = self.queue_delete()
+        PhoneNumber.objects.filter(directory_number='+16125500150').update(directory_number='+16125519999')
+
+        result = tasks.bulk_delete_rows.apply(args, kwargs)
+
+        self.assertTrue(result.failed())
+        self.assertIn('The selection changed', str(result.result))
+        self.assertEqual(PhoneNumber.objects.count(), 100)
+
+
+class ImportTests(TelephonyTestCase):
+    def post_csv(self, data):
+        upload = SimpleUploadedFile('numbers.csv', data, content_type='text/csv')
+        return self.client.post(reverse('telephony:import_table', args=['phone_number']), {'file': upload})
+
+    def test_a_file_unreadable_part_way_reports_what_was_imported(self):
+        lines = ['directory_number,country'] + [f'+1612550{n:04d},US' for n in range(1000)]
+        data = '\n'.join(lines).encode() + b'\n+16125519999,\xff\n'
+
+        response = self.post_csv(data)
+
+        self.assertEqual(response.status_code, 400)
+        result = response.json()
+        self.assertIn('could not be read past line', result['error'])
+        # Every row read before the bad bytes is imported, and counted
+        self.assertGreater(result['created'], 0)
+        self.assertEqual(result['created'], result['rows'])
+        self.assertEqual(PhoneNumber.objects.count(), result['created'])
+
+    def test_a_number_must_belong_to_the_rows_country(self):
+        Country.objects.create(name='United Kingdom', e164_code='44', iso2_code='GB', iso3_code='GBR')
+        data = b'directory_number,country\n+442071234567,US\n2071234568,GB\n+16125550100,United States\n'
+
+        result = imports.import_csv('phone_number', io.StringIO(data.decode(), newline=''))
+
+        self.assertEqual(
+            [(error.line, error.column) for error in result.errors],
+            [(2, 'directory_number')],
+        )
+        self.assertIn('+442071234567', result.errors[0].message)
+        self.assertEqual(
+            dict(PhoneNumber.objects.values_list('directory_number', 'country__iso2_code')),
+            {'+442071234568': 'GB', '+16125550100': 'US'},
+        )
+
+
+@mock.patch.object(exports, 'EXPORT_CHUNK_SIZE', 25)
+class ExportTests(TelephonyTestCase):
+    def provision(self, count, prefix='+1612550'):
+        self.create_range(f'{prefix}0000', f'{prefix}{count - 1:04d}').create_phone_numbers()
+
+    def stream(self, file_format):
+        response = self.client.get(reverse('telephony:export_table', args=['phone_number', file_format]))
+        self.assertEqual(response.status_code, 200)
+        return response.streaming_content
+
+    def export(self, file_format):
+        return list(self.stream(file_format))
+
+    def export_peak_memory(self):
+        tracemalloc.start()
+        try:
+            for _ in self.stream('csv'):
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_csv_streams_a_chunk_of_rows_at_a_time(self):
+        self.provision(100)
+
+        parts = self.export('csv')
+
+        # The header, then one part per EXPORT_CHUNK_SIZE rows
+        self.assertEqual([len(part.decode().splitlines()) for part in parts], [1, 25, 25, 25, 25])
+        rows = list(csv.reader(io.StringIO(b''.join(parts).decode())))
+        self.assertEqual(rows[0][:2], ['Directory Number', 'Country'])
+        self.assertEqual(rows[1][:4], ['+16125500000', 'United States', '6125500000', 'Undesignated'])
+        self.assertEqual(rows[-1][0], '+16125500099')
+
+    def test_memory_does_not_grow_with_the_table(self):
+        self.provision(200)
+        self.export_peak_memory()
+        small = self.export_peak_memory()
+        self.provision(2000, prefix='+1612551')
+        large = self.export_peak_memory()
+
+        # Ten times the rows, but still one chunk of them in memory
+        self.assertLess(large, small * 1.5)
+
+    @mock.patch.object(exports, 'XLSX_MAX_ROWS', 40)
+    def test_xlsx_rolls_over_to_a_new_sheet(self):
+        self.provision(100)
+
+        parts = self.export('xlsx')
+
+        # One compressed part per chunk of rows, then the rest of the package
+        self.assertEqual(len(parts), 5)
+        namespace = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        with zipfile.ZipFile(io.BytesIO(b''.join(parts))) as workbook:
+            self.assertIsNone(workbook.testzip())
+            sheet_names = [
+                sheet.get('name')
+                for sheet in ElementTree.fromstring(workbook.read('xl/workbook.xml')).iterfind('s:sheets/s:sheet', namespace)
+            ]
+            self.assertEqual(sheet_names, ['Sheet1', 'Sheet2', 'Sheet3'])
+            self.assertIn(b'/xl/worksheets/sheet3.xml', workbook.read('[Content_Types].xml'))
+            sheets = []
+            for n in range(1, 4):
+                rows = ElementTree.fromstring(workbook.read(f'xl/worksheets/sheet{n}.xml')).iterfind('s:sheetData/s:row', namespace)
+                sheets.append([
+                    (row.get('r'), [cell.findtext('s:is/s:t', namespaces=namespace) or cell.findtext('s:v', namespaces=namespace) for cell in row])
+                    for row in rows
+                ])
+
+        # Every sheet starts with the header and holds at most XLSX_MAX_ROWS rows
+        self.assertEqual([len(sheet) for sheet in sheets], [40, 40, 23])
+        for sheet in sheets:
+            self.assertEqual(sheet[0][0], '1')
+            self.assertEqual(sheet[0][1][:2], ['Directory Number', 'Country'])
+            self.assertEqual([number for number, _ in sheet], [str(n) for n in range(1, len(sheet) + 1)])
+        numbers = [cells[0] for sheet in sheets for _, cells in sheet[1:]]
+        self.assertEqual(numbers, [f'+1612550{n:04d}' for n in range(100)])
+        self.assertEqual(sheets[0][1][1][:3], ['+16125500000', 'United States', '6125500000'])
+
+
+class ReferenceDataTests(TelephonyTestCase):
+    def test_an_unsignalled_change_is_seen_once_the_snapshot_is_too_old(self):
+        self.assertIsNone(reference_data.get(Country, iso2='GB'))
+        # bulk_create sends no signal, as with a write another process's cache didn't hear about
+        Country.objects.bulk_create([Country(name='United Kingdom', e164_code='44', iso2_code='GB', iso3_code='GBR')])
+        self.assertIsNone(reference_data.get(Country, iso2='GB'))
+
+        with mock.patch.object(reference_data, 'REFERENCE_DATA_MAX_AGE', 0):
+            self.assertEqual(reference_data.get(Country, iso2='GB').name, 'United Kingdom')
+
+    def test_a_whole_table_field_is_served_from_the_cache(self):
+        field = ReferenceChoiceField(queryset=Country.objects.all())
+        reference_data.rows(Country)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(len(list(field.choices)), 3)
+            self.assertEqual(field.clean(self.us.pk), self.us)
+
+    def test_a_narrowed_field_keeps_to_its_queryset(self):
+        undesignated = Country.objects.get(name='Undesignated')
+        limited = ReferenceChoiceField(queryset=Country.objects.all(), limit_choices_to={'iso2_code': 'US'})
+        # As a ModelForm does for a foreign key's limit_choices_to
+        apply_limit_choices_to_to_formfield(limited)
+        for field in (ReferenceChoiceField(queryset=Country.objects.filter(iso2_code='US')), limited):
+            self.assertEqual([label for _, label in field.choices], ['---------', str(self.us)])
+            self.assertEqual(field.clean(self.us.pk), self.us)
+            with self.assertRaises(ValidationError):
+                field.clean(undesignated.pk)
+
+
+@mock.patch('telephony.geocoding.gmaps')
+class GeocodingTests(TelephonyTestCase):
+    def setUp(self):
+        super().setUp()
+        geocoding.stats.clear()
+
+    def test_cache_hit_is_a_read(self, gmaps):
+        gmaps.geocode.return_value = [GEOCODE_RESULT]
+        geocoding.geocode('100 Congress Ave, Austin, TX')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(geocoding.geocode('100 congress ave austin tx'), [GEOCODE_RESULT])
+
+        # Past the touch interval the hit refreshes last_used_at once
+        stale = timezone.now() - geocoding.GEOCODE_CACHE_TOUCH_INTERVAL - timedelta(minutes=1)
+        GeocodeCacheEntry.objects.update(last_used_at=stale)
+        with self.assertNumQueries(2):
+            geocoding.geocode('100 Congress Ave, Austin, TX')
+        self.assertGreater(GeocodeCacheEntry.objects.get().last_used_at, stale)
+        self.assertEqual(gmaps.geocode.call_count, 1)
+
+    def test_creating_a_location_through_the_form_geocodes_once(self, gmaps):
+        gmaps.geocode.return_value = [GEOCODE_RESULT]
+        gmaps.timezone.return_value = {'status': 'OK', 'timeZoneId': 'America/Chicago'}
+        form = LocationForm(data={
+            'house_number': '100', 'road': 'congress ave', 'city': 'austin', 'state': 'TX', 'postcode': '78701',
+            'country': self.us.pk, 'location_function': self.location_function.pk,
+        })
+
+        self.assertTrue(form.is_valid(), form.errors)
+        location = form.save()
+
+        self.assertEqual(gmaps.geocode.call_count, 1)
+        self.assertEqual(geocoding.stats['api_calls'], 2)  # the geocode and the time zone
+        location.refresh_from_db()
+        self.assertEqual((location.road, location.state, location.state_abbreviation), ('Congress Avenue', 'Texas', 'TX'))
+        self.assertEqual(location.google_maps_place_id, 'ChIJ-congress-ave')
+        self.assertEqual(location.timezone, 'America/Chicago')
+        self.assertTrue(location.verified_location)
+
+    def test_changed_fields(self, gmaps):
+        self.assertEqual(Location(country=self.us).changed_fields(), set(Location.TRACKED_FIELDS))
+
+        location = Location.objects.get(site_id='UNDESIGNATED')
+        self.assertEqual(location.changed_fields(), set())
+        location.notes = 'Loading dock at the back'
+        self.assertFalse(location.address_changed())
+        location.road = 'Congress Ave'
+        location.contact_phone = '612 555 0100'
+        self.assertEqual(location.changed_fields(), {'road', 'contact_phone'})
+        self.assertEqual(location.changed_fields(['road', 'city']), {'road'})
+        self.assertTrue(location.address_changed())
+
+        # Fields that were never loaded can't be compared, so count as changed
+        deferred = Location.objects.only('pk', 'road').get(site_id='UNDESIGNATED')
+        with self.assertNumQueries(0):
+            self.assertEqual(deferred.changed_fields(['road', 'city']), {'city'})
+
+    def test_saving_without_an_address_change_skips_geocoding(self, gmaps):
+        gmaps.geocode.return_value = [GEOCODE_RESULT]
+        location = Location.objects.get(site_id='UNDESIGNATED')
+
+        location.notes = 'Loading dock at the back'
+        location.save()
+        location = Location.objects.get(pk=location.pk)
+        location.notes = 'Loading dock on the left'
+        location.save()
+
+        gmaps.geocode.assert_not_called()
+        self.assertEqual(geocoding.stats['skipped_unchanged'], 2)
+
+        location.road = 'Congress Ave'
+        location.save()
+        location.save()
+
+        self.assertEqual(gmaps.geocode.call_count, 1)
+        self.assertEqual(geocoding.stats['skipped_unchanged'], 3)
+        self.assertEqual(location.changed_fields(), set())
+
+
+class ValidateLocationsCommandTests(TelephonyTestCase):
+    def setUp(self):
+        super().setUp()
+        stub_geocoder_calls.clear()
+        for house_number in ('10', '20', '30', '40'):
+            self.create_location(name=f'Site {house_number}', site_id=f'SITE{house_number}', house_number=house_number)
+
+    @mock.patch.object(location_validation.connections, 'close_all')
+    @mock.patch.object(location_validation.time, 'sleep')
+    def test_validates_through_a_stub_geocoder(self, sleep, close_all):
+        stdout = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                'validate_locations', geocoder='telephony.tests.stub_geocoder', workers=2, rate_limit=0,
+                max_retries=2, batch_size=3, stdout=stdout,
+            )
+
+        self.assertIn('Checked 5 locations: 3 verified, 1 not found, 1 failed', stdout.getvalue())
+        # Three tries each for 30 and 40, backing off 1s then 2s in between
+        self.assertEqual(dict(stub_geocoder_calls), {'1': 1, '10': 1, '20': 1, '30': 3, '40': 3})
+        self.assertEqual(sorted(call.args[0] for call in sleep.call_args_list), [1.0, 1.0, 2.0, 2.0])
+        # One bulk_update per batch of three, and one connection cleanup per worker thread
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(close_all.call_count, 2)
+
+        locations = {location.house_number: location for location in Location.objects.all()}
+        self.assertTrue(locations['10'].verified_location)
+        self.assertEqual(locations['10'].google_maps_place_id, 'ChIJ-congress-ave')
+        self.assertEqual((locations['30'].latitude, locations['30'].longitude), (30.2649, -97.7445))
+        self.assertFalse(locations['20'].verified_location)
+        self.assertEqual(locations['20'].formatted_address, '')
+        self.assertFalse(locations['40'].verified_location)
+
+    def test_staleness_is_measured_from_the_last_geocode(self):
+        now = timezone.now()
+        Location.objects.update(verified_location=True, verified_at=now - timedelta(days=1))
+        # Geocoded long ago, but edited (notes, a bulk edit) since
+        Location.objects.filter(house_number='10').update(verified_at=now - timedelta(days=400), updated_at=now)
+        Location.objects.filter(house_number='20').update(verified_location=False, verified_at=None)
+
+        stale = location_validation.locations_to_validate(stale_days=365)
+
+        self.assertEqual(sorted(stale.values_list('house_number', flat=True)), ['10', '20'])
+
+    @mock.patch.object(location_validation.connections, 'close_all')
+    def test_not_found_drops_the_earlier_geocode(self, close_all):
+        verified_at = timezone.now() - timedelta(days=400)
+        Location.objects.filter(house_number__in=['10', '20']).update(
+            verified_location=True, verified_at=verified_at, latitude=1.0, longitude=2.0,
+            formatted_address='Old address', google_maps_place_id='ChIJ-old',
+        )
+
+        location_validation.validate_locations(
+            location_validation.locations_to_validate(stale_days=365).filter(house_number__in=['10', '20']),
+            geocoder=stub_geocoder, workers=1, rate_limit=0,
+        )
 
-# Create your tests here.
+        found, not_found = Location.objects.get(house_number='10'), Location.objects.get(house_number='20')
+        self.assertTrue(found.verified_location)
+        self.assertGreater(found.verified_at, verified_at)
+        self.assertEqual(
+            (not_found.verified_location, not_found.verified_at, not_found.latitude, not_found.longitude,
+             not_found.formatted_address, not_found.google_maps_place_id),
+            (False, None, None, None, '', ''),
+        )
@@ -6,13 +6,17 @@ from .views import (
   LocationFunctionListView, LocationFunctionCreateView, LocationFunctionUpdateView, LocationFunctionDeleteView,
   PhoneNumberListView, PhoneNumberCreateView, PhoneNumberUpdateView, PhoneNumberDetailView, PhoneNumberDeleteView, PhoneNumberBulkUpdateView,
   PhoneNumberRangeListView, PhoneNumberRangeCreateView, PhoneNumberRangeUpdateView, PhoneNumberRangeDetailView, PhoneNumberRangeDeleteView,
+  phone_number_range_job_status, phone_number_range_members,
   UsageTypeListView, UsageTypeCreateView, UsageTypeUpdateView, UsageTypeDetailView, UsageTypeDeleteView,
   CircuitListView, CircuitCreateView, CircuitUpdateView, CircuitDetailView, CircuitDeleteView,
   SwitchTypeListView, SwitchTypeCreateView, SwitchTypeUpdateView, SwitchTypeDetailView, SwitchTypeDeleteView,
   ConnectionTypeListView, ConnectionTypeCreateView, ConnectionTypeUpdateView, ConnectionTypeDetailView, ConnectionTypeDeleteView,
   country_list,
-  generic_bulk_update, generic_bulk_delete
+  generic_bulk_update, generic_bulk_delete, bulk_delete_job_status
 )
+from .api import api_index, api_list
+from .exports import export_table
+from .imports import import_table
 from .models import Location, ServiceProvider, CircuitDetail, PhoneNumber, PhoneNumberRange, Country, LocationFunction, ServiceProviderRep
 
 app_name = 'telephony'
@@ -67,6 +71,10 @@ urlpatterns = [
     path('phone_number_range/<int:pk>/edit/', PhoneNumberRangeUpdateView.as_view(), name='phone_number_range_edit'),
     path('phone_number_range/<int:pk>/details/', PhoneNumberRangeDetailView.as_view(), name='phone_number_range_details'),
     path('phone_number_range/<int:pk>/delete/', PhoneNumberRangeDeleteView.as_view(), name='phone_number_range_delete'),
+    path('phone_number_range/jobs/<str:job_id>/', phone_number_range_job_status, name='phone_number_range_job_status'),
+    path('phone_number_range/<int:pk>/numbers/', phone_number_range_members, name='phone_number_range_members'),
+    path('phone_number_range/batch_edit/', generic_bulk_update, {'model_class': PhoneNumberRange}, name='phone_number_range_batch_edit'),
+    path('phone_number_range/batch_delete/', generic_bulk_delete, {'model_class': PhoneNumberRange}, name='phone_number_range_batch_delete'),
     
    #Usage Type URLs
     path('usage_type/', UsageTypeListView.as_view(), name='usage_type'),
@@ -81,6 +89,8 @@ urlpatterns = [
     path('circuit_detail/<int:pk>/edit/', CircuitUpdateView.as_view(), name='circuit_detail_edit'),
     path('circuit_detail/<int:pk>/details/', CircuitDetailView.as_view(), name='circuit_detail_details'),
     path('circuit_detail/<int:pk>/delete/', CircuitDeleteView.as_view(), name='circuit_detail_delete'),
+    path('circuit_detail/batch_edit/', generic_bulk_update, {'model_class': CircuitDetail}, name='circuit_detail_batch_edit'),
+    path('circuit_detail/batch_delete/', generic_bulk_delete, {'model_class': CircuitDetail}, name='circuit_detail_batch_delete'),
 
    #Switch Type URLs
     path('switch_type/', SwitchTypeListView.as_view(), name='switch_type'),
@@ -96,5 +106,16 @@ urlpatterns = [
     path('connection_type/<int:pk>/details/', ConnectionTypeDetailView.as_view(), name='connection_type_details'),
     path('connection_type/<int:pk>/delete/', ConnectionTypeDeleteView.as_view(), name='connection_type_delete'),
 
+    # Bulk delete jobs
+    path('bulk_delete/jobs/<str:job_id>/', bulk_delete_job_status, name='bulk_delete_job_status'),
+
+    # Read-only JSON API (NDJSON, keyset paginated)
+    path('api/', api_index, name='api_index'),
+    path('api/<slug:model_name>/', api_list, name='api_list'),
+
+    # CSV/XLSX exports of the list view tables
+    path('<slug:model_name>/export.<slug:file_format>', export_table, name='export_table'),
+    path('<slug:model_name>/import/', import_table, name='import_table'),
+
 ]
 
@@ -2,9 +2,15 @@ import googlemaps
 import logging
 import inflection
 import json
+import time
+from celery.result import AsyncResult
 from django.shortcuts import render, redirect, get_object_or_404, get_list_or_404
 from django.urls import reverse_lazy, reverse
 from django.views.generic import CreateView, UpdateView, ListView, DeleteView, DetailView, View
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.db.models import Count, Max
+from django_filters.filterset import filterset_factory
 from django.views.decorators.http import require_POST, require_http_methods
 from django.conf import settings
 from django.http import JsonResponse, HttpResponseRedirect
@@ -15,6 +21,12 @@ from .models import Location, ServiceProvider, CircuitDetail, PhoneNumber, Phone
 from telephony.templatetags import custom_filters
 from .forms import CircuitDetailForm, LocationForm, SearchForm, PhoneNumberForm, PhoneNumberRangeForm, CountryForm, ServiceProviderForm, LocationFunctionForm, ServiceProviderRepForm, UsageTypeForm, SwitchTypeForm, ConnectionTypeForm
 from .utils import validate_address
+from .geocoding import GeocodingError
+from .tasks import provision_phone_number_range, bulk_delete_rows
+from .filters import ServiceProviderFilter, ServiceProviderRepFilter, LocationFilter, LocationFunctionFilter, PhoneNumberFilter, PhoneNumberRangeFilter, UsageTypeFilter, CircuitDetailFilter, SwitchTypeFilter, ConnectionTypeFilter
+from .pagination import paginate_keyset
+from .bulk_edit import BulkEditError, bulk_edit, select
+from .bulk_delete import INLINE_LIMIT, affected_rows, check_deletable, delete_in_chunks
 
 logger = logging.getLogger(__name__)
 
@@ -46,25 +58,88 @@ def country_list(request):
 
 
 
+def bulk_edit_payload(request):
+    """The batch edit request as a dict, from a JSON body or form-encoded ``ids[]`` and fields."""
+    if request.content_type == 'application/json' or request.body[:1] == b'{':
+        payload = json.loads(request.body)
+        if not isinstance(payload, dict):
+            raise ValueError('Expected a JSON object.')
+        return payload
+    payload = request.POST.dict()
+    payload.pop('ids[]', None)
+    ids = request.POST.getlist('ids[]') or request.POST.getlist('ids')
+    if ids:
+        payload['ids'] = ids
+    return payload
+
+
+def bulk_edit_response(model_class, request, allowed=None):
+    try:
+        payload = bulk_edit_payload(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'errors': {'__all__': [f'Invalid request body: {e}']}}, status=400)
+    try:
+        result = bulk_edit(model_class, payload, allowed)
+    except BulkEditError as e:
+        return JsonResponse({'success': False, 'errors': e.errors}, status=400)
+    return JsonResponse({'success': True, **result})
+
+
 @require_POST
 def generic_bulk_update(request, model_class):
-    data = json.loads(request.body)
-    ids = data.get('ids', [])
-    update_data = data.get('data', {})
+    return bulk_edit_response(model_class, request)
 
-    # Remove any fields you don't want to update
-    update_data.pop('directory_number', None)
+def bulk_delete_response(model_class, request):
+    """
+    ``dry_run`` returns the rows a delete would affect per model. Otherwise a
+    small selection is deleted in the request and a large one is handed to
+    the bulk_delete_rows task, answered with 202 and the job's status URL.
+    """
+    try:
+        payload = bulk_edit_payload(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'errors': {'__all__': [f'Invalid request body: {e}']}}, status=400)
+    try:
+        queryset = select(model_class, payload.get('ids'), payload.get('filter'))
+        counts = check_deletable(queryset)
+        if payload.get('dry_run') in (True, 'true', '1', 'on'):
+            return JsonResponse({'success': True, 'dry_run': True, 'counts': counts})
+        if affected_rows(counts) <= INLINE_LIMIT:
+            return JsonResponse({'success': True, 'counts': delete_in_chunks(queryset)})
+    except BulkEditError as e:
+        return JsonResponse({'success': False, 'errors': e.errors}, status=400)
+
+    # Pin the task to the rows estimated: the filter alone would be re-run
+    # against whatever the table holds when the worker gets to it
+    pinned = queryset.aggregate(max_pk=Max('pk'), expected=Count('pk'))
+    job = bulk_delete_rows.delay(model_class._meta.label, payload.get('ids'), payload.get('filter'), **pinned)
+    return JsonResponse({
+        'success': True,
+        'job_id': job.id,
+        'status_url': reverse('telephony:bulk_delete_job_status', args=[job.id]),
+        'counts': counts,
+    }, status=202)
 
-    model_class.objects.filter(id__in=ids).update(**update_data)
-    return JsonResponse({'success': True})
 
 @require_POST
 def generic_bulk_delete(request, model_class):
-    data = json.loads(request.body)
-    ids = data.get('ids', [])
-
-    model_class.objects.filter(id__in=ids).delete()
-    return JsonResponse({'success': True})
+    return bulk_delete_response(model_class, request)
+
+
+def bulk_delete_job_status(request, job_id):
+    result = AsyncResult(job_id)
+    info = result.info if isinstance(result.info, dict) else {}
+    data = {
+        'job_id': job_id,
+        'state': result.state,
+        'model': info.get('model'),
+        'done': info.get('done', 0),
+        'total': info.get('total'),
+        'counts': info.get('counts'),
+    }
+    if result.failed():
+        data['error'] = str(result.result)
+    return JsonResponse(data)
 
 
 
@@ -72,18 +147,116 @@ def generic_bulk_delete(request, model_class):
 class ValidateLocationView(View):
     def post(self, request, pk, *args, **kwargs):
         location = get_object_or_404(Location, pk=pk)
-        address = f"{location.house_number} {location.road}, {location.city}, {location.state}, {location.country.name} {location.postcode}"
-        formatted_address, is_valid = validate_address(address)
+        try:
+            formatted_address, is_valid = validate_address(location.geocode_address())
+        except GeocodingError:
+            formatted_address, is_valid = None, False
         if is_valid:
-            location.verified_location = True
+            location.mark_verified()
             location.save()
             messages.success(request, "Address has been validated.")
         else:
             messages.error(request, "Address could not be validated.")
-        return HttpResponseRedirect(reverse_lazy('telephony:locations'))
+        return HttpResponseRedirect(reverse_lazy('telephony:location'))
     
 
-class BaseListView(ListView):
+class TableMixin:
+    """
+    Filters, sorts and paginates the rows shown in the shared table in base.html.
+
+    Sorting is driven by ``?sort=<field>&order=asc|desc`` (restricted to
+    ``table_fields``) and filtering by ``filterset_class``. Views over large
+    tables set ``keyset_pagination`` so pages are fetched by cursor instead of
+    OFFSET/COUNT and stay equally fast however deep the user pages.
+
+    ``table_related_fields`` lists the foreign keys rendered in the table; they
+    are joined with select_related() and the row is narrowed with only() so a
+    page costs the same number of queries whatever its size.
+    """
+    table_headers = []
+    table_fields = []
+    table_related_fields = []
+    filterset_class = None
+    page_size = 50
+    keyset_pagination = False
+
+    def get_table_queryset(self):
+        queryset = self.get_queryset()
+        if self.table_related_fields:
+            queryset = queryset.select_related(*self.table_related_fields)
+        columns = {name for name in self.table_fields if self.model._meta.get_field(name).concrete}
+        columns.update(self.table_related_fields)
+        if columns:
+            queryset = queryset.only(*columns)
+        return queryset
+
+    def get_filterset(self):
+        filterset_class = self.filterset_class or filterset_factory(self.model, fields=[])
+        return filterset_class(self.request.GET or None, queryset=self.get_table_queryset(), request=self.request)
+
+    def get_table_sort(self):
+        sort_by = self.request.GET.get('sort')
+        if sort_by not in self.table_fields:
+            sort_by = None
+        order = 'desc' if self.request.GET.get('order') == 'desc' else 'asc'
+        return sort_by, order
+
+    def get_table_context(self):
+        filterset = self.get_filterset()
+        queryset = filterset.qs
+        sort_by, order = self.get_table_sort()
+        descending = order == 'desc'
+        sort_field = self.model._meta.get_field(sort_by) if sort_by else None
+
+        context = {
+            'filter': filterset,
+            'table_headers': self.table_headers,
+            'table_fields': self.table_fields,
+            'table_columns': list(zip(self.table_headers, self.table_fields)),
+            'sort_by': sort_by,
+            'order': order,
+            'next_page': None,
+            'previous_page': None,
+            'next_cursor': None,
+            'previous_cursor': None,
+        }
+
+        # Keyset pagination needs a total order, so nullable sort columns fall
+        # back to the regular paginator.
+        if self.keyset_pagination and (sort_field is None or not sort_field.null):
+            try:
+                page = paginate_keyset(
+                    queryset,
+                    sort_field.attname if sort_field else 'pk',
+                    descending=descending,
+                    cursor=self.request.GET.get('cursor'),
+                    per_page=self.page_size,
+                )
+            except ValueError:
+                raise Http404('Invalid page cursor.')
+            context.update({
+                'items': page.object_list,
+                'next_cursor': page.next_cursor,
+                'previous_cursor': page.previous_cursor,
+            })
+            return context
+
+        if sort_by:
+            prefix = '-' if descending else ''
+            queryset = queryset.order_by(f'{prefix}{sort_by}', f'{prefix}pk')
+        elif not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        page = Paginator(queryset, self.page_size).get_page(self.request.GET.get('page'))
+        context.update({
+            'items': page.object_list,
+            'page_obj': page,
+            'next_page': page.next_page_number() if page.has_next() else None,
+            'previous_page': page.previous_page_number() if page.has_previous() else None,
+        })
+        return context
+
+
+class BaseListView(TableMixin, ListView):
     """
     Base class for ListView that handles common context data setup.
     """
@@ -91,14 +264,12 @@ class BaseListView(ListView):
     form_class = None
     template_name = None
     context_object_name = 'items'
-    table_headers = []
-    table_fields = []
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         model_name_snake_case = inflection.underscore(self.model._meta.object_name)
         context['form'] = self.form_class()
-        context['items'] = self.model.objects.all()
+        context.update(self.get_table_context())
         context.update({
             'show_form': True,
             'show_table': True,
@@ -110,8 +281,6 @@ class BaseListView(ListView):
             'bulk_delete_url': f'telephony:{model_name_snake_case}_batch_delete',
             'clear_view_url': reverse_lazy(f'telephony:{model_name_snake_case}'),
             'table_class': f'{model_name_snake_case}-table',
-            'table_headers': self.table_headers,
-            'table_fields': self.table_fields,
             'form_class': f'{model_name_snake_case}-form',
             'form_fields': [field.name for field in self.model._meta.fields],
             'linkable_fields': [
@@ -133,7 +302,7 @@ class BaseListView(ListView):
         model_name_snake_case = inflection.underscore(self.model._meta.object_name)
         return reverse_lazy(f'telephony:{model_name_snake_case}')
 
-class BaseCreateView(CreateView):
+class BaseCreateView(TableMixin, CreateView):
     """
     Base class for CreateView that handles common context data setup.
     """
@@ -146,7 +315,7 @@ class BaseCreateView(CreateView):
         context = super().get_context_data(**kwargs)
         model_name_snake_case = inflection.underscore(self.model._meta.object_name)
         context['form'] = self.form_class()
-        context['items'] = self.model.objects.all()
+        context.update(self.get_table_context())
         context['object'] = self.get_object()
         context.update({
             'show_form': True,
@@ -159,8 +328,6 @@ class BaseCreateView(CreateView):
             'bulk_delete_url': f'telephony:{model_name_snake_case}_batch_delete',
             'clear_view_url': reverse_lazy(f'telephony:{model_name_snake_case}'),
             'table_class': f'{model_name_snake_case}-table',
-            'table_headers': self.table_headers,
-            'table_fields': self.table_fields,
             'form_class': f'{model_name_snake_case}-form',
             'form_fields': [field.name for field in self.model._meta.fields],
             'linkable_fields': [
@@ -186,7 +353,7 @@ class BaseCreateView(CreateView):
         form.save()
         return super().form_valid(form)
 
-class BaseUpdateView(UpdateView):
+class BaseUpdateView(TableMixin, UpdateView):
     """
     Base class for UpdateView that handles common context data setup.
     """
@@ -199,7 +366,7 @@ class BaseUpdateView(UpdateView):
         context = super().get_context_data(**kwargs)
         model_name_snake_case = inflection.underscore(self.model._meta.object_name)
         context['form'] = self.get_form()
-        context['items'] = self.model.objects.all()
+        context.update(self.get_table_context())
         context['object'] = self.get_object()
         context.update({
             'show_form': True,
@@ -212,8 +379,6 @@ class BaseUpdateView(UpdateView):
             'bulk_delete_url': f'telephony:{model_name_snake_case}_batch_delete',
             'clear_view_url': reverse_lazy(f'telephony:{model_name_snake_case}'),
             'table_class': f'{model_name_snake_case}-table',
-            'table_headers': self.table_headers,
-            'table_fields': self.table_fields,
             'form_class': f'{model_name_snake_case}-form',
             'form_fields': [field.name for field in self.model._meta.fields],
             'linkable_fields': [
@@ -275,43 +440,26 @@ class BaseDeleteView(DeleteView):
 
 
 class BulkDeleteView(View):
+    """Estimated, chunked bulk delete, see telephony.bulk_delete."""
     model = None
 
     def post(self, request, *args, **kwargs):
-        ids = request.POST.getlist('ids[]')
-        if ids:
-            self.model.objects.filter(id__in=ids).delete()
-            return JsonResponse({'success': True})
-        else:
-            return JsonResponse({'success': False, 'error': 'No IDs provided for deletion.'})
+        return bulk_delete_response(self.model, request)
         
 
 class BulkUpdateView(View):
+    """Bulk edit restricted to ``fields_to_update``, see telephony.bulk_edit."""
     model = None
     fields_to_update = []
 
     def post(self, request, *args, **kwargs):
-        ids = request.POST.getlist('ids[]')
-        update_data = request.POST.dict()
-
-        # Remove non-update data (like csrfmiddlewaretoken, ids)
-        for key in ['csrfmiddlewaretoken', 'ids']:
-            update_data.pop(key, None)
-
-        if ids and update_data:
-            # Ensure only allowed fields are updated
-            update_data = {key: value for key, value in update_data.items() if key in self.fields_to_update}
-
-            # Update the records
-            self.model.objects.filter(id__in=ids).update(**update_data)
-            return JsonResponse({'success': True})
-        else:
-            return JsonResponse({'success': False, 'error': 'No IDs provided or no valid fields to update.'})
+        return bulk_edit_response(self.model, request, allowed=self.fields_to_update)
 
 
 class ServiceProviderListView(BaseListView):
     model = ServiceProvider
     form_class = ServiceProviderForm
+    filterset_class = ServiceProviderFilter
     table_headers = ['Provider', 'Support Number', 'Contract Number', 'Contract Details', 'Website', 'Notes']
     table_fields = ['provider_name', 'support_number', 'contract_number', 'contract_details', 'website_url', 'notes']
     form_fields = ['provider_name', 'support_number', 'contract_number', 'contract_details', 'website_url', 'notes']
@@ -337,6 +485,7 @@ class ServiceProviderCreateView(BaseCreateView):
 class ServiceProviderUpdateView(BaseUpdateView):
     model = ServiceProvider
     form_class = ServiceProviderForm
+    filterset_class = ServiceProviderFilter
     table_headers = ['Provider', 'Support Number', 'Contract Number', 'Contract Details', 'Website', 'Notes']
     table_fields = ['provider_name', 'support_number', 'contract_number', 'contract_details', 'website_url', 'notes']
     success_url = reverse_lazy('telephony:service_provider')
@@ -365,6 +514,8 @@ class ServiceProviderDeleteView(BaseDeleteView):
 class ServiceProviderRepListView(BaseListView):
     model = ServiceProviderRep
     form_class = ServiceProviderRepForm
+    filterset_class = ServiceProviderRepFilter
+    table_related_fields = ['provider']
     table_headers = ['Representative', 'Contact Number', 'Contact Email', 'Provider', 'Notes']
     table_fields = ['account_rep_name', 'account_rep_phone', 'account_rep_email', 'provider', 'notes']
 
@@ -376,6 +527,8 @@ class ServiceProviderRepCreateView(BaseCreateView):
 class ServiceProviderRepUpdateView(BaseUpdateView):
     model = ServiceProviderRep
     form_class = ServiceProviderRepForm
+    filterset_class = ServiceProviderRepFilter
+    table_related_fields = ['provider']
     table_headers = ['Representative', 'Contact Number', 'Contact Email', 'Provider', 'Notes']
     table_fields = ['account_rep_name', 'account_rep_phone', 'account_rep_email', 'provider', 'notes']
     success_url = reverse_lazy('telephony:service_provider_rep')
@@ -393,6 +546,8 @@ class ServiceProviderRepDeleteView(BaseDeleteView):
 class LocationListView(BaseListView):
     model = Location
     form_class = LocationForm
+    filterset_class = LocationFilter
+    table_related_fields = ['country']
     table_headers = ['Name', 'Site ID', 'House Number', 'Street/Road', 'City', 'State', 'Country', 'Postcode', 'Site ID', 'Trunk Access Code', 'Verified']
     table_fields = ['name', 'site_id', 'house_number', 'road', 'city', 'state', 'country', 'postcode', 'site_id', 'trunk_access_code', 'verified_location']
     form_fields = ['name', 'site_id', 'display_name', 'house_number', 'road', 'city', 'state', 'postcode', 'country', 'site_id', 'trunk_access_code', 'notes']
@@ -421,6 +576,8 @@ class LocationCreateView(BaseCreateView):
 class LocationUpdateView(BaseUpdateView):
     model = Location
     form_class = LocationForm
+    filterset_class = LocationFilter
+    table_related_fields = ['country']
     template_name = 'telephony/location.html'
     table_headers = ['Name', 'Site ID', 'House Number', 'Street/Road', 'City', 'State', 'Country', 'Postcode', 'Site ID', 'Trunk Access Code', 'Verified']
     table_fields = ['name', 'site_id', 'house_number', 'road', 'city', 'state', 'country', 'postcode', 'site_id', 'trunk_access_code', 'verified_location']
@@ -454,6 +611,7 @@ class LocationDeleteView(BaseDeleteView):
 class LocationFunctionListView(BaseListView):
     model = LocationFunction
     form_class = LocationFunctionForm
+    filterset_class = LocationFunctionFilter
     template_name = 'telephony/location_function.html'
     table_headers = ['Name', 'Function Code', 'Description']
     table_fields = ['function_name', 'function_code', 'description']
@@ -468,6 +626,7 @@ class LocationFunctionCreateView(BaseCreateView):
 class LocationFunctionUpdateView(BaseUpdateView):
     model = LocationFunction
     form_class = LocationFunctionForm
+    filterset_class = LocationFunctionFilter
     template_name = 'telephony/location_function.html'
     table_headers = ['Name', 'Function Code', 'Description']
     table_fields = ['function_name', 'function_code', 'description']
@@ -487,6 +646,9 @@ class LocationFunctionDeleteView(BaseDeleteView):
 class PhoneNumberListView(BaseListView):
     model = PhoneNumber
     form_class = PhoneNumberForm
+    filterset_class = PhoneNumberFilter
+    keyset_pagination = True
+    table_related_fields = ['country', 'location', 'service_provider']
     table_headers = [
         'Directory Number', 
         'Country', 
@@ -550,6 +712,9 @@ class PhoneNumberCreateView(BaseCreateView):
 class PhoneNumberUpdateView(BaseUpdateView):
     model = PhoneNumber
     form_class = PhoneNumberForm
+    filterset_class = PhoneNumberFilter
+    keyset_pagination = True
+    table_related_fields = ['country', 'location', 'service_provider']
     table_headers = [
         'Directory Number', 
         'Country', 
@@ -625,6 +790,9 @@ class PhoneNumberBulkUpdateView(BulkUpdateView):
 class PhoneNumberRangeListView(BaseListView):
     model = PhoneNumberRange
     form_class = PhoneNumberRangeForm
+    filterset_class = PhoneNumberRangeFilter
+    keyset_pagination = True
+    table_related_fields = ['country', 'service_provider', 'location', 'usage_type']
     table_headers = [
         'Range Start Number',
         'Range End Number',
@@ -665,13 +833,106 @@ class PhoneNumberRangeListView(BaseListView):
         })
         return context
 
+def enqueue_phone_number_range_provisioning(request, phone_number_range):
+    """Hand the range's numbers off to Celery and tell the user where to poll for progress."""
+    job = provision_phone_number_range.delay(phone_number_range.pk)
+    status_url = reverse('telephony:phone_number_range_job_status', args=[job.id])
+    messages.info(request, f"Provisioning numbers for {phone_number_range} in the background (job {job.id}, status: {status_url}).")
+    return job
+
+
+def phone_number_range_job_status(request, job_id):
+    result = AsyncResult(job_id)
+    info = result.info if isinstance(result.info, dict) else {}
+    done = info.get('done', 0)
+    total = info.get('total')
+
+    eta_seconds = None
+    if result.successful():
+        eta_seconds = 0
+    elif result.state == 'PROGRESS' and done and total:
+        elapsed = time.time() - info['started_at']
+        eta_seconds = round(elapsed / done * (total - done), 1)
+
+    data = {
+        'job_id': job_id,
+        'state': result.state,
+        'phone_number_range_id': info.get('phone_number_range_id'),
+        'done': done,
+        'total': total,
+        'eta_seconds': eta_seconds,
+        'created': info.get('created'),
+        'updated': info.get('updated'),
+    }
+    if result.failed():
+        data['error'] = str(result.result)
+    return JsonResponse(data)
+
+
+def phone_number_range_members(request, pk):
+    """
+    A page of the range's numbers as JSON, stored rows and (for sparse ranges)
+    unstored members merged in number order. ``?after=`` takes the previous
+    page's ``next`` value; ``?limit=`` is capped at 1000.
+    """
+    phone_number_range = get_object_or_404(PhoneNumberRange, pk=pk)
+    try:
+        after = int(request.GET['after'].lstrip('+')) if request.GET.get('after') else None
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 1000)
+    except ValueError:
+        return JsonResponse({'error': 'after and limit must be integers'}, status=400)
+
+    members = phone_number_range.members(after=after, limit=limit)
+    last = int(members[-1].directory_number.lstrip('+')) if members else None
+    return JsonResponse({
+        'phone_number_range_id': phone_number_range.pk,
+        'sparse': phone_number_range.sparse,
+        'numbers': [
+            {
+                'id': phone_number.pk,
+                'directory_number': phone_number.directory_number,
+                'subscriber_number': phone_number.subscriber_number,
+                'stored': phone_number.pk is not None,
+                'is_active': phone_number.is_active,
+                'assigned_to': phone_number.assigned_to,
+                'status': phone_number.status,
+                'notes': phone_number.notes,
+            }
+            for phone_number in members
+        ],
+        'next': last if last is not None and last < phone_number_range.end_value else None,
+    })
+
+
 class PhoneNumberRangeCreateView(BaseCreateView):
     model = PhoneNumberRange
     form_class = PhoneNumberRangeForm
 
+    def form_valid(self, form):
+        self.object = form.save(commit=False)
+        self.object.save(provision_numbers=False)
+        job = enqueue_phone_number_range_provisioning(self.request, self.object)
+        if self.request.accepts('application/json') and not self.request.accepts('text/html'):
+            return JsonResponse({
+                'id': self.object.pk,
+                'job_id': job.id,
+                'status_url': reverse('telephony:phone_number_range_job_status', args=[job.id]),
+            }, status=202)
+        return HttpResponseRedirect(self.get_success_url())
+
 class PhoneNumberRangeUpdateView(BaseUpdateView):
     model = PhoneNumberRange
     form_class = PhoneNumberRangeForm
+    filterset_class = PhoneNumberRangeFilter
+    keyset_pagination = True
+    table_related_fields = ['country', 'service_provider', 'location', 'usage_type']
+
+    def form_valid(self, form):
+        self.object = form.save(commit=False)
+        self.object.save(provision_numbers=False)
+        enqueue_phone_number_range_provisioning(self.request, self.object)
+        return HttpResponseRedirect(self.get_success_url())
+
     table_headers = [
         'Range Start Number',
         'Range End Number',
@@ -722,6 +983,7 @@ class PhoneNumberRangeDeleteView(BaseDeleteView):
 class UsageTypeListView(BaseListView):
     model = UsageType
     form_class = UsageTypeForm
+    filterset_class = UsageTypeFilter
     template_name = 'telephony/usage_type.html'
     table_headers = ['Use', 'Used By']
     table_fields = ['usage_type', 'usage_for']
@@ -736,6 +998,7 @@ class UsageTypeCreateView(BaseCreateView):
 class UsageTypeUpdateView(BaseUpdateView):
     model = UsageType
     form_class = UsageTypeForm
+    filterset_class = UsageTypeFilter
     template_name = 'telephony/usage_type.html'
     table_headers = ['Use', 'Used By']
     table_fields = ['usage_type', 'usage_for']
@@ -753,6 +1016,8 @@ class UsageTypeDeleteView(BaseDeleteView):
 class CircuitListView(BaseListView):
     model = CircuitDetail
     form_class = CircuitDetailForm
+    filterset_class = CircuitDetailFilter
+    table_related_fields = ['provider', 'location', 'connection_type', 'switch_type']
     template_name = 'telephony/usage_type.html'
     table_headers = [
             'circuit_number', 'provider', 'location', 'btn', 'voice_channel_count',
@@ -780,6 +1045,8 @@ class CircuitCreateView(BaseCreateView):
 class CircuitUpdateView(BaseUpdateView):
     model = CircuitDetail
     form_class = CircuitDetailForm
+    filterset_class = CircuitDetailFilter
+    table_related_fields = ['provider', 'location', 'connection_type', 'switch_type']
     template_name = 'telephony/usage_type.html'
     table_headers = [
             'circuit_number', 'provider', 'location', 'btn', 'voice_channel_count',
@@ -808,6 +1075,7 @@ class CircuitDeleteView(BaseDeleteView):
 class SwitchTypeListView(BaseListView):
     model = SwitchType
     form_class = SwitchTypeForm
+    filterset_class = SwitchTypeFilter
     template_name = 'telephony/switch_type.html'
     table_headers = ['Switch Type', 'Description']
     table_fields = ['switch_type_name', 'description']
@@ -822,6 +1090,7 @@ class SwitchTypeCreateView(BaseCreateView):
 class SwitchTypeUpdateView(BaseUpdateView):
     model = SwitchType
     form_class = SwitchTypeForm
+    filterset_class = SwitchTypeFilter
     template_name = 'telephony/switch_type.html'
     table_headers = ['Switch Type', 'Description']
     table_fields = ['switch_type_name', 'description']
@@ -838,6 +1107,7 @@ class SwitchTypeDeleteView(BaseDeleteView):
 class ConnectionTypeListView(BaseListView):
     model = ConnectionType
     form_class = ConnectionTypeForm
+    filterset_class = ConnectionTypeFilter
     template_name = 'telephony/connection_type.html'
     table_headers = ['Connection Type', 'Description']
     table_fields = ['connection_type_name', 'description']
@@ -852,6 +1122,7 @@ class ConnectionTypeCreateView(BaseCreateView):
 class ConnectionTypeUpdateView(BaseUpdateView):
     model = ConnectionType
     form_class = ConnectionTypeForm
+    filterset_class = ConnectionTypeFilter
     template_name = 'telephony/connection_type.html'
     table_headers = ['Connection Type', 'Description']
     table_fields = ['connection_type_name', 'description']
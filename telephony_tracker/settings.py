@@ -174,9 +174,20 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 UC_UPLOAD_DIR = os.path.join(MEDIA_ROOT, 'uc_system_uploads')
 
+# Shared by every web and Celery process, so the version tokens that
+# telephony.reference_data keeps in it agree across all of them
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env('CACHE_URL', default='redis://localhost:6379/1'),
+    }
+}
+
 # settings.py
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
-CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
+CELERY_RESULT_BACKEND = 'django-db'  # django_celery_results, so job progress is queryable from views
+CELERY_RESULT_EXTENDED = True
+CELERY_TASK_TRACK_STARTED = True
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
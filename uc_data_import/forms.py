@@ -3,4 +3,5 @@ from django import forms
 class UploadFileForm(forms.Form):
     file = forms.FileField()
     system_name = forms.CharField(max_length=255)
-    version = forms.CharField(max_length=255)
\ No newline at end of file
+    version = forms.CharField(max_length=255)
+    incremental = forms.BooleanField(required=False, help_text='Apply only the rows that changed since the last import of this system')
\ No newline at end of file
@@ -0,0 +1,149 @@
+# uc_data_import/incremental.py
+"""
+Differential re-import of UC tables.
+
+A nightly CUCM export is almost identical to the previous one, so rather than
+dropping and reloading a table, the new CSV is COPYed into a temporary staging
+table and compared with the existing table -- the previous snapshot -- row by
+row on ``pkid``, after casting the staged text to the table's column types.
+A single full join picks out the new, changed and deleted rows, and only
+those are written.
+"""
+from psycopg2 import sql
+from .schema import build_table_schema
+from .utils import copy_csv_into_table
+
+KEY_COLUMN = 'pkid'
+# Surrogate key added by the import_uc_data command; not part of the export
+SURROGATE_KEY = 'id'
+
+RAW_STAGING_TABLE = 'uc_import_raw'
+STAGING_TABLE = 'uc_import_staged'
+
+
+def table_columns(cursor, table_name):
+    """``{column: data type}`` of an existing table, or ``{}`` if there is no such table."""
+    cursor.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position",
+        [table_name],
+    )
+    return dict(cursor.fetchall())
+
+
+def can_diff(existing, columns):
+    """Whether a CSV with ``columns`` can be diffed against a table with ``existing`` columns."""
+    return (
+        bool(existing)
+        and KEY_COLUMN in columns
+        and set(columns) <= set(existing)
+        and set(existing) - set(columns) <= {SURROGATE_KEY}
+    )
+
+
+def _cast(alias, column, data_type):
+    """Expression casting a staged TEXT column to ``data_type``; empty strings become NULL."""
+    if data_type == 'text':
+        return sql.Identifier(alias, column)
+    return sql.SQL("NULLIF({}, '')::{}").format(sql.Identifier(alias, column), sql.SQL(data_type))
+
+
+def _count(cursor, table_name):
+    cursor.execute(sql.SQL('SELECT count(*) FROM {}').format(sql.Identifier(table_name)))
+    return cursor.fetchone()[0]
+
+
+def sync_table(cursor, table_name, columns, csv_file, infer_types=True):
+    """
+    Apply the rows remaining in ``csv_file`` to ``table_name`` as inserts,
+    updates and deletes keyed on pkid. Returns a dict of change counts, or
+    None without reading ``csv_file`` when the table is missing or its columns
+    changed, in which case the caller should load it from scratch.
+
+    Rows that no longer fit the table's inferred types (say, text in a column
+    that was integer) can't be diffed either; the table is then reloaded from
+    the staged rows and retyped.
+    """
+    existing = table_columns(cursor, table_name)
+    if not can_diff(existing, columns):
+        return None
+
+    table = sql.Identifier(table_name)
+    raw = sql.Identifier(RAW_STAGING_TABLE)
+    staged = sql.Identifier(STAGING_TABLE)
+    key = sql.Identifier(KEY_COLUMN)
+    staged_key = _cast('s', KEY_COLUMN, existing[KEY_COLUMN])
+    column_list = sql.SQL(', ').join(sql.Identifier(column) for column in columns)
+
+    cursor.execute(sql.SQL('DROP TABLE IF EXISTS {}, {}').format(raw, staged))
+    cursor.execute(sql.SQL('CREATE TEMP TABLE {} ({})').format(
+        raw, sql.SQL(', ').join(sql.SQL('{} TEXT').format(sql.Identifier(column)) for column in columns),
+    ))
+    rows, _ = copy_csv_into_table(cursor, RAW_STAGING_TABLE, columns, csv_file)
+
+    # One pass over both sides picks out the new, changed and deleted rows;
+    # only those are materialised, already cast to the table's types
+    cursor.execute('SAVEPOINT uc_incremental')
+    try:
+        cursor.execute(sql.SQL(
+            'CREATE TEMP TABLE {staged} AS SELECT COALESCE({staged_key}, t.{key}) AS {key}, {typed}, '
+            't.{key} IS NULL AS is_new, s.{key} IS NULL AS is_deleted '
+            'FROM {raw} s FULL JOIN {table} t ON t.{key} = {staged_key} '
+            'WHERE t.{key} IS NULL OR s.{key} IS NULL OR ROW({current}) IS DISTINCT FROM ROW({incoming})'
+        ).format(
+            staged=staged,
+            staged_key=staged_key,
+            key=key,
+            typed=sql.SQL(', ').join(
+                sql.SQL('{} AS {}').format(_cast('s', column, existing[column]), sql.Identifier(column))
+                for column in columns if column != KEY_COLUMN
+            ),
+            raw=raw,
+            table=table,
+            current=sql.SQL(', ').join(sql.Identifier('t', column) for column in columns),
+            incoming=sql.SQL(', ').join(_cast('s', column, existing[column]) for column in columns),
+        ))
+    except Exception:
+        cursor.execute('ROLLBACK TO SAVEPOINT uc_incremental')
+        cursor.execute('RELEASE SAVEPOINT uc_incremental')
+        return _reload_from_staging(cursor, table_name, columns, existing, rows, infer_types)
+    cursor.execute('RELEASE SAVEPOINT uc_incremental')
+
+    cursor.execute(sql.SQL('DELETE FROM {table} t USING {staged} s WHERE s.is_deleted AND s.{key} = t.{key}').format(
+        table=table, staged=staged, key=key,
+    ))
+    deleted = cursor.rowcount
+    cursor.execute(sql.SQL('UPDATE {table} t SET {assignments} FROM {staged} s WHERE NOT (s.is_new OR s.is_deleted) AND s.{key} = t.{key}').format(
+        table=table,
+        assignments=sql.SQL(', ').join(sql.SQL('{0} = s.{0}').format(sql.Identifier(column)) for column in columns if column != KEY_COLUMN),
+        staged=staged,
+        key=key,
+    ))
+    updated = cursor.rowcount
+    cursor.execute(sql.SQL('INSERT INTO {table} ({columns}) SELECT {columns} FROM {staged} WHERE is_new').format(
+        table=table, columns=column_list, staged=staged,
+    ))
+    inserted = cursor.rowcount
+
+    cursor.execute(sql.SQL('DROP TABLE {}, {}').format(raw, staged))
+    if inserted or updated or deleted:
+        cursor.execute(sql.SQL('ANALYZE {}').format(table))
+    return {'mode': 'incremental', 'inserted': inserted, 'updated': updated, 'deleted': deleted, 'unchanged': rows - inserted - updated}
+
+
+def _reload_from_staging(cursor, table_name, columns, existing, rows, infer_types):
+    """Replace the contents of ``table_name`` with the raw staged rows and retype it."""
+    table = sql.Identifier(table_name)
+    deleted = _count(cursor, table_name)
+    cursor.execute(sql.SQL('TRUNCATE {}').format(table))
+    retyped = [column for column in columns if existing[column] != 'text']
+    if retyped:
+        cursor.execute(sql.SQL('ALTER TABLE {} {}').format(table, sql.SQL(', ').join(
+            sql.SQL('ALTER COLUMN {} TYPE text').format(sql.Identifier(column)) for column in retyped
+        )))
+    column_list = sql.SQL(', ').join(sql.Identifier(column) for column in columns)
+    cursor.execute(sql.SQL('INSERT INTO {} ({}) SELECT {} FROM {}').format(table, column_list, column_list, sql.Identifier(RAW_STAGING_TABLE)))
+    cursor.execute(sql.SQL('DROP TABLE {}').format(sql.Identifier(RAW_STAGING_TABLE)))
+    if infer_types:
+        build_table_schema(cursor, table_name, columns)
+    return {'mode': 'full', 'inserted': rows, 'updated': 0, 'deleted': deleted, 'unchanged': 0}
@@ -1,42 +1,107 @@
 import os
+import time
+import tarfile
 import psycopg2
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from django.core.management.base import BaseCommand
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import environ
+from psycopg2 import sql
+from uc_data_import.incremental import sync_table
+from uc_data_import.schema import build_table_schema
+from uc_data_import.utils import read_csv_header, create_table_sql, copy_csv_into_table, format_load_rate, iter_archive_csv_files
 
 
 env = environ.Env(DEBUG=(bool, False))
 env.read_env(env_file='telephony_tracker/.env')
 
+# Connection owned by the current pool worker process, opened by init_worker
+worker_connection = None
+
+
+def init_worker(connection_kwargs):
+    global worker_connection
+    worker_connection = psycopg2.connect(**connection_kwargs)
+
+
+def load_csv(conn, table_name, csv_file, infer_types=True, incremental=False):
+    """
+    Create ``table_name`` from the CSV header, COPY the rows in and then type
+    and index its columns. In incremental mode an existing table is instead
+    diffed on pkid and only changed rows are written. Returns a result dict
+    rather than raising, so one bad table doesn't abort the others.
+    """
+    result = {'table': table_name, 'rows': 0, 'seconds': 0.0, 'error': None, 'changes': None}
+    started = time.monotonic()
+    cursor = conn.cursor()
+    try:
+        columns = read_csv_header(csv_file)
+        if incremental:
+            result['changes'] = sync_table(cursor, table_name, columns, csv_file, infer_types)
+        if result['changes'] is not None:
+            changes = result['changes']
+            result['rows'] = changes['inserted'] + changes['updated'] + changes['unchanged']
+            conn.commit()
+            return result
+        if incremental:
+            # Missing, or its columns changed since the last export
+            cursor.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(table_name)))
+        cursor.execute(create_table_sql(table_name, columns, extra_columns=['id SERIAL PRIMARY KEY']))
+        result['rows'], _ = copy_csv_into_table(cursor, table_name, columns, csv_file)
+        if infer_types:
+            build_table_schema(cursor, table_name, columns)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        result['error'] = str(e).strip()
+    finally:
+        cursor.close()
+        result['seconds'] = time.monotonic() - started
+    return result
+
+
+def load_csv_file(file_path, conn=None, infer_types=True, incremental=False):
+    """Load one CSV file on ``conn``, or on the pool worker's own connection."""
+    table_name = os.path.splitext(os.path.basename(file_path))[0]  # Use the filename (without extension) as table name
+    with open(file_path, 'r', newline='') as csv_file:
+        return load_csv(conn or worker_connection, table_name, csv_file, infer_types, incremental)
+
+
+def schedule_csv_files(directory):
+    """CSV paths in the directory, largest first (ties by name) so long loads start early."""
+    paths = [os.path.join(directory, filename) for filename in os.listdir(directory) if filename.endswith(".csv")]
+    return sorted(paths, key=lambda path: (-os.path.getsize(path), os.path.basename(path)))
+
 
 class Command(BaseCommand):
     help = 'Import UC data from CSV files'
 
     def add_arguments(self, parser):
-        parser.add_argument('directory', type=str, help='Directory containing CSV files')
+        parser.add_argument('directory', type=str, help='Directory containing CSV files, or a (gzip/bz2) tar archive to stream them from')
         parser.add_argument('db_name', type=str, help='Name of the database to create and populate')
+        parser.add_argument('--incremental', action='store_true', help='Reuse an existing database and apply only the rows that changed, keyed on pkid')
+        parser.add_argument('--text-only', action='store_true', help='Keep every column as TEXT and skip the pkid/fk* indexes')
+        parser.add_argument('--workers', type=int, default=1, help='Number of tables loaded in parallel, each worker with its own connection')
 
     def handle(self, *args, **kwargs):
         directory = kwargs['directory']
         db_name = kwargs['db_name']
-        
+        workers = kwargs['workers']
+        infer_types = not kwargs['text_only']
+        incremental = kwargs['incremental']
+
         # Load database connection details from .env file
         DB_HOST = env("DB_HOST")
         DB_PORT = env("DB_PORT")
         DB_USER = env("DB_USER")
         DB_PASSWORD = env("DB_PASSWORD")
+        connection_kwargs = {'dbname': db_name, 'user': DB_USER, 'password': DB_PASSWORD, 'host': DB_HOST, 'port': DB_PORT}
 
         # Function to create a PostgreSQL connection to the default database
         def create_default_connection():
             try:
-                conn = psycopg2.connect(
-                    dbname="postgres",
-                    user=DB_USER,
-                    password=DB_PASSWORD,
-                    host=DB_HOST,
-                    port=DB_PORT
-                )
+                conn = psycopg2.connect(**{**connection_kwargs, 'dbname': "postgres"})
                 conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
                 return conn
             except Exception as e:
@@ -49,6 +114,11 @@ class Command(BaseCommand):
             if conn:
                 cursor = conn.cursor()
                 try:
+                    if incremental:
+                        cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", [db_name])
+                        if cursor.fetchone():
+                            self.stdout.write(f"Updating existing database {db_name} incrementally.")
+                            return
                     cursor.execute(f"CREATE DATABASE {db_name};")
                     self.stdout.write(self.style.SUCCESS(f"Database {db_name} created successfully."))
                 except Exception as e:
@@ -60,63 +130,85 @@ class Command(BaseCommand):
         # Function to create a connection to a specific database
         def create_connection():
             try:
-                conn = psycopg2.connect(
-                    dbname=db_name,
-                    user=DB_USER,
-                    password=DB_PASSWORD,
-                    host=DB_HOST,
-                    port=DB_PORT
-                )
-                return conn
+                return psycopg2.connect(**connection_kwargs)
             except Exception as e:
                 self.stdout.write(self.style.ERROR(f"Error connecting to database {db_name}: {e}"))
                 return None
 
-        # Function to create a table dynamically based on CSV file header
-        def create_table_from_csv(conn, table_name, columns):
-            cursor = conn.cursor()
-            create_table_query = f"CREATE TABLE IF NOT EXISTS {table_name} (id SERIAL PRIMARY KEY, " + ", ".join([f"{col} TEXT" for col in columns]) + ");"
-            try:
-                cursor.execute(create_table_query)
-                conn.commit()
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Error creating table {table_name}: {e}"))
-            finally:
-                cursor.close()
-
-        # Function to insert data into the table
-        def insert_data_from_csv(conn, table_name, df):
-            cursor = conn.cursor()
-            columns = df.columns.tolist()
-            insert_query = f"INSERT INTO {table_name} (" + ", ".join(columns) + ") VALUES (" + ", ".join(["%s"] * len(columns)) + ")"
+        def report(result):
+            if result['error']:
+                self.stdout.write(self.style.ERROR(f"Error loading table {result['table']}: {result['error']}"))
+            elif result['changes']:
+                changes = result['changes']
+                self.stdout.write(
+                    f"{result['table']}: {changes['inserted']} inserted, {changes['updated']} updated, "
+                    f"{changes['deleted']} deleted, {changes['unchanged']} unchanged in {result['seconds']:.2f}s"
+                )
+            else:
+                self.stdout.write(format_load_rate(result['table'], result['rows'], result['seconds']))
+
+        # Load each file serially on one connection
+        def load_serial(paths):
+            conn = create_connection()
+            if not conn:
+                return []
+            results = []
+            for path in paths:
+                results.append(load_csv_file(path, conn, infer_types, incremental))
+                report(results[-1])
+            conn.close()
+            return results
+
+        # Fan the files out over a process pool, one connection per worker
+        def load_parallel(paths):
+            results = []
             try:
-                for row in df.itertuples(index=False, name=None):
-                    cursor.execute(insert_query, row)
-                conn.commit()
+                with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(connection_kwargs,)) as executor:
+                    for result in executor.map(partial(load_csv_file, infer_types=infer_types, incremental=incremental), paths):
+                        results.append(result)
+                        report(result)
             except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Error inserting data into table {table_name}: {e}"))
-            finally:
-                cursor.close()
+                self.stdout.write(self.style.ERROR(f"Error in import worker pool: {e}"))
+            return results
 
-        # Function to process all CSV files in a directory for a specific database
-        def process_csv_files():
-            create_database()
+        # Stream the CSV members straight out of the archive, one at a time
+        def load_archive(archive_path):
+            if workers > 1:
+                self.stdout.write(self.style.WARNING("Archives are read in a single pass; --workers only applies to directories"))
             conn = create_connection()
             if not conn:
-                return
-            
-            for filename in os.listdir(directory):
-                if filename.endswith(".csv"):
-                    file_path = os.path.join(directory, filename)
-                    table_name = os.path.splitext(filename)[0]  # Use the filename (without extension) as table name
-                    df = pd.read_csv(file_path)
-                    columns = df.columns.tolist()
-                    
-                    # Create table and insert data
-                    create_table_from_csv(conn, table_name, columns)
-                    insert_data_from_csv(conn, table_name, df)
-            
+                return []
+            results = []
+            for table_name, csv_stream in iter_archive_csv_files(archive_path):
+                results.append(load_csv(conn, table_name, csv_stream, infer_types, incremental))
+                report(results[-1])
             conn.close()
+            return results
+
+        def write_summary(results, elapsed):
+            failed = [result for result in results if result['error']]
+            self.stdout.write(f"\n{'Table':<36} {'Rows':>10} {'Seconds':>10}")
+            for result in sorted(results, key=lambda result: -result['seconds']):
+                status = 'FAILED' if result['error'] else ''
+                self.stdout.write(f"{result['table']:<36} {result['rows']:>10} {result['seconds']:>10.2f}  {status}")
+            total_rows = sum(result['rows'] for result in results)
+            message = f"Loaded {total_rows} rows into {len(results) - len(failed)} of {len(results)} tables in {elapsed:.2f}s"
+            if failed:
+                self.stdout.write(self.style.ERROR(f"{message}; failed: {', '.join(result['table'] for result in failed)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(message))
+
+        # Function to process all CSV files in a directory for a specific database
+        def process_csv_files():
+            create_database()
+            started = time.monotonic()
+            if os.path.isfile(directory) and tarfile.is_tarfile(directory):
+                results = load_archive(directory)
+            elif workers > 1:
+                results = load_parallel(schedule_csv_files(directory))
+            else:
+                results = load_serial(schedule_csv_files(directory))
+            write_summary(results, time.monotonic() - started)
 
         # Execute the processing function
-        process_csv_files()
\ No newline at end of file
+        process_csv_files()
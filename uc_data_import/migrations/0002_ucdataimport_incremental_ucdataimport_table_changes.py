@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uc_data_import', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ucdataimport',
+            name='incremental',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='ucdataimport',
+            name='table_changes',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uc_data_import', '0002_ucdataimport_incremental_ucdataimport_table_changes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ucdataimport',
+            name='current_table',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='ucdataimport',
+            name='database_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='ucdataimport',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='ucdataimport',
+            name='file_path',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='ucdataimport',
+            name='rows_loaded',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ucdataimport',
+            name='stage',
+            field=models.CharField(choices=[('queued', 'Queued'), ('detecting', 'Detecting system'), ('loading', 'Loading tables'), ('completed', 'Completed'), ('failed', 'Failed')], default='completed', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='ucdataimport',
+            name='tables_loaded',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ucdataimport',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:07
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uc_data_import', '0003_ucdataimport_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UCUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file_name', models.CharField(max_length=255)),
+                ('file_path', models.CharField(max_length=500)),
+                ('size', models.BigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('system_name', models.CharField(blank=True, max_length=255)),
+                ('version', models.CharField(blank=True, max_length=255)),
+                ('incremental', models.BooleanField(default=False)),
+                ('received_ranges', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('data_import', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload', to='uc_data_import.ucdataimport')),
+            ],
+        ),
+    ]
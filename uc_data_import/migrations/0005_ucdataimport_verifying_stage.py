@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 22:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uc_data_import', '0004_ucupload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ucdataimport',
+            name='stage',
+            field=models.CharField(choices=[('queued', 'Queued'), ('verifying', 'Verifying checksum'), ('detecting', 'Detecting system'), ('loading', 'Loading tables'), ('completed', 'Completed'), ('failed', 'Failed')], default='completed', max_length=20),
+        ),
+    ]
@@ -1,4 +1,6 @@
+import uuid
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 class UCSystemFile(models.Model):
@@ -6,10 +8,70 @@ class UCSystemFile(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
 class UCDataImport(models.Model):
+    STAGE_CHOICES = (
+        ('queued', 'Queued'),
+        ('verifying', 'Verifying checksum'),
+        ('detecting', 'Detecting system'),
+        ('loading', 'Loading tables'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
     file_name = models.CharField(max_length=255)
     system_name = models.CharField(max_length=255)
     version = models.CharField(max_length=255)
     imported_at = models.DateTimeField(auto_now_add=True)
+    incremental = models.BooleanField(default=False)
+    # {table: {'mode': 'full' | 'incremental', 'inserted': n, 'updated': n, 'deleted': n, 'unchanged': n}}
+    table_changes = models.JSONField(default=dict, blank=True)
+
+    # Progress of the background import pipeline, see uc_data_import.tasks
+    file_path = models.CharField(max_length=500, blank=True)
+    database_name = models.CharField(max_length=255, blank=True)
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, default='completed')
+    current_table = models.CharField(max_length=255, blank=True)
+    tables_loaded = models.PositiveIntegerField(default=0)
+    rows_loaded = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def update_progress(self, **fields):
+        """Persist just ``fields`` (and updated_at), so progress writes stay cheap and don't clobber other columns."""
+        fields['updated_at'] = timezone.now()
+        for name, value in fields.items():
+            setattr(self, name, value)
+        type(self).objects.filter(pk=self.pk).update(**fields)
+
+    def change_totals(self):
+        totals = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        for changes in self.table_changes.values():
+            for key in totals:
+                totals[key] += changes.get(key, 0)
+        return totals
+
+    def __str__(self):
+        return f"{self.system_name} - {self.version} - {self.file_name}"
+
+class UCUpload(models.Model):
+    """A resumable, chunked upload of a UC export archive, see uc_data_import.uploads."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file_name = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=500)
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    system_name = models.CharField(max_length=255, blank=True)
+    version = models.CharField(max_length=255, blank=True)
+    incremental = models.BooleanField(default=False)
+    # Merged, sorted [start, end) byte ranges written so far
+    received_ranges = models.JSONField(default=list, blank=True)
+    data_import = models.OneToOneField(UCDataImport, null=True, blank=True, on_delete=models.SET_NULL, related_name='upload')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def received_bytes(self):
+        return sum(end - start for start, end in self.received_ranges)
+
+    def is_complete(self):
+        return self.received_ranges == [[0, self.size]] or self.size == 0
 
     def __str__(self):
-        return f"{self.system_name} - {self.version} - {self.file_name}"
\ No newline at end of file
+        return f"{self.file_name} ({self.received_bytes()}/{self.size} bytes)"
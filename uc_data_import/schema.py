@@ -0,0 +1,215 @@
+# uc_data_import/schema.py
+"""
+Column typing and indexing for imported UC tables.
+
+Tables are bulk loaded with every column as TEXT, which keeps COPY simple and
+works for streamed archive members that can't be read twice. Afterwards a
+sample of rows is used to pick a type per column. PostgreSQL's casts accept
+more than the sample check does ('0123'::integer is 123, 'yes'::boolean is
+true), so one scan then checks every stored value against the pattern of its
+candidate type and keeps any column with a mismatch as TEXT. The table is
+rewritten once with ALTER TABLE ... TYPE; a column whose cast still fails
+(an out of range number, an impossible date) is retried on its own and left
+as TEXT if it fails again. Finally ``pkid`` becomes the primary key (or a
+unique index, when the table already has another one) and every ``fk*``
+column is indexed, so the CUCM device/line/route-pattern joins can use index
+lookups.
+"""
+import re
+from datetime import datetime
+from psycopg2 import sql
+
+SAMPLE_SIZE = 1000
+
+UUID_RE = re.compile(r'^\{?[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\}?$')
+# No leading zeros: directory numbers and patterns such as 0123 must stay text
+INTEGER_RE = re.compile(r'^-?(0|[1-9]\d*)$')
+TIMESTAMP_RE = re.compile(r'^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?$')
+BOOLEAN_RE = re.compile(r'(?i)^(t|f|true|false)$')
+
+# The value patterns of each type, written so PostgreSQL's ~ operator reads
+# them the same way Python does
+TYPE_PATTERNS = {
+    'uuid': UUID_RE,
+    'boolean': BOOLEAN_RE,
+    'integer': INTEGER_RE,
+    'bigint': INTEGER_RE,
+    'timestamp': TIMESTAMP_RE,
+}
+
+INTEGER_MAX = 2 ** 31 - 1
+BIGINT_MAX = 2 ** 63 - 1
+
+
+def is_key_column(column):
+    return column.lower() == 'pkid' or column.lower().startswith('fk')
+
+
+def _is_timestamp(value):
+    if not TIMESTAMP_RE.match(value):
+        return False
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def infer_column_type(values):
+    """
+    PostgreSQL type for a column given a sample of its values: uuid, boolean,
+    integer, bigint, timestamp or text. Empty values are ignored, since they
+    load as NULL.
+    """
+    values = [value for value in values if value not in (None, '')]
+    if not values or not all(isinstance(value, str) for value in values):
+        # Nothing to go on, or the column was already typed by an earlier load
+        return 'text'
+    if all(UUID_RE.match(value) for value in values):
+        return 'uuid'
+    if all(BOOLEAN_RE.match(value) for value in values):
+        return 'boolean'
+    if all(INTEGER_RE.match(value) for value in values):
+        largest = max(abs(int(value)) for value in values)
+        if largest <= INTEGER_MAX:
+            return 'integer'
+        if largest <= BIGINT_MAX:
+            return 'bigint'
+        return 'text'
+    if all(_is_timestamp(value) for value in values):
+        return 'timestamp'
+    return 'text'
+
+
+def sample_rows(cursor, table_name, columns, sample_size=SAMPLE_SIZE):
+    cursor.execute(sql.SQL('SELECT {} FROM {} LIMIT %s').format(
+        sql.SQL(', ').join(sql.Identifier(column) for column in columns),
+        sql.Identifier(table_name),
+    ), [sample_size])
+    return cursor.fetchall()
+
+
+def infer_table_types(cursor, table_name, columns, sample_size=SAMPLE_SIZE):
+    """``{column: type}`` for every column that should not stay TEXT."""
+    rows = sample_rows(cursor, table_name, columns, sample_size)
+    types = {}
+    for index, column in enumerate(columns):
+        column_type = infer_column_type(row[index] for row in rows)
+        if column_type != 'text':
+            types[column] = column_type
+    return types
+
+
+def validate_column_types(cursor, table_name, types):
+    """
+    The subset of ``types`` whose column holds only empty values or values
+    matching the type's pattern, checked for all the columns in one scan.
+    """
+    if not types:
+        return {}
+    checks = [
+        sql.SQL("bool_or({column} <> '' AND {column} !~ %s)").format(column=sql.Identifier(column))
+        for column in types
+    ]
+    cursor.execute(
+        sql.SQL('SELECT {} FROM {}').format(sql.SQL(', ').join(checks), sql.Identifier(table_name)),
+        [TYPE_PATTERNS[column_type].pattern for column_type in types.values()],
+    )
+    mismatched = cursor.fetchone()
+    return {
+        column: column_type
+        for (column, column_type), mismatch in zip(types.items(), mismatched)
+        if not mismatch
+    }
+
+
+def _alter_type(column, column_type):
+    return sql.SQL('ALTER COLUMN {column} TYPE {type} USING NULLIF({column}, \'\')::{type}').format(
+        column=sql.Identifier(column), type=sql.SQL(column_type),
+    )
+
+
+def _execute_in_savepoint(cursor, statement):
+    """Run ``statement``, undoing just it on failure. Returns whether it succeeded."""
+    cursor.execute('SAVEPOINT uc_schema')
+    try:
+        cursor.execute(statement)
+    except Exception:
+        cursor.execute('ROLLBACK TO SAVEPOINT uc_schema')
+        return False
+    finally:
+        cursor.execute('RELEASE SAVEPOINT uc_schema')
+    return True
+
+
+def apply_column_types(cursor, table_name, types):
+    """
+    Retype the columns in one table rewrite, falling back to one column at a
+    time when the sample was wrong about any of them. Returns the types that
+    were applied.
+    """
+    if not types:
+        return {}
+    table = sql.Identifier(table_name)
+    statement = sql.SQL('ALTER TABLE {} {}').format(
+        table, sql.SQL(', ').join(_alter_type(column, column_type) for column, column_type in types.items()),
+    )
+    if _execute_in_savepoint(cursor, statement):
+        return dict(types)
+
+    applied = {}
+    for column, column_type in types.items():
+        if _execute_in_savepoint(cursor, sql.SQL('ALTER TABLE {} {}').format(table, _alter_type(column, column_type))):
+            applied[column] = column_type
+    return applied
+
+
+def primary_key_columns(cursor, table_name):
+    """The columns of the table's primary key, in key order; empty if it has none."""
+    cursor.execute(
+        'SELECT a.attname FROM pg_index i '
+        'CROSS JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, position) '
+        'JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum '
+        'WHERE i.indrelid = quote_ident(%s)::regclass AND i.indisprimary ORDER BY k.position',
+        [table_name],
+    )
+    return [column for column, in cursor.fetchall()]
+
+
+def add_key_indexes(cursor, table_name, columns):
+    """
+    Make ``pkid`` the primary key, or a unique index if the table already has
+    another one, and index every ``fk*`` column. Duplicate or missing pkids
+    get a plain index instead. Nothing is added for a ``pkid`` that already
+    is the primary key, e.g. of a table reloaded in place.
+    """
+    table = sql.Identifier(table_name)
+    for column in columns:
+        if not is_key_column(column):
+            continue
+        name = sql.Identifier(f"{table_name}_{column}_idx")
+        index = sql.SQL('CREATE INDEX IF NOT EXISTS {} ON {} ({})').format(name, table, sql.Identifier(column))
+        if column.lower() == 'pkid':
+            primary_key = primary_key_columns(cursor, table_name)
+            if primary_key == [column]:
+                continue
+            if not primary_key:
+                key = sql.SQL('ALTER TABLE {} ADD PRIMARY KEY ({})').format(table, sql.Identifier(column))
+            else:
+                key = sql.SQL('CREATE UNIQUE INDEX IF NOT EXISTS {} ON {} ({})').format(name, table, sql.Identifier(column))
+            if _execute_in_savepoint(cursor, key):
+                continue
+        cursor.execute(index)
+
+
+def build_table_schema(cursor, table_name, columns, sample_size=SAMPLE_SIZE):
+    """
+    Type, key and index a freshly loaded all-TEXT table, then refresh its
+    planner statistics. Must run inside a transaction. Returns the column
+    types that were applied.
+    """
+    types = validate_column_types(cursor, table_name, infer_table_types(cursor, table_name, columns, sample_size))
+    applied = apply_column_types(cursor, table_name, types)
+    add_key_indexes(cursor, table_name, columns)
+    cursor.execute(sql.SQL('ANALYZE {}').format(sql.Identifier(table_name)))
+    return applied
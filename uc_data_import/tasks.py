@@ -1,9 +1,49 @@
 # uc_data_import/tasks.py
-from celery import shared_task
-from .utils import process_uc_data
+from celery import chain, shared_task
+from .models import UCDataImport
+from .uploads import verify_import_upload
+from .utils import detect_import_system, load_import_tables, import_uc_data
+
+
+def run_import_stage(data_import_id, stage):
+    """Run one stage of the import pipeline, recording any failure on the UCDataImport."""
+    data_import = UCDataImport.objects.get(pk=data_import_id)
+    try:
+        stage(data_import)
+    except Exception as e:
+        data_import.update_progress(stage='failed', error=str(e))
+        raise
+    return data_import_id
+
+
+@shared_task
+def verify_uc_upload(data_import_id):
+    return run_import_stage(data_import_id, verify_import_upload)
+
+
+@shared_task
+def detect_uc_import(data_import_id):
+    return run_import_stage(data_import_id, detect_import_system)
+
+
+@shared_task
+def load_uc_import(data_import_id):
+    return run_import_stage(data_import_id, load_import_tables)
+
+
+def start_import_pipeline(data_import, verify_checksum=False):
+    """
+    Queue the detect -> load chain for an uploaded archive, preceded by the
+    checksum check when it arrived as a chunked UCUpload. Progress is
+    persisted on ``data_import``.
+    """
+    stages = [detect_uc_import.s(), load_uc_import.s()]
+    if verify_checksum:
+        stages.insert(0, verify_uc_upload.s())
+    return chain(*stages).delay(data_import.pk)
+
 
 @shared_task
-def process_uploaded_uc_file(file_path, system_name, version):
-    import_uc_data(file_path, system_name, version)
-    # Add your data processing logic here
-  
\ No newline at end of file
+def process_uploaded_uc_file(file_path, system_name, version, incremental=False):
+    """Import an archive already on the worker's disk in one task; returns the UCDataImport id."""
+    return import_uc_data(file_path, system_name, version, incremental).pk
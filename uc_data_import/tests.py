@@ -1,3 +1,282 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from psycopg2 import sql
+
+from uc_data_import import tasks, uploads
+from uc_data_import.models import UCDataImport, UCUpload
+from uc_data_import.schema import build_table_schema
+from uc_data_import.utils import import_uc_data, open_uc_database, uc_database_name
+
+TEST_CCM_VERSION = '99.0.1'
+
+
+def build_archive(path, tables, version=TEST_CCM_VERSION):
+    """Write a gzipped UC export to ``path``: header.txt plus one CSV per ``{table: text}``."""
+    with tarfile.open(path, 'w:gz') as tar:
+        for name, text in {'header.txt': f'CCM : {version}\n', **{f'{table}.csv': text for table, text in tables.items()}}.items():
+            data = text.encode()
+            member = tarfile.TarInfo(name)
+            member.size = len(data)
+            tar.addfile(member, io.BytesIO(data))
+    return path
+
+
+def drop_uc_database(version=TEST_CCM_VERSION):
+    maintenance = open_uc_database('postgres', exist_ok=True)
+    maintenance.autocommit = True
+    with maintenance.cursor() as cursor:
+        cursor.execute(sql.SQL('DROP DATABASE IF EXISTS {}').format(sql.Identifier(uc_database_name(version))))
+    maintenance.close()
+
+
+class UCImportTestCase(TestCase):
+    """Gives each test a scratch directory and drops the UC database the test imports into."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        drop_uc_database()
+        self.addCleanup(drop_uc_database)
+
+    def uc_rows(self, query):
+        uc_connection = open_uc_database(uc_database_name(TEST_CCM_VERSION), exist_ok=True)
+        try:
+            with uc_connection.cursor() as cursor:
+                cursor.execute(query)
+                return cursor.fetchall()
+        finally:
+            uc_connection.close()
+
+
+class BuildTableSchemaTests(TestCase):
+    columns = ['pkid', 'dnorpattern', 'enabled', 'modified', 'count']
+
+    def load_table(self, rows):
+        """An all-TEXT table holding ``rows``, the way import_csv_stream leaves it."""
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE uc_test_numplan (pkid text, dnorpattern text, enabled text, modified text, count text)')
+            cursor.executemany('INSERT INTO uc_test_numplan VALUES (%s, %s, %s, %s, %s)', rows)
+
+    def column_types(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = 'uc_test_numplan'"
+            )
+            return dict(cursor.fetchall())
+
+    def test_values_past_the_sample_keep_a_column_text(self):
+        rows = [
+            (f'{i:08x}-0000-0000-0000-000000000000', str(1000 + i), 't', '2024-01-02 03:04:05', str(i))
+            for i in range(20)
+        ]
+        rows.append(('ffffffff-0000-0000-0000-000000000000', '0123', 'yes', '02/01/2024', ''))
+        self.load_table(rows)
+
+        with connection.cursor() as cursor:
+            applied = build_table_schema(cursor, 'uc_test_numplan', self.columns, sample_size=10)
+
+        self.assertEqual(applied, {'pkid': 'uuid', 'count': 'integer'})
+        self.assertEqual(self.column_types(), {
+            'pkid': 'uuid', 'dnorpattern': 'text', 'enabled': 'text', 'modified': 'text', 'count': 'integer',
+        })
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT dnorpattern, enabled, modified, count FROM uc_test_numplan WHERE pkid = 'ffffffff-0000-0000-0000-000000000000'")
+            self.assertEqual(cursor.fetchone(), ('0123', 'yes', '02/01/2024', None))
+
+    def test_columns_that_match_throughout_are_typed(self):
+        self.load_table([
+            (f'{i:08x}-0000-0000-0000-000000000000', str(1000 + i), 'TRUE' if i % 2 else 'f', f'2024-01-{i + 1:02d}T03:04', str(i))
+            for i in range(20)
+        ])
+
+        with connection.cursor() as cursor:
+            build_table_schema(cursor, 'uc_test_numplan', self.columns, sample_size=10)
+
+        self.assertEqual(self.column_types(), {
+            'pkid': 'uuid', 'dnorpattern': 'integer', 'enabled': 'boolean',
+            'modified': 'timestamp without time zone', 'count': 'integer',
+        })
+
+    def test_rebuilding_keeps_pkid_as_the_only_key(self):
+        self.load_table([(f'{i:08x}-0000-0000-0000-000000000000', str(i), 't', '', '') for i in range(5)])
+
+        # A reloaded table goes through build_table_schema again with its key in place
+        with connection.cursor() as cursor:
+            build_table_schema(cursor, 'uc_test_numplan', self.columns)
+            build_table_schema(cursor, 'uc_test_numplan', self.columns)
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'uc_test_numplan'")
+            self.assertEqual([name for name, in cursor.fetchall()], ['uc_test_numplan_pkey'])
+
+
+class ImportUCDataTests(UCImportTestCase):
+    def test_full_reimport_of_the_same_version_replaces_the_tables(self):
+        first = build_archive(f'{self.directory}/first.tar.gz', {'numplan': 'pkid,dnorpattern\n1,1000\n2,1001\n'})
+        second = build_archive(f'{self.directory}/second.tar.gz', {'numplan': 'pkid,dnorpattern\n3,0123\n'})
+
+        import_uc_data(first, 'CUCM', TEST_CCM_VERSION)
+        data_import = import_uc_data(second, 'CUCM', TEST_CCM_VERSION)
+
+        data_import.refresh_from_db()
+        self.assertEqual(data_import.stage, 'completed')
+        self.assertEqual(data_import.table_changes['numplan']['inserted'], 1)
+        self.assertEqual(self.uc_rows('SELECT pkid, dnorpattern FROM numplan'), [(3, '0123')])
+
+
+class RepeatingStream:
+    """A request-like stream of ``size`` bytes of ``block`` repeated, never holding more than one read."""
+
+    def __init__(self, block, size):
+        self.block, self.remaining = block, size
+
+    def read(self, n):
+        n = min(n, self.remaining, len(self.block))
+        self.remaining -= n
+        return self.block[:n]
+
+
+@mock.patch('uc_data_import.views.start_import_pipeline')
+class ChunkedUploadTests(UCImportTestCase):
+    chunk_size = 4096
+
+    def setUp(self):
+        super().setUp()
+        settings_override = override_settings(UC_UPLOAD_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.archive = open(build_archive(f'{self.directory}/export.tar.gz', {
+            'numplan': 'pkid,dnorpattern\n' + ''.join(f'{i},{1000 + i}\n' for i in range(2000)),
+        }), 'rb').read()
+
+    def start(self, sha256=None):
+        response = self.client.post(reverse('uc_data_import:start_upload'), {
+            'file_name': 'export.tar.gz', 'size': len(self.archive),
+            'sha256': sha256 or hashlib.sha256(self.archive).hexdigest(),
+            'system_name': 'CUCM', 'version': TEST_CCM_VERSION,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def put_chunk(self, upload, index):
+        start = index * self.chunk_size
+        body = self.archive[start:start + self.chunk_size]
+        return self.client.put(
+            upload['chunk_url'], body, content_type='application/octet-stream',
+            headers={'Content-Range': f'bytes {start}-{start + len(body) - 1}/{len(self.archive)}'},
+        )
+
+    def complete(self, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(upload['complete_url'])
+
+    def chunk_count(self):
+        return -(-len(self.archive) // self.chunk_size)
+
+    def test_out_of_order_chunks_resume_and_complete(self, start_import_pipeline):
+        upload = self.start()
+        indexes = list(range(self.chunk_count()))[::-1]
+        for index in indexes[::2]:
+            self.assertEqual(self.put_chunk(upload, index).status_code, 200)
+
+        # The client resumes from the gaps the server reports
+        status = self.client.get(upload['chunk_url']).json()
+        self.assertFalse(status['complete'])
+        self.assertTrue(status['missing_ranges'])
+        response = self.complete(upload)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['missing_ranges'], status['missing_ranges'])
+        start_import_pipeline.assert_not_called()
+
+        for start, end in status['missing_ranges']:
+            for index in range(start // self.chunk_size, -(-end // self.chunk_size)):
+                self.assertEqual(self.put_chunk(upload, index).status_code, 200)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.complete(upload)
+        self.assertEqual(response.status_code, 202)
+        self.assertIn('FOR UPDATE', captured.captured_queries[1]['sql'])
+        # A second complete reports the same import rather than queueing another
+        self.assertEqual(self.complete(upload).json()['id'], response.json()['id'])
+        self.assertEqual(UCDataImport.objects.count(), 1)
+
+        data_import = UCDataImport.objects.get()
+        start_import_pipeline.assert_called_once_with(data_import, verify_checksum=True)
+        tasks.verify_uc_upload(data_import.pk)
+        with open(data_import.file_path, 'rb') as f:
+            self.assertEqual(f.read(), self.archive)
+        data_import.refresh_from_db()
+        self.assertEqual(data_import.stage, 'verifying')
+
+    def test_checksum_mismatch_fails_the_import_and_reopens_the_upload(self, start_import_pipeline):
+        upload = self.start(sha256='0' * 64)
+        for index in range(self.chunk_count()):
+            self.put_chunk(upload, index)
+        self.assertEqual(self.complete(upload).status_code, 202)
+
+        data_import = UCDataImport.objects.get()
+        with self.assertRaisesMessage(uploads.UploadError, 'Checksum mismatch'):
+            tasks.verify_uc_upload(data_import.pk)
+
+        data_import.refresh_from_db()
+        self.assertEqual(data_import.stage, 'failed')
+        upload_record = UCUpload.objects.get()
+        self.assertEqual((upload_record.received_ranges, upload_record.data_import), ([], None))
+        # Every chunk has to be sent again, and the upload completed again
+        self.assertEqual(self.put_chunk(upload, 0).status_code, 200)
+
+    def test_start_rejects_a_malformed_body(self, start_import_pipeline):
+        for body in (b'{"size": ', b'[1, 2]', b'\xff'):
+            response = self.client.post(reverse('uc_data_import:start_upload'), body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(UCUpload.objects.exists())
+
+    def test_a_chunk_racing_complete_is_not_written(self, start_import_pipeline):
+        upload = self.start()
+        for index in range(self.chunk_count()):
+            self.put_chunk(upload, index)
+        stale = UCUpload.objects.get()
+        # Completed after the chunk's request looked the upload up
+        self.assertEqual(self.complete(upload).status_code, 202)
+
+        with self.assertRaises(uploads.UploadComplete):
+            uploads.write_chunk(stale, io.BytesIO(b'x' * 10), 0, 10)
+        with open(stale.file_path, 'rb') as f:
+            self.assertEqual(f.read(), self.archive)
+        self.assertEqual(self.put_chunk(upload, 0).status_code, 409)
+
+    def test_write_chunk_streams_in_bounded_memory(self, start_import_pipeline):
+        block = os.urandom(uploads.BLOCK_SIZE)
+        blocks_per_chunk, chunks = 4, 8
+        size = uploads.BLOCK_SIZE * blocks_per_chunk * chunks
+        digest = hashlib.sha256()
+        for _ in range(blocks_per_chunk * chunks):
+            digest.update(block)
+        upload = uploads.create_upload('large.tar.gz', size, digest.hexdigest())
+        chunk_bytes = uploads.BLOCK_SIZE * blocks_per_chunk
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        # Odd chunks first, then even: every chunk arrives out of order
+        for index in [*range(1, chunks, 2), *range(0, chunks, 2)]:
+            start = index * chunk_bytes
+            uploads.write_chunk(upload, RepeatingStream(block, chunk_bytes), start, start + chunk_bytes)
+        uploads.verify_upload(upload)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.assertEqual(upload.received_ranges, [[0, size]])
+        # A couple of blocks in flight, never the chunk or the file
+        self.assertLess(peak, 3 * uploads.BLOCK_SIZE)
+        # Well below disk speed; catches a per-byte or copy-the-file regression
+        self.assertGreater(size / elapsed, 20 * 1024 * 1024)
@@ -0,0 +1,146 @@
+# uc_data_import/uploads.py
+"""
+Resumable chunked uploads of UC export archives.
+
+The client declares the archive's size and sha256 up front, then PUTs its
+bytes in chunks with a ``Content-Range`` header, in any order and retrying as
+needed. Each chunk is read from the request in small blocks and written with
+os.pwrite at its offset in the final file, so nothing is buffered in memory
+and the file is never copied. A chunk is written while holding the UCUpload's
+row lock, the one complete_upload takes, so no chunk can land in an archive
+that has been handed to the import; chunks of one upload are therefore
+written one at a time. The byte ranges received so far are stored on
+the UCUpload, which is how a client resumes: it asks which ranges are
+missing. Once every byte is present the file is handed to the import
+pipeline where it lies, and the pipeline's first stage verifies the checksum,
+so completing an upload never hashes the archive inside the request.
+"""
+import hashlib
+import os
+import re
+from django.conf import settings
+from django.db import transaction
+from django.utils.text import get_valid_filename
+from .models import UCUpload
+
+BLOCK_SIZE = 1024 * 1024
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadComplete(UploadError):
+    """The upload was completed, so it takes no more chunks."""
+
+
+def create_upload(file_name, size, sha256, **fields):
+    """Start an upload and allocate its file at full size."""
+    if size < 0:
+        raise UploadError("size must not be negative")
+    if not re.fullmatch(r'[0-9a-fA-F]{64}', sha256 or ''):
+        raise UploadError("sha256 must be 64 hex digits")
+    upload = UCUpload(file_name=get_valid_filename(os.path.basename(file_name)), size=size, sha256=sha256.lower(), **fields)
+    directory = os.path.join(settings.UC_UPLOAD_DIR, str(upload.id))
+    os.makedirs(directory, exist_ok=True)
+    upload.file_path = os.path.join(directory, upload.file_name)
+    with open(upload.file_path, 'wb') as f:
+        f.truncate(size)
+    upload.save()
+    return upload
+
+
+def parse_content_range(header, size):
+    """``(start, end)`` (end exclusive) from a ``bytes start-last/total`` header."""
+    match = CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        raise UploadError("Content-Range must look like 'bytes start-last/total'")
+    start, last, total = (int(group) for group in match.groups())
+    if total != size or start > last or last >= size:
+        raise UploadError(f"Content-Range {header!r} does not fit an upload of {size} bytes")
+    return start, last + 1
+
+
+def merge_range(ranges, start, end):
+    """Add ``[start, end)`` to a sorted list of disjoint ranges, merging neighbours."""
+    merged = []
+    for range_start, range_end in sorted(ranges + [[start, end]]):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], range_end)
+        else:
+            merged.append([range_start, range_end])
+    return merged
+
+
+def missing_ranges(upload):
+    missing, position = [], 0
+    for start, end in upload.received_ranges:
+        if start > position:
+            missing.append([position, start])
+        position = end
+    if position < upload.size:
+        missing.append([position, upload.size])
+    return missing
+
+
+def write_chunk(upload, stream, start, end):
+    """
+    Copy ``end - start`` bytes from ``stream`` to the upload's file at
+    ``start``, block by block. Only the bytes actually written are recorded,
+    so a dropped connection leaves a resumable gap rather than a hole.
+    Returns the number of bytes written; raises UploadComplete, having written
+    nothing, if the upload has been completed.
+    """
+    with transaction.atomic():
+        # Held until the chunk is written and recorded, see the module docstring
+        locked = UCUpload.objects.select_for_update().get(pk=upload.pk)
+        if locked.data_import_id:
+            raise UploadComplete("Upload is already complete")
+        fd = os.open(upload.file_path, os.O_WRONLY)
+        offset = start
+        try:
+            while offset < end:
+                block = stream.read(min(BLOCK_SIZE, end - offset))
+                if not block:
+                    break
+                view = memoryview(block)
+                while view:
+                    written = os.pwrite(fd, view, offset)
+                    view = view[written:]
+                    offset += written
+        finally:
+            os.close(fd)
+        if offset > start:
+            locked.received_ranges = merge_range(locked.received_ranges, start, offset)
+            locked.save(update_fields=['received_ranges', 'updated_at'])
+    upload.received_ranges = locked.received_ranges
+    return offset - start
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def verify_upload(upload):
+    """Raise UploadError unless every byte has arrived and the checksum matches."""
+    if not upload.is_complete():
+        raise UploadError(f"Upload is missing byte ranges {missing_ranges(upload)}")
+    checksum = file_sha256(upload.file_path)
+    if checksum != upload.sha256:
+        # Start over: every range has to be sent again, then completed again
+        upload.received_ranges = []
+        upload.data_import = None
+        upload.save(update_fields=['received_ranges', 'data_import', 'updated_at'])
+        raise UploadError(f"Checksum mismatch: expected {upload.sha256}, got {checksum}")
+
+
+def verify_import_upload(data_import):
+    """First import stage for a chunked upload: check the assembled archive before anything reads it."""
+    data_import.update_progress(stage='verifying')
+    verify_upload(data_import.upload)
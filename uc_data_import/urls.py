@@ -6,4 +6,8 @@ app_name = 'uc_data_import'
 urlpatterns = [
     path('upload/', views.upload_file, name='upload_file'),
     path('success/', views.success, name='success'),
+    path('imports/<int:pk>/status/', views.import_status, name='import_status'),
+    path('uploads/', views.start_upload, name='start_upload'),
+    path('uploads/<uuid:upload_id>/', views.upload_chunk, name='upload_chunk'),
+    path('uploads/<uuid:upload_id>/complete/', views.complete_upload, name='complete_upload'),
 ]
\ No newline at end of file
@@ -1,14 +1,28 @@
 import os
+import shutil
 import tarfile
+import tempfile
+import time
+import logging
 from django.conf import settings
-from django.db import connection
+from django.db import connection, transaction
 from pathlib import Path
 import csv
 import psycopg2
+from psycopg2 import sql
 from .models import UCDataImport
+from .schema import build_table_schema
 
+logger = logging.getLogger(__name__)
 
-def handle_uploaded_file(uploaded_file):
+HEADER_FILE_NAME = 'header.txt'
+
+# CSV members that precede header.txt in an archive are held in memory up to
+# this size, then spill to a temporary file
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+
+def handle_uploaded_file(uploaded_file, extract=False):
     upload_dir = Path(settings.MEDIA_ROOT) / 'uc_system_uploads'
     upload_dir.mkdir(parents=True, exist_ok=True)
     
@@ -18,8 +32,8 @@ def handle_uploaded_file(uploaded_file):
         for chunk in uploaded_file.chunks():
             destination.write(chunk)
     
-    # Now untar the file if it's a tar file
-    if tarfile.is_tarfile(file_path):
+    # Imports stream straight out of the archive; only untar when asked to
+    if extract and tarfile.is_tarfile(file_path):
         with tarfile.open(file_path) as tar:
             tar.extractall(path=upload_dir / uploaded_file.name.rsplit('.', 1)[0])
     
@@ -34,17 +48,85 @@ def extract_tar_file(file_path, extract_to):
     with tarfile.open(file_path, 'r') as tar:
         tar.extractall(path=extract_to)
 
+def parse_system_info(lines):
+    """CCM version from the lines of a header.txt, or None if there is no ``CCM :`` line."""
+    for line in lines:
+        if line.startswith('CCM :'):
+            return line.split(':')[1].strip()
+    return None
+
 def get_system_info(extracted_path):
-    header_file = os.path.join(extracted_path, 'header.txt')
+    header_file = os.path.join(extracted_path, HEADER_FILE_NAME)
     with open(header_file, 'r') as file:
-        for line in file:
-            if line.startswith('CCM :'):
-                system_info = line.split(':')[1].strip()
-                break
-    return system_info
+        return parse_system_info(file)
 
-def create_database_and_tables(system_info, extracted_path):
-    db_name = f"{system_info.replace('.', '_')}_db"
+def open_archive_stream(source):
+    """Open a tar archive (plain, gzip, bz2 or xz) for a single forward pass."""
+    if hasattr(source, 'read'):
+        return tarfile.open(fileobj=source, mode='r|*')
+    return tarfile.open(source, mode='r|*')
+
+def iter_archive_members(tar):
+    """
+    Yield ``(file name, binary stream)`` for each regular file as it comes off
+    the archive. A stream is only readable until the next member is requested.
+    """
+    for member in tar:
+        if member.isfile():
+            yield os.path.basename(member.name), tar.extractfile(member)
+
+def decode_lines(stream):
+    return (line.decode('utf-8', 'replace') for line in stream)
+
+def detect_uc_system_info(source):
+    """Read the archive only as far as header.txt and return its CCM version."""
+    with open_archive_stream(source) as tar:
+        for name, stream in iter_archive_members(tar):
+            if name == HEADER_FILE_NAME:
+                return parse_system_info(decode_lines(stream))
+    return None
+
+def iter_archive_csv_files(source, on_header=None):
+    """
+    Yield ``(table name, csv stream)`` for each CSV member, read straight off
+    the archive without extracting it. When ``on_header`` is given it is called
+    with the system info from header.txt before any CSV is yielded; CSV members
+    stored ahead of header.txt are spooled to a temporary file until then.
+    """
+    header_seen = on_header is None
+    pending = []
+
+    def drain_pending():
+        while pending:
+            table_name, spooled = pending.pop(0)
+            with spooled:
+                yield table_name, spooled
+
+    with open_archive_stream(source) as tar:
+        for name, stream in iter_archive_members(tar):
+            if name == HEADER_FILE_NAME and not header_seen:
+                on_header(parse_system_info(decode_lines(stream)))
+                header_seen = True
+                yield from drain_pending()
+            elif name.endswith('.csv'):
+                table_name = os.path.splitext(name)[0]
+                if header_seen:
+                    yield table_name, stream
+                else:
+                    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+                    shutil.copyfileobj(stream, spooled)
+                    spooled.seek(0)
+                    pending.append((table_name, spooled))
+    yield from drain_pending()
+
+def uc_database_name(system_info):
+    return f"{system_info.replace('.', '_')}_db"
+
+def open_uc_database(db_name, exist_ok=False):
+    """
+    Create ``db_name`` and return a connection to it. With ``exist_ok`` an
+    existing database is reused, for incremental re-imports.
+    """
     connection = psycopg2.connect(
         dbname='postgres',
         user=settings.DATABASES['default']['USER'],
@@ -55,38 +137,151 @@ def create_database_and_tables(system_info, extracted_path):
     cursor = connection.cursor()
     
     # Create database
-    cursor.execute(f"CREATE DATABASE {db_name};")
+    cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", [db_name])
+    if not (exist_ok and cursor.fetchone()):
+        cursor.execute(sql.SQL("CREATE DATABASE {};").format(sql.Identifier(db_name)))
     
     connection.close()
     
-    # Connect to the new database and create tables
-    connection = psycopg2.connect(
+    # Connect to the new database
+    return psycopg2.connect(
         dbname=db_name,
         user=settings.DATABASES['default']['USER'],
         password=settings.DATABASES['default']['PASSWORD'],
         host=settings.DATABASES['default']['HOST']
     )
+
+def create_uc_database(system_info, exist_ok=False):
+    """Create the database for a UC system and return a connection to it."""
+    return open_uc_database(uc_database_name(system_info), exist_ok)
+
+def load_csv_stream(cursor, table_name, csv_file, if_not_exists=True, infer_types=True):
+    """
+    Create ``table_name`` from the CSV header and COPY the rest of ``csv_file``
+    into it, then (by default) type and index its columns.
+    """
+    columns = read_csv_header(csv_file)
+    cursor.execute(create_table_sql(table_name, columns, if_not_exists=if_not_exists))
+    rows, elapsed = copy_csv_into_table(cursor, table_name, columns, csv_file)
+    log_load_rate(table_name, rows, elapsed)
+    if infer_types:
+        build_table_schema(cursor, table_name, columns)
+    return rows, elapsed
+
+def import_csv_stream(cursor, table_name, csv_file, incremental=False):
+    """
+    Load ``csv_file`` into ``table_name`` and return its change counts. In
+    incremental mode an existing table is diffed on pkid and only the changed
+    rows are written; otherwise, or when the table can't be diffed, it is
+    replaced by a full load.
+    """
+    from .incremental import sync_table  # uc_data_import.incremental imports this module
+
+    columns = read_csv_header(csv_file)
+    if incremental:
+        changes = sync_table(cursor, table_name, columns, csv_file)
+        if changes is not None:
+            logger.info("%s: %s", table_name, changes)
+            return changes
+    cursor.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(table_name)))
+    cursor.execute(create_table_sql(table_name, columns, if_not_exists=False))
+    rows, elapsed = copy_csv_into_table(cursor, table_name, columns, csv_file)
+    log_load_rate(table_name, rows, elapsed)
+    build_table_schema(cursor, table_name, columns)
+    return {'mode': 'full', 'inserted': rows, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+
+def create_database_and_tables(system_info, extracted_path):
+    connection = create_uc_database(system_info)
     cursor = connection.cursor()
     
     for csv_file in os.listdir(extracted_path):
         if csv_file.endswith('.csv'):
             table_name = os.path.splitext(csv_file)[0]
-            with open(os.path.join(extracted_path, csv_file), 'r') as file:
-                reader = csv.reader(file)
-                columns = next(reader)
-                cursor.execute(f"CREATE TABLE {table_name} ({', '.join([f'{col} TEXT' for col in columns])});")
-                
-                for row in reader:
-                    cursor.execute(f"INSERT INTO {table_name} VALUES ({', '.join([f'%s' for _ in row])});", row)
+            with open(os.path.join(extracted_path, csv_file), 'r', newline='') as file:
+                load_csv_stream(cursor, table_name, file, if_not_exists=False)
     
     connection.commit()
     connection.close()
 
-def import_uc_data(file_path, system_name, version):
-    extract_to = os.path.join(settings.MEDIA_ROOT, 'extracted')
-    extract_tar_file(file_path, extract_to)
-    system_info = get_system_info(extract_to)
-    create_database_and_tables(system_info, extract_to)
+class ProgressReader:
+    """
+    Wraps a CSV stream on its way into COPY and passes the number of lines
+    read so far to ``callback``, at most once every ``interval`` seconds.
+    """
+
+    def __init__(self, stream, callback, interval=1.0):
+        self.stream = stream
+        self.callback = callback
+        self.interval = interval
+        self.lines = 0
+        self.reported_at = time.monotonic()
+
+    def readline(self):
+        return self.stream.readline()
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.lines += data.count(b'\n' if isinstance(data, bytes) else '\n')
+        now = time.monotonic()
+        if now - self.reported_at >= self.interval:
+            self.reported_at = now
+            self.callback(self.lines)
+        return data
+
+def detect_import_system(data_import):
+    """First import stage: read header.txt from the archive and name the database to load into."""
+    data_import.update_progress(stage='detecting')
+    system_info = detect_uc_system_info(data_import.file_path)
+    if system_info is None:
+        raise ValueError(f"{data_import.file_name}: no CCM version found in {HEADER_FILE_NAME}")
+    data_import.update_progress(database_name=uc_database_name(system_info))
+    return system_info
+
+def load_import_tables(data_import):
+    """
+    Second import stage: stream every CSV member of the archive into the
+    import's database, one transaction per table, recording the current
+    table, rows loaded and per-table change counts as it goes.
+    """
+    data_import.update_progress(stage='loading', tables_loaded=0, rows_loaded=0, table_changes={})
+    # A full re-import of the same version reuses the database too:
+    # import_csv_stream() drops and recreates each table it loads
+    connection = open_uc_database(data_import.database_name, exist_ok=True)
+    try:
+        for table_name, csv_stream in iter_archive_csv_files(data_import.file_path):
+            rows_before = data_import.rows_loaded
+            data_import.update_progress(current_table=table_name)
+            reader = ProgressReader(csv_stream, lambda lines: data_import.update_progress(rows_loaded=rows_before + lines))
+            with connection.cursor() as cursor:
+                changes = import_csv_stream(cursor, table_name, reader, data_import.incremental)
+            connection.commit()
+            data_import.table_changes[table_name] = changes
+            data_import.update_progress(
+                tables_loaded=data_import.tables_loaded + 1,
+                rows_loaded=rows_before + changes['inserted'] + changes['updated'] + changes['unchanged'],
+                table_changes=data_import.table_changes,
+            )
+    finally:
+        connection.close()
+    data_import.update_progress(stage='completed', current_table='')
+
+def import_uc_data(file_path, system_name, version, incremental=False):
+    # Runs both import stages in-process; the upload views queue them on Celery instead
+    data_import = UCDataImport.objects.create(
+        file_name=os.path.basename(file_path),
+        file_path=str(file_path),
+        system_name=system_name,
+        version=version,
+        incremental=incremental,
+        stage='queued',
+    )
+    try:
+        detect_import_system(data_import)
+        load_import_tables(data_import)
+    except Exception as e:
+        data_import.update_progress(stage='failed', error=str(e))
+        raise
+    return data_import
 
 
 def create_tables_from_csv(directory):
@@ -98,19 +293,54 @@ def create_tables_from_csv(directory):
             create_table_from_csv(table_name, csv_path)
 
 def create_table_from_csv(table_name, csv_path):
-    with open(csv_path, 'r') as csvfile:
-        reader = csv.reader(csvfile)
-        headers = next(reader)
-        columns = ', '.join([f'"{header}" TEXT' for header in headers])
+    with open(csv_path, 'r', newline='') as csvfile:
+        with transaction.atomic(), connection.cursor() as cursor:
+            return load_csv_stream(cursor, table_name, csvfile)
+
+
+def read_csv_header(csv_file):
+    """
+    Read the header row and leave ``csv_file`` positioned at the first data
+    row. Archive members are binary streams, so bytes are decoded as UTF-8.
+    """
+    line = csv_file.readline()
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    return next(csv.reader([line]))
+
+
+def create_table_sql(table_name, columns, if_not_exists=True, extra_columns=()):
+    """CREATE TABLE statement with every CSV column stored as TEXT."""
+    definitions = [sql.SQL(definition) for definition in extra_columns]
+    definitions += [sql.SQL('{} TEXT').format(sql.Identifier(column)) for column in columns]
+    statement = 'CREATE TABLE IF NOT EXISTS {} ({})' if if_not_exists else 'CREATE TABLE {} ({})'
+    return sql.SQL(statement).format(sql.Identifier(table_name), sql.SQL(', ').join(definitions))
+
+
+def copy_csv_into_table(cursor, table_name, columns, csv_file):
+    """
+    Stream the remaining rows of ``csv_file`` into ``table_name`` with
+    COPY ... FROM STDIN, so PostgreSQL parses the CSV and nothing is buffered
+    in Python. Returns ``(rows, seconds)``.
+    """
+    statement = sql.SQL('COPY {} ({}) FROM STDIN WITH (FORMAT csv)').format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(sql.Identifier(column) for column in columns),
+    )
+    started = time.monotonic()
+    cursor.copy_expert(statement, csv_file)
+    return cursor.rowcount, time.monotonic() - started
+
+
+def format_load_rate(table_name, rows, elapsed):
+    rate = rows / elapsed if elapsed else float(rows)
+    return f"{table_name}: {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)"
 
-        with connection.cursor() as cursor:
-            cursor.execute(f'CREATE TABLE IF NOT EXISTS "{table_name}" ({columns});')
 
-            for row in reader:
-                placeholders = ', '.join(['%s'] * len(row))
-                cursor.execute(f'INSERT INTO "{table_name}" VALUES ({placeholders})', row)
+def log_load_rate(table_name, rows, elapsed):
+    logger.info(format_load_rate(table_name, rows, elapsed))
 
 def process_uc_data(file_path, system_name, version):
-    extract_to = os.path.join(settings.MEDIA_ROOT, 'extracted_uc_data')
-    extract_tar_file(file_path, extract_to)
-    create_tables_from_csv(extract_to)
\ No newline at end of file
+    for table_name, csv_stream in iter_archive_csv_files(file_path):
+        with transaction.atomic(), connection.cursor() as cursor:
+            load_csv_stream(cursor, table_name, csv_stream)
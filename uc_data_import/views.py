@@ -1,16 +1,19 @@
 import os
-import shutil
+import json
 import tarfile
 import environ
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.conf import settings
 from django.core.files.storage import default_storage
 from .forms import UploadFileForm
-from django.core.management import call_command
-from django.http import HttpResponse
-from .models import UCSystemFile
-from .utils import handle_uploaded_file
-from .tasks import process_uploaded_uc_file
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.db import transaction
+from django.views.decorators.http import require_POST, require_http_methods
+from .models import UCSystemFile, UCDataImport, UCUpload
+from .utils import handle_uploaded_file, detect_uc_system_info
+from .tasks import start_import_pipeline
+from .uploads import UploadError, UploadComplete, create_upload, parse_content_range, write_chunk, missing_ranges
 
 
 env = environ.Env(DEBUG=(bool, False))
@@ -21,7 +24,7 @@ DB_PORT = env("DB_PORT")
 DB_USER = env("DB_USER")
 DB_PASSWORD = env("DB_PASSWORD")
 
-def handle_uploaded_file(f, directory):
+def handle_uploaded_file(f, directory, extract=False):
     if not os.path.exists(directory):
         os.makedirs(directory)
     file_path = os.path.join(directory, f.name)
@@ -29,52 +32,160 @@ def handle_uploaded_file(f, directory):
         for chunk in f.chunks():
             destination.write(chunk)
     
-    # Extract the .tar file
-    if tarfile.is_tarfile(file_path):
+    # The import streams members straight out of the archive, so only
+    # extract the .tar file when asked to
+    if extract and tarfile.is_tarfile(file_path):
         with tarfile.open(file_path, 'r') as tar:
             tar.extractall(path=directory)
         os.remove(file_path)  # Optionally remove the original .tar file after extraction
+        return directory
+    return file_path
 
-def detect_uc_system(header_file_path):
-    with open(header_file_path, 'r') as file:
-        lines = file.readlines()
-        for line in lines:
-            if line.startswith("CCM :"):
-                return "cisco_uc"
+def detect_uc_system(archive_path):
+    # Reads the archive only as far as header.txt
+    try:
+        system_info = detect_uc_system_info(archive_path)
+    except tarfile.ReadError:
+        return "unknown"
+    if system_info is not None:
+        return "cisco_uc"
     return "unknown"
 
+def queue_uc_import(file_path, system_name, version, incremental=False, verify_checksum=False):
+    """Record the upload and hand detection and loading off to Celery once the caller's transaction commits."""
+    data_import = UCDataImport.objects.create(
+        file_name=os.path.basename(file_path),
+        file_path=file_path,
+        system_name=system_name,
+        version=version,
+        incremental=incremental,
+        stage='queued',
+    )
+    transaction.on_commit(lambda: start_import_pipeline(data_import, verify_checksum=verify_checksum))
+    return data_import
+
 def upload_file(request):
     if request.method == 'POST':
         form = UploadFileForm(request.POST, request.FILES)
         if form.is_valid():
             upload_dir = os.path.join(settings.MEDIA_ROOT, 'uploads', request.FILES['file'].name.split('.')[0])
-            handle_uploaded_file(request.FILES['file'], upload_dir)
-
-            # Detect UC system type
-            header_file_path = os.path.join(upload_dir, 'header.txt')
-            uc_system_type = detect_uc_system(header_file_path)
+            archive_path = handle_uploaded_file(request.FILES['file'], upload_dir)
 
-            if uc_system_type == "cisco_uc":
-                db_name = "cisco_uc_database"
-                call_command('import_uc_data', upload_dir, db_name)
-            else:
-                return render(request, 'uc_data_import/upload.html', {'form': form, 'error': 'Unknown UC system type'})
+            if not tarfile.is_tarfile(archive_path):
+                os.remove(archive_path)
+                return render(request, 'uc_data_import/upload.html', {'form': form, 'error': 'Upload a (gzip/bz2) tar archive of a UC export'})
 
-            return redirect('success')
+            data_import = queue_uc_import(
+                archive_path,
+                form.cleaned_data['system_name'],
+                form.cleaned_data['version'],
+                incremental=form.cleaned_data['incremental'],
+            )
+            status_url = reverse('uc_data_import:import_status', args=[data_import.pk])
+            if request.accepts('application/json') and not request.accepts('text/html'):
+                return JsonResponse({'id': data_import.pk, 'stage': data_import.stage, 'status_url': status_url}, status=202)
+            return redirect(f"{reverse('uc_data_import:success')}?import={data_import.pk}")
 
     else:
         form = UploadFileForm()
     return render(request, 'uc_data_import/upload.html', {'form': form})
 
 def success(request):
-    return render(request, 'uc_data_import/success.html')
+    data_import = None
+    if request.GET.get('import', '').isdigit():
+        data_import = UCDataImport.objects.filter(pk=request.GET['import']).first()
+    return render(request, 'uc_data_import/success.html', {'data_import': data_import})
+
+def import_status(request, pk):
+    data_import = get_object_or_404(UCDataImport, pk=pk)
+    return JsonResponse({
+        'id': data_import.pk,
+        'file_name': data_import.file_name,
+        'stage': data_import.stage,
+        'stage_display': data_import.get_stage_display(),
+        'database_name': data_import.database_name,
+        'current_table': data_import.current_table,
+        'tables_loaded': data_import.tables_loaded,
+        'rows_loaded': data_import.rows_loaded,
+        'table_changes': data_import.table_changes,
+        'error': data_import.error,
+        'updated_at': data_import.updated_at,
+    })
 
 def upload_uc_file(request):
     if request.method == 'POST':
         file = request.FILES['file']
-        file_path = handle_uploaded_file(file)
-        # Trigger the Celery task
-        process_uploaded_uc_file.delay(str(file_path))
+        file_path = handle_uploaded_file(file, os.path.join(settings.MEDIA_ROOT, 'uc_system_uploads'))
+        # Trigger the Celery import pipeline
+        data_import = queue_uc_import(file_path, request.POST.get('system_name', ''), request.POST.get('version', ''))
+        status_url = reverse('uc_data_import:import_status', args=[data_import.pk])
         
-        return HttpResponse(f"File uploaded and saved to {file_path}")
-    return render(request, 'upload.html')
+        return HttpResponse(f"File uploaded and saved to {file_path}; import status: {status_url}")
+    return render(request, 'uc_data_import/upload.html', {'form': UploadFileForm()})
+
+def upload_status_data(upload):
+    return {
+        'id': str(upload.id),
+        'file_name': upload.file_name,
+        'size': upload.size,
+        'received_bytes': upload.received_bytes(),
+        'missing_ranges': missing_ranges(upload),
+        'complete': upload.is_complete(),
+        'chunk_url': reverse('uc_data_import:upload_chunk', args=[upload.id]),
+        'complete_url': reverse('uc_data_import:complete_upload', args=[upload.id]),
+    }
+
+@require_POST
+def start_upload(request):
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError('Expected a JSON object.')
+        upload = create_upload(
+            data.get('file_name', ''),
+            int(data.get('size', -1)),
+            data.get('sha256', ''),
+            system_name=data.get('system_name', ''),
+            version=data.get('version', ''),
+            incremental=bool(data.get('incremental', False)),
+        )
+    except (UploadError, ValueError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(upload_status_data(upload), status=201)
+
+@require_http_methods(['GET', 'PUT'])
+def upload_chunk(request, upload_id):
+    """GET reports what has been received; PUT writes the body at its Content-Range."""
+    upload = get_object_or_404(UCUpload, pk=upload_id)
+    if request.method == 'PUT':
+        if upload.data_import_id:
+            return JsonResponse({'error': 'Upload is already complete'}, status=409)
+        try:
+            start, end = parse_content_range(request.headers.get('Content-Range'), upload.size)
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        # Read the body straight off the request stream rather than request.body
+        try:
+            written = write_chunk(upload, request, start, end)
+        except UploadComplete as e:
+            return JsonResponse({'error': str(e)}, status=409)
+        if written < end - start:
+            return JsonResponse({'error': f"Expected {end - start} bytes, received {written}", **upload_status_data(upload)}, status=400)
+    return JsonResponse(upload_status_data(upload))
+
+@require_POST
+def complete_upload(request, upload_id):
+    with transaction.atomic():
+        # Lock the upload so two concurrent completes can't both queue an import
+        upload = get_object_or_404(UCUpload.objects.select_for_update(), pk=upload_id)
+        if not upload.data_import_id:
+            if not upload.is_complete():
+                return JsonResponse({'error': f"Upload is missing byte ranges {missing_ranges(upload)}", **upload_status_data(upload)}, status=409)
+            # The file is imported where it lies; the pipeline verifies its checksum first
+            upload.data_import = queue_uc_import(upload.file_path, upload.system_name, upload.version, incremental=upload.incremental, verify_checksum=True)
+            upload.save(update_fields=['data_import', 'updated_at'])
+    return JsonResponse({
+        'id': upload.data_import_id,
+        'stage': upload.data_import.stage,
+        'status_url': reverse('uc_data_import:import_status', args=[upload.data_import_id]),
+    }, status=202)